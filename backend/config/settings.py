@@ -65,6 +65,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "organizations.query_budget.QueryBudgetMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -204,6 +205,27 @@ CSRF_TRUSTED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 
+# Write-behind buffer for student answer autosaves (see students/answer_buffer.py)
+ANSWER_BUFFER_ENABLED = os.getenv('ANSWER_BUFFER_ENABLED', 'false') == 'true'
+ANSWER_BUFFER_PATH = os.getenv('ANSWER_BUFFER_PATH', str(BASE_DIR / 'answer-buffer.sqlite3'))
+# Flush interval of the in-process flusher; 0 leaves flushing to `manage.py flush_answer_buffer --watch`
+ANSWER_BUFFER_FLUSH_INTERVAL_MS = int(os.getenv('ANSWER_BUFFER_FLUSH_INTERVAL_MS', '500'))
+
+# Answers saved less than this many seconds ago are left to the next progress rollup, so answers
+# whose transaction commits late are not skipped (see students/snapshots.py)
+PROGRESS_ROLLUP_LAG_SECONDS = int(os.getenv('PROGRESS_ROLLUP_LAG_SECONDS', '300'))
+
+# Lifetime in seconds of cached topic pools and generated question sets (see quizzes/generation.py);
+# they are also dropped whenever a question or topic changes
+QUIZ_GENERATION_CACHE_TIMEOUT = int(os.getenv('QUIZ_GENERATION_CACHE_TIMEOUT', '3600'))
+
+# Lifetime in seconds of the cached practice cursors of the next-question endpoint (see students/adaptive.py)
+PRACTICE_CURSOR_TIMEOUT = int(os.getenv('PRACTICE_CURSOR_TIMEOUT', '86400'))
+
+# A SQL shape repeated more often than this in one request is logged as a possible N+1 in DEBUG
+# (see organizations/query_budget.py)
+QUERY_REPEAT_WARNING_THRESHOLD = int(os.getenv('QUERY_REPEAT_WARNING_THRESHOLD', '5'))
+
 # drf-spectacular settings
 SPECTACULAR_SETTINGS = {
     'TITLE': 'FlowForce Education API',
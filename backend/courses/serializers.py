@@ -34,6 +34,7 @@ class LessonSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        prefetch_related = ['topics']
     
     def get_topics_count(self, obj):
         return obj.topics.count()
@@ -52,6 +53,7 @@ class ModuleSerializer(serializers.ModelSerializer):
             'course_name', 'lessons_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        prefetch_related = ['lessons']
     
     def get_lessons_count(self, obj):
         return obj.lessons.count()
@@ -69,6 +71,7 @@ class CourseSerializer(serializers.ModelSerializer):
             'modules_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        prefetch_related = ['modules']
     
     def get_modules_count(self, obj):
         return obj.modules.count()
@@ -129,6 +132,7 @@ class MaterialSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        prefetch_related = ['modules', 'lessons', 'topics']
     
     def get_modules_names(self, obj):
         return [m.name for m in obj.modules.all()]
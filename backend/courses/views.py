@@ -2,6 +2,7 @@ from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from organizations.query_plan import QueryPlanMixin, plan_queryset
 from .models import Course, Module, Lesson, Topic, Material
 from .serializers import (
     CourseSerializer, CourseDetailSerializer,
@@ -12,7 +13,7 @@ from .serializers import (
 )
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Course model."""
     
     queryset = Course.objects.all()
@@ -32,12 +33,12 @@ class CourseViewSet(viewsets.ModelViewSet):
     def modules(self, request, pk=None):
         """Get all modules for this course."""
         course = self.get_object()
-        modules = Module.objects.filter(course=course)
+        modules = plan_queryset(Module.objects.filter(course=course), ModuleSerializer)
         serializer = ModuleSerializer(modules, many=True)
         return Response(serializer.data)
 
 
-class ModuleViewSet(viewsets.ModelViewSet):
+class ModuleViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Module model."""
     
     queryset = Module.objects.all()
@@ -57,12 +58,12 @@ class ModuleViewSet(viewsets.ModelViewSet):
     def lessons(self, request, pk=None):
         """Get all lessons for this module."""
         module = self.get_object()
-        lessons = Lesson.objects.filter(module=module)
+        lessons = plan_queryset(Lesson.objects.filter(module=module), LessonSerializer)
         serializer = LessonSerializer(lessons, many=True)
         return Response(serializer.data)
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Lesson model."""
     
     queryset = Lesson.objects.all()
@@ -82,12 +83,12 @@ class LessonViewSet(viewsets.ModelViewSet):
     def topics(self, request, pk=None):
         """Get all topics for this lesson."""
         lesson = self.get_object()
-        topics = Topic.objects.filter(lesson=lesson)
+        topics = plan_queryset(Topic.objects.filter(lesson=lesson), TopicSerializer)
         serializer = TopicSerializer(topics, many=True)
         return Response(serializer.data)
 
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Topic model."""
     
     queryset = Topic.objects.all()
@@ -103,7 +104,7 @@ class TopicViewSet(viewsets.ModelViewSet):
             return TopicDetailSerializer
         return TopicSerializer
     
-class MaterialViewSet(viewsets.ModelViewSet):
+class MaterialViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Material model."""
     
     queryset = Material.objects.all()
@@ -0,0 +1,123 @@
+"""Per-request SQL query accounting.
+
+``QueryRecorder`` counts the queries run on every database connection
+while it is active, with their total time and how often each SQL shape
+(the statement with its literals and parameters blanked out) repeats. A
+shape that repeats once per row of a page is the signature of an N+1.
+
+``QueryBudgetMiddleware`` records every request in DEBUG (and does
+nothing otherwise). It logs a warning for each shape repeated more than
+``QUERY_REPEAT_WARNING_THRESHOLD`` times and adds a ``Server-Timing``
+header with the query count and database time. Tests hold every API route
+to a query budget with the helper in ``organizations/tests/query_budget.py``.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def sql_shape(sql):
+    """Return ``sql`` with its literals and parameters replaced by ``?`` and IN lists collapsed."""
+    shape = _STRING.sub('?', sql)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _IN_LIST.sub('(...)', shape)
+
+
+class QueryRecorder:
+    """Count the queries, their time and repeated SQL shapes while used as a context manager."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def repeated(self, threshold):
+        """Return (shape, times) for the shapes run more than ``threshold`` times, most repeated first."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times > threshold]
+
+    def server_timing(self):
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+class QueryBudgetMiddleware:
+    """In DEBUG, record the queries of every request and warn about repeated queries.
+
+    Without DEBUG requests pass straight through, so production doesn't pay
+    for wrapping and shaping every query. In DEBUG the recorder is available
+    to later middleware and tests as ``response.query_stats``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DEBUG:
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        response.query_stats = recorder
+        for shape, times in recorder.repeated(settings.QUERY_REPEAT_WARNING_THRESHOLD):
+            logger.warning(
+                '%s %s ran the same query %d times (possible N+1): %s',
+                request.method, request.path, times, shape
+            )
+        response['Server-Timing'] = recorder.server_timing()
+        return response
+
+
+def _patterns(resolver, prefix=''):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _patterns(pattern, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern), pattern
+
+
+def router_routes(urlconf=None):
+    """Return the GET routes registered by the API's routers as a dict of URL name -> (route, viewset class).
+
+    Format suffix duplicates and the routers' root views are left out.
+    """
+    routes = {}
+    for route, pattern in _patterns(get_resolver(urlconf)):
+        if not isinstance(pattern, URLPattern) or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        if actions and 'get' in actions and pattern.name:
+            routes.setdefault(pattern.name, (route, pattern.callback.cls))
+    return routes
@@ -0,0 +1,198 @@
+"""Queryset plans derived from the fields of a serializer.
+
+``QueryPlanMixin`` makes a viewset's ``list`` and ``retrieve`` querysets
+load exactly the relations its serializer reads. The plan is built by
+walking the serializer's fields and resolving each field's source against
+the model:
+
+- a dotted source through forward foreign keys and one-to-one fields
+  (``topic.lesson.module.course.name``) becomes a ``select_related`` path;
+- a many-to-many field, a reverse foreign key or a generic foreign key
+  becomes a ``prefetch_related`` lookup, and a nested serializer under it
+  gets its own plan as the queryset of a ``Prefetch``;
+- a primary key related field reads the foreign key column and joins
+  nothing.
+
+What fields compute themselves (``SerializerMethodField``, sources that are
+properties or methods) can't be seen from the outside. A serializer
+declares the relations those read in its ``Meta``::
+
+    class Meta:
+        select_related = ['student']
+        prefetch_related = ['refs__statistics']
+
+When every field resolves to a column and the serializer declares no such
+relations, the queryset also gets ``only()`` with the columns the fields
+read.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+
+PLANNED_ACTIONS = ('list', 'retrieve')
+
+
+class QueryPlan:
+    """The relations and columns one queryset of ``model`` needs."""
+
+    def __init__(self, model):
+        self.model = model
+        self.select = set()
+        self.prefetch = {}
+        self.hints = []
+        self.columns = set()
+        self.complete = True
+
+    def prefetch_plan(self, lookup, model):
+        if lookup not in self.prefetch:
+            self.prefetch[lookup] = QueryPlan(model) if model is not None else None
+        return self.prefetch[lookup]
+
+    def lookups(self):
+        """Return the ``prefetch_related`` lookups of this plan, nested plans as ``Prefetch`` objects."""
+        lookups = []
+        for lookup, plan in self.prefetch.items():
+            if plan is None or not (plan.select or plan.prefetch or plan.hints):
+                lookups.append(lookup)
+            else:
+                lookups.append(Prefetch(lookup, queryset=plan.apply(plan.model._default_manager.all())))
+        # Plain hint lookups come last: a Prefetch can't follow a string lookup of the same path
+        return lookups + self.hints
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        lookups = self.lookups()
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        return queryset
+
+    def only(self, queryset):
+        """Apply the plan, restricting the columns loaded when all of them are known."""
+        queryset = self.apply(queryset)
+        if self.complete:
+            queryset = queryset.only(*sorted(self.columns))
+        return queryset
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _add_hints(plan, serializer, path):
+    meta = getattr(serializer, 'Meta', None)
+    prefix = '__'.join(path + ('',)) if path else ''
+    for lookup in getattr(meta, 'select_related', ()):
+        plan.select.add(prefix + lookup)
+        plan.complete = False
+    for lookup in getattr(meta, 'prefetch_related', ()):
+        plan.hints.append(prefix + lookup)
+        plan.complete = False
+
+
+def _walk(serializer, plan, model, path=()):
+    """Add what the fields of ``serializer``, reading instances of ``model`` at ``path``, need to ``plan``."""
+    _add_hints(plan, serializer, path)
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            plan.complete = False
+            continue
+        source, attrs = field.source, field.source_attrs
+        if isinstance(field, serializers.ListSerializer):
+            # The source is bound on the list, the fields are the child's
+            field = field.child
+        if source == '*':
+            if isinstance(field, serializers.BaseSerializer):
+                _walk(field, plan, model, path)
+            else:
+                plan.complete = False
+            continue
+        _resolve(field, attrs, plan, model, path)
+
+
+def _resolve(field, attrs, plan, model, path):
+    for index, attr in enumerate(attrs):
+        last = index == len(attrs) - 1
+        model_field = _model_field(model, attr)
+        if model_field is None:
+            # A property or method: what it reads is unknown
+            plan.complete = False
+            return
+        if not model_field.is_relation:
+            plan.columns.add('__'.join(path + (attr,)))
+            if not last:
+                plan.complete = False
+            return
+
+        lookup = '__'.join(path + (attr,))
+        if model_field.related_model is None or model_field.many_to_many or model_field.one_to_many:
+            # Generic foreign keys and to-many relations are prefetched, in their own queries
+            nested = plan.prefetch_plan(lookup, model_field.related_model)
+            if model_field.related_model is None:
+                plan.complete = False
+            elif not last:
+                _resolve(field, attrs[index + 1:], nested, model_field.related_model, ())
+            elif isinstance(field, serializers.BaseSerializer):
+                _walk(field, nested, model_field.related_model)
+            elif not (isinstance(field, ManyRelatedField) and isinstance(field.child_relation, PrimaryKeyRelatedField)):
+                plan.complete = False
+            return
+
+        if not model_field.concrete:
+            # A reverse one-to-one: joined, but its columns are left to the related model
+            plan.select.add(lookup)
+            plan.complete = False
+        else:
+            plan.columns.add(lookup)
+            if last and isinstance(field, PrimaryKeyRelatedField):
+                # Serialized from the foreign key column alone
+                return
+            plan.select.add(lookup)
+        if last:
+            if isinstance(field, serializers.BaseSerializer):
+                _walk(field, plan, model_field.related_model, path + (attr,))
+            else:
+                # Serialized from the related object itself (str(), slug, hyperlink)
+                plan.complete = False
+            return
+        model, path = model_field.related_model, path + (attr,)
+
+
+@lru_cache(maxsize=None)
+def serializer_plan(serializer_class):
+    """Return the ``QueryPlan`` for querysets serialized by ``serializer_class`` (built once per class)."""
+    serializer = serializer_class()
+    plan = QueryPlan(serializer.Meta.model)
+    _walk(serializer, plan, serializer.Meta.model)
+    return plan
+
+
+def plan_queryset(queryset, serializer_class):
+    """Apply the plan of ``serializer_class`` to ``queryset``, for views serializing it themselves."""
+    return serializer_plan(serializer_class).only(queryset)
+
+
+class QueryPlanMixin:
+    """Load the relations the serializer reads along with the ``list`` and ``retrieve`` querysets.
+
+    Put it before the viewset base class. The plan follows
+    ``get_serializer_class()``, so list and detail serializers each get
+    their own.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) in PLANNED_ACTIONS:
+            serializer_class = self.get_serializer_class()
+            if issubclass(serializer_class, serializers.ModelSerializer):
+                queryset = plan_queryset(queryset, serializer_class)
+        return queryset
@@ -0,0 +1,43 @@
+"""Test helper holding API routes to a query budget."""
+from django.urls import reverse
+
+from organizations.query_budget import QueryRecorder, router_routes
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries of API requests, for a TestCase with an authenticated ``self.client``."""
+
+    def assertQueryBudget(self, url, budget, params=None):
+        """GET ``url`` and fail if it errors or runs more than ``budget`` queries. Returns the response."""
+        with QueryRecorder() as recorder:
+            response = self.client.get(url, params)
+        self.assertLess(response.status_code, 400, f'GET {url} returned {response.status_code}')
+        if recorder.count > budget:
+            repeated = ''.join(f'\n  {times}x {shape}' for shape, times in recorder.repeated(1))
+            self.fail(f'GET {url} ran {recorder.count} queries, over its budget of {budget}.{repeated}')
+        return response
+
+    def assertRouteBudgets(self, budgets, kwargs=None, params=None):
+        """Hold every GET route of the API's routers to its budget.
+
+        ``budgets`` maps URL names to the most queries a request may run;
+        every route needs one, so a new route can't land unbudgeted. Detail
+        routes are requested for the first object of the viewset's queryset
+        unless ``kwargs`` gives the URL kwargs for the route; ``params`` gives
+        query parameters by URL name.
+        """
+        kwargs = kwargs or {}
+        params = params or {}
+        routes = router_routes()
+        self.assertEqual(sorted(set(routes) - set(budgets)), [], 'Routes without a query budget')
+        self.assertEqual(sorted(set(budgets) - set(routes)), [], 'Budgets for routes that no longer exist')
+        for name, (route, viewset) in routes.items():
+            with self.subTest(route=name):
+                url_kwargs = kwargs.get(name)
+                if url_kwargs is None:
+                    url_kwargs = {}
+                    if '(?P<pk>' in route:
+                        url_kwargs['pk'] = viewset.queryset.model._default_manager.order_by('pk').values_list(
+                            'pk', flat=True
+                        ).first()
+                self.assertQueryBudget(reverse(name, kwargs=url_kwargs), budgets[name], params.get(name))
@@ -0,0 +1,198 @@
+import logging
+
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic, Material
+from organizations.models import Organization, User
+from organizations.query_budget import sql_shape
+from quizzes.models import (
+    Quiz, MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion,
+    Option, OrderOption, ConnectOption, ConnectOptionConnection
+)
+from students.models import StudentGroup, Student, StudentQuestionAnswer, QuizAttempt
+from .query_budget import QueryBudgetMixin
+
+
+# Most queries a GET of each API route may run on the fixture below, which has several rows of
+# every model so that a query per row shows up as a budget overrun
+QUERY_BUDGETS = {
+    'organization-list': 2,
+    'organization-detail': 1,
+    'organization-users': 2,
+    'user-list': 2,
+    'user-detail': 1,
+
+    'course-list': 3,
+    'course-detail': 4,
+    'course-modules': 3,
+    'module-list': 3,
+    'module-detail': 3,
+    'module-lessons': 3,
+    'lesson-list': 3,
+    'lesson-detail': 2,
+    'lesson-topics': 2,
+    'topic-list': 2,
+    'topic-detail': 1,
+    'material-list': 5,
+    'material-detail': 4,
+
+    'quiz-list': 4,
+    'quiz-detail': 12,
+    'quiz-item-statistics': 2,
+    'quiz-next-question': 11,
+    'quiz-play': 1,
+    'quiz-questions': 10,
+    'quiz-versions': 2,
+    'question-list': 5,
+    'question-detail': 4,
+    'question-correct-options': 2,
+    'question-options': 2,
+    'multiplechoicequestion-list': 5,
+    'multiplechoicequestion-detail': 4,
+    'multiplechoicequestion-correct-options': 2,
+    'multiplechoicequestion-options': 2,
+    'orderquestion-list': 5,
+    'orderquestion-detail': 4,
+    'orderquestion-order-options': 2,
+    'connectquestion-list': 6,
+    'connectquestion-detail': 5,
+    'connectquestion-connect-options': 2,
+    'connectquestion-connections': 2,
+    'numberquestion-list': 4,
+    'numberquestion-detail': 3,
+    'questionref-list': 2,
+    'questionref-detail': 1,
+    'option-list': 2,
+    'option-detail': 1,
+    'orderoption-list': 2,
+    'orderoption-detail': 1,
+    'connectoption-list': 2,
+    'connectoption-detail': 1,
+    'connectoptionconnection-list': 2,
+    'connectoptionconnection-detail': 1,
+
+    'studentgroup-list': 4,
+    'studentgroup-detail': 7,
+    'studentgroup-progress-history': 2,
+    'studentgroup-progress-matrix': 5,
+    'studentgroup-students': 4,
+    'student-list': 4,
+    'student-detail': 9,
+    'student-group-progress': 10,
+    'student-question-answers': 3,
+    'studentquestionanswer-list': 3,
+    'studentquestionanswer-detail': 2,
+    'quizattempt-list': 2,
+    'quizattempt-detail': 1,
+}
+
+
+def repeated_queries(request):
+    """Read the organizations one query at a time: an N+1 on purpose."""
+    for organization_id in Organization.objects.values_list('id', flat=True):
+        Organization.objects.get(id=organization_id)
+    return HttpResponse()
+
+
+urlpatterns = [
+    path('repeated-queries/', repeated_queries),
+]
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every API route stays within its query budget."""
+
+    ROWS = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        organization = {'organization': cls.organization}
+        course = Course.objects.create(name='Course', **organization)
+        modules = [Module.objects.create(course=course, name=f'Module {i}', **organization) for i in range(cls.ROWS)]
+        topics = []
+        for module in modules:
+            for i in range(cls.ROWS):
+                lesson = Lesson.objects.create(module=module, name=f'Lesson {i}', **organization)
+                topics.append(Topic.objects.create(lesson=lesson, name=f'Topic {i}', **organization))
+        for i in range(cls.ROWS):
+            material = Material.objects.create(course=course, title=f'Material {i}', **organization)
+            material.modules.add(*modules)
+            material.topics.add(*topics[:cls.ROWS])
+
+        cls.quiz = Quiz.objects.create(name='Quiz', course=course, module=modules[0], **organization)
+        cls.quiz.topics.add(*topics)
+        options = []
+        for i, topic in enumerate(topics[:cls.ROWS]):
+            common = {'quiz': cls.quiz, 'topic': topic, **organization}
+            question = MultipleChoiceQuestion.objects.create(text=f'Pick {i}', order=i, **common)
+            options.append([
+                Option.objects.create(question=question, text=f'Option {j}', is_correct=j == 0, **organization)
+                for j in range(cls.ROWS)
+            ])
+            question = OrderQuestion.objects.create(text=f'Order {i}', order=i, **common)
+            for j in range(cls.ROWS):
+                OrderOption.objects.create(question=question, text=f'Step {j}', correct_order=j, **organization)
+            question = ConnectQuestion.objects.create(text=f'Connect {i}', order=i, **common)
+            ends = [
+                ConnectOption.objects.create(
+                    question=question, text=f'End {j}', position_x=0, position_y=0, width=1, height=1,
+                    **organization
+                )
+                for j in range(2)
+            ]
+            ConnectOptionConnection.objects.create(
+                question=question, from_option=ends[0], to_option=ends[1], **organization
+            )
+            NumberQuestion.objects.create(text=f'Number {i}', order=i, correct_answer=i, **common)
+
+        cls.group = StudentGroup.objects.create(name='Group', course=course, year=2024, **organization)
+        cls.group.modules.add(*modules)
+        cls.students = []
+        for i in range(cls.ROWS):
+            user = User.objects.create(username=f'student{i}@example.com', **organization)
+            student = Student.objects.create(user=user, first_name='Student', last_name=str(i), **organization)
+            student.student_groups.add(cls.group)
+            for question_options in options:
+                StudentQuestionAnswer.objects.create(
+                    student=student, quiz=cls.quiz, question=question_options[0].question,
+                    answer=question_options[i % cls.ROWS], **organization
+                )
+            QuizAttempt.objects.create(student=student, quiz=cls.quiz, **organization)
+            cls.students.append(student)
+        cls.user = User.objects.create(username='teacher', **organization)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_every_route_within_budget(self):
+        self.assertRouteBudgets(
+            QUERY_BUDGETS,
+            kwargs={'student-group-progress': {'pk': self.students[0].pk, 'group_id': self.group.pk}},
+            params={'quiz-next-question': {'student': self.students[0].pk}},
+        )
+
+    def test_sql_shape_ignores_literals_and_parameter_counts(self):
+        self.assertEqual(
+            sql_shape('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s) AND "a"."name" = \'x\' LIMIT 21'),
+            sql_shape('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s) AND "a"."name" = \'y\' LIMIT 1'),
+        )
+
+    @override_settings(DEBUG=True, QUERY_REPEAT_WARNING_THRESHOLD=1, ROOT_URLCONF=__name__)
+    def test_repeated_queries_are_logged_in_debug(self):
+        Organization.objects.create(name='Other organization', slug='other-org')
+        with self.assertLogs('organizations.query_budget', logging.WARNING) as logs:
+            response = self.client.get('/repeated-queries/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('ran the same query 2 times (possible N+1)', logs.output[0])
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+    @override_settings(DEBUG=False)
+    def test_requests_are_not_recorded_without_debug(self):
+        response = self.client.get(f'/api/quizzes/quizzes/{self.quiz.id}/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(hasattr(response, 'query_stats'))
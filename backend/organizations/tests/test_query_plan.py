@@ -0,0 +1,61 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from courses.serializers import TopicSerializer
+from organizations.models import Organization, User
+from organizations.query_plan import serializer_plan
+from quizzes.models import Quiz, MultipleChoiceQuestion, Option
+from quizzes.serializers import MultipleChoiceQuestionSerializer
+
+
+class QueryPlanTests(TestCase):
+    """List endpoints load the relations their serializer reads up front."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        for index in range(5):
+            lesson = Lesson.objects.create(organization=cls.organization, module=module, name=f'Lesson {index}')
+            topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name=f'Topic {index}')
+            question = MultipleChoiceQuestion.objects.create(
+                organization=cls.organization, quiz=quiz, topic=topic, text=f'Question {index}'
+            )
+            for _ in range(index):
+                Option.objects.create(organization=cls.organization, question=question, text='Option')
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_plan_from_serializer_fields(self):
+        plan = serializer_plan(TopicSerializer)
+        self.assertEqual(plan.select, {'lesson', 'lesson__module', 'lesson__module__course'})
+        self.assertTrue(plan.complete)
+        self.assertIn('lesson__module__course__name', plan.columns)
+
+        # Method fields can't be planned: their Meta hints are used and all columns are loaded
+        plan = serializer_plan(MultipleChoiceQuestionSerializer)
+        self.assertIn('topic__lesson__module__course', plan.select)
+        self.assertEqual(plan.hints, ['refs__statistics', 'options'])
+        self.assertFalse(plan.complete)
+
+    def test_topic_list_joins_the_course_hierarchy(self):
+        # Page count and topics with their lesson, module and course
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/topics/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0]['course_name'], 'Course')
+
+    def test_question_list_prefetches_method_field_relations(self):
+        # Page count, questions with quiz and topic hierarchy, refs, statistics, options
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/quizzes/multiple-choice-questions/')
+        results = response.json()['results']
+        self.assertEqual(sorted(question['options_count'] for question in results), [0, 1, 2, 3, 4])
+        self.assertEqual(results[0]['course_name'], 'Course')
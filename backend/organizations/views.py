@@ -2,11 +2,12 @@ from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from .query_plan import QueryPlanMixin, plan_queryset
 from .models import Organization, User
 from .serializers import OrganizationSerializer, UserSerializer
 
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+class OrganizationViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Organization model."""
     
     queryset = Organization.objects.all()
@@ -21,12 +22,12 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     def users(self, request, pk=None):
         """Get all users for this organization."""
         organization = self.get_object()
-        users = User.objects.filter(organization=organization)
+        users = plan_queryset(User.objects.filter(organization=organization), UserSerializer)
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for User model."""
     
     queryset = User.objects.all()
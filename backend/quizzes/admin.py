@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Quiz, 
     MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion,
-    Option, OrderOption, ConnectOption, ConnectOptionConnection
+    Option, OrderOption, ConnectOption, ConnectOptionConnection, QuestionRef, QuestionStatistics,
+    QuizVersion
 )
 
 # Backward compatibility
@@ -129,4 +130,25 @@ class NumberQuestionAdmin(admin.ModelAdmin):
     list_filter = ['organization', 'question_type', 'topic__lesson__module__course', 'created_at']
     search_fields = ['text']
     readonly_fields = ['question_type']
-    fields = ['organization', 'text', 'question_type', 'image', 'video', 'hide_text', 'order', 'quiz', 'topic', 'correct_answer', 'tolerance']
\ No newline at end of file
+    fields = ['organization', 'text', 'question_type', 'image', 'video', 'hide_text', 'order', 'quiz', 'topic', 'correct_answer', 'tolerance']
+
+
+@admin.register(QuestionRef)
+class QuestionRefAdmin(admin.ModelAdmin):
+    list_display = ['id', 'question_type', 'question_id', 'quiz', 'topic', 'order', 'organization']
+    list_filter = ['organization', 'question_type', 'quiz']
+    readonly_fields = ['question_type', 'question_content_type', 'question_id', 'quiz', 'topic', 'order', 'question_created_at']
+
+
+@admin.register(QuestionStatistics)
+class QuestionStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['question_ref', 'responses', 'p_value', 'point_biserial', 'computed_at']
+    list_filter = ['organization', 'question_ref__question_type']
+    readonly_fields = ['question_ref', 'responses', 'p_value', 'mean_score', 'point_biserial', 'option_rates', 'computed_at']
+
+
+@admin.register(QuizVersion)
+class QuizVersionAdmin(admin.ModelAdmin):
+    list_display = ['quiz', 'number', 'content_hash', 'created_at']
+    list_filter = ['organization']
+    readonly_fields = ['quiz', 'number', 'content_hash', 'snapshot', 'created_at']
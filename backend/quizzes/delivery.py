@@ -0,0 +1,197 @@
+"""Precompiled quiz delivery payload.
+
+``play_payload`` compiles everything a student needs to take a quiz (the
+questions of all types in quiz order, their options, connect layouts and
+media URLs) into one JSON document with a fixed number of queries. The
+document leaves out the answer keys: correct options, correct order
+positions, correct connections and number answers. Options are listed in a
+fixed secret permutation per question, so their position gives nothing away.
+
+The encoded document is cached per quiz together with a strong ETag (the
+SHA-256 of the bytes), and the signal handlers in ``quizzes.signals``
+invalidate it whenever the quiz, one of its questions or one of their
+options changes. A quiz with a published ``QuizVersion`` is delivered from
+the version's snapshot instead; that payload is cached per version and
+never goes stale, since versions don't change.
+
+Besides the document itself, the cache holds the encoded pieces it is
+joined from (one per question and per option), so ``quizzes.shuffle`` can
+reassemble a per-student order of the same cached payload without decoding
+or re-encoding any JSON.
+"""
+import hashlib
+import json
+import random
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import (
+    MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion,
+    Option, OrderOption, ConnectOption, QuizVersion
+)
+
+
+# A compiled payload: the encoded JSON document and its strong ETag, plus the
+# pieces it is joined from: the encoded head of the document and, per question,
+# its encoded fields without the closing brace and its encoded options (None
+# for question types without options)
+CompiledPayload = namedtuple('CompiledPayload', ['body', 'etag', 'head', 'questions'])
+
+QUESTION_FIELDS = ['id', 'question_type', 'text', 'hide_text', 'image', 'video', 'order', 'topic_id', 'created_at']
+
+
+def play_cache_key(quiz_id):
+    return f'quizzes:play:{quiz_id}'
+
+
+def version_play_cache_key(version_id):
+    return f'quizzes:play:version:{version_id}'
+
+
+def invalidate_play_payload(*quiz_ids):
+    """Drop the cached payloads of the given quizzes."""
+    keys = [play_cache_key(quiz_id) for quiz_id in quiz_ids if quiz_id is not None]
+    if keys:
+        cache.delete_many(keys)
+
+
+def _media_url(field, name):
+    """Return the storage URL of a stored file name, or None if there is no file."""
+    return field.storage.url(name) if name else None
+
+
+def _rows(queryset, fields):
+    """Return ``values()`` rows with file fields replaced by their URLs."""
+    file_fields = {
+        field.name: field for field in queryset.model._meta.fields
+        if field.name in fields and field.get_internal_type() in ('FileField', 'ImageField')
+    }
+    rows = list(queryset.values(*fields))
+    for row in rows:
+        for name, field in file_fields.items():
+            row[name] = _media_url(field, row[name])
+    return rows
+
+
+def option_permutation_seed(question_type, question_id):
+    """Return the seed of the fixed order a question's options are delivered in.
+
+    It includes the secret key: a seed anyone can compute would let the
+    permutation be undone back to id order.
+    """
+    key = f'{settings.SECRET_KEY}:{question_type}:{question_id}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _options(queryset, fields, question_type):
+    """Group option rows by question id, each question's options in a fixed permutation.
+
+    Authors tend to create options in answer order (the correct choice
+    first, order steps in sequence), so neither id nor e.g.
+    ``correct_order`` order may show through. The permutation is seeded per
+    question and applied to the options in id order, so the payload stays
+    the same between compilations.
+    """
+    options = {}
+    for row in _rows(queryset.order_by('id'), ['question_id', *fields]):
+        options.setdefault(row.pop('question_id'), []).append(row)
+    for question_id, rows in options.items():
+        random.Random(option_permutation_seed(question_type, question_id)).shuffle(rows)
+    return options
+
+
+def build_play_payload(quiz):
+    """Compile the delivery document of a quiz as a dict.
+
+    Runs one query per question type and one per option type, however many
+    questions the quiz has.
+    """
+    questions = []
+    for model in (MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion):
+        questions.extend(_rows(model.objects.filter(quiz=quiz).order_by(), QUESTION_FIELDS))
+    questions.sort(key=lambda question: (question['order'], question['created_at']))
+
+    options = {
+        'multiple_choice': _options(
+            Option.objects.filter(question__quiz=quiz), ['id', 'text', 'image', 'hide_text'], 'multiple_choice'
+        ),
+        'order': _options(
+            OrderOption.objects.filter(question__quiz=quiz), ['id', 'text', 'image', 'hide_text'], 'order'
+        ),
+        'connect': _options(
+            ConnectOption.objects.filter(question__quiz=quiz), [
+                'id', 'text', 'image', 'hide_text', 'connectable', 'position_x', 'position_y', 'width', 'height'
+            ], 'connect'
+        ),
+    }
+    for question in questions:
+        del question['created_at']
+        question['topic'] = question.pop('topic_id')
+        if question['question_type'] in options:
+            question['options'] = options[question['question_type']].get(question['id'], [])
+
+    return {
+        'quiz': {'id': quiz.id, 'name': quiz.name, 'description': quiz.description},
+        'questions': questions,
+    }
+
+
+def _encode(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def assemble_play_payload(head, questions):
+    """Join encoded payload pieces, in the given order, into the document's bytes."""
+    parts = []
+    for fields, options in questions:
+        if options is None:
+            parts.append(fields + b'}')
+        else:
+            parts.append(fields + b',"options":[' + b','.join(options) + b']}')
+    return head + b','.join(parts) + b']}'
+
+
+def _compile(document):
+    head = b'{"quiz":' + _encode(document['quiz']) + b',"questions":['
+    questions = []
+    for question in document['questions']:
+        question = dict(question)
+        options = question.pop('options', None)
+        questions.append((
+            _encode(question)[:-1],
+            None if options is None else tuple(_encode(option) for option in options)
+        ))
+    body = assemble_play_payload(head, questions)
+    return CompiledPayload(body, f'"{hashlib.sha256(body).hexdigest()}"', head, tuple(questions))
+
+
+def compile_play_payload(quiz):
+    """Encode the delivery document of a quiz and compute its ETag."""
+    return _compile(build_play_payload(quiz))
+
+
+def compile_version_play_payload(version_id):
+    """Encode the delivery document frozen in a QuizVersion, with one primary-key lookup."""
+    snapshot = QuizVersion.objects.values_list('snapshot', flat=True).get(pk=version_id)
+    return _compile({'quiz': snapshot['quiz'], 'questions': snapshot['questions']})
+
+
+def play_payload(quiz):
+    """Return the cached CompiledPayload of a quiz, compiling it on a cache miss.
+
+    Delivers the published version of the quiz if it has one, and its live
+    questions otherwise.
+    """
+    version_id = quiz.published_version_id
+    key = version_play_cache_key(version_id) if version_id else play_cache_key(quiz.id)
+    payload = cache.get(key)
+    if payload is None:
+        if version_id:
+            payload = compile_version_play_payload(version_id)
+        else:
+            payload = compile_play_payload(quiz)
+        cache.set(key, tuple(payload), timeout=None)
+    return CompiledPayload(*payload)
@@ -0,0 +1,132 @@
+"""Question-bank quiz generation with stratified random sampling by topic.
+
+``generate_question_set`` draws N questions of all four types from the
+topics of a module, allocating them across topics in proportion to topic
+weights (the topic's pool size by default) and sampling each topic's pool
+uniformly with a seeded random generator, so every seed gets its own
+reproducible draw.
+
+No ``ORDER BY RANDOM()`` is involved: the pools are the QuestionRef ids of
+each topic, read from the registry with one indexed query per module and
+cached as compact integer arrays until the question bank changes. A draw
+for a new seed is then sampled in memory and resolved with one primary-key
+query, and the drawn set itself is cached per seed.
+"""
+import hashlib
+import random
+import uuid
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import QuestionRef
+
+
+BANK_VERSION_KEY = 'quizzes:bank-version'
+
+
+def bank_version():
+    """Return the token of the current state of the question bank."""
+    version = cache.get(BANK_VERSION_KEY)
+    if version is None:
+        cache.add(BANK_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(BANK_VERSION_KEY)
+    return version
+
+
+def invalidate_question_bank():
+    """Drop all cached topic pools and generated question sets."""
+    cache.set(BANK_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def topic_pools(module_id, version=None):
+    """Return a dict of topic id -> array of the QuestionRef ids of the topic's questions.
+
+    Cached per module until the question bank changes.
+    """
+    version = version or bank_version()
+    key = f'quizzes:bank:{module_id}:{version}'
+    pools = cache.get(key)
+    if pools is None:
+        pools = {}
+        rows = QuestionRef.objects.filter(topic__lesson__module_id=module_id).order_by(
+            'topic_id', 'id'
+        ).values_list('topic_id', 'id')
+        for topic_id, ref_id in rows.iterator(chunk_size=10000):
+            pools.setdefault(topic_id, array('q')).append(ref_id)
+        cache.set(key, pools, timeout=settings.QUIZ_GENERATION_CACHE_TIMEOUT)
+    return pools
+
+
+def allocate(count, sizes, weights):
+    """Split ``count`` questions across topics in proportion to their weights.
+
+    ``sizes`` and ``weights`` are dicts of topic id -> pool size and weight.
+    Shares are rounded with the largest-remainder method and capped at the
+    pool sizes; what a topic can't take goes to the others. Returns a dict
+    of topic id -> number of questions.
+    """
+    allocation = {topic_id: 0 for topic_id in sizes}
+    active = {topic_id: weight for topic_id, weight in weights.items() if weight > 0 and sizes.get(topic_id)}
+    remaining = min(count, sum(sizes[topic_id] for topic_id in active))
+    while remaining and active:
+        total = sum(active.values())
+        shares = {topic_id: remaining * weight / total for topic_id, weight in active.items()}
+        grants = {topic_id: int(share) for topic_id, share in shares.items()}
+        by_remainder = sorted(active, key=lambda topic_id: (grants[topic_id] - shares[topic_id], topic_id))
+        for topic_id in by_remainder[:remaining - sum(grants.values())]:
+            grants[topic_id] += 1
+        for topic_id, grant in grants.items():
+            grant = min(grant, sizes[topic_id] - allocation[topic_id])
+            allocation[topic_id] += grant
+            remaining -= grant
+        active = {topic_id: weight for topic_id, weight in active.items() if allocation[topic_id] < sizes[topic_id]}
+    return allocation
+
+
+def _set_cache_key(module_id, count, seed, weights, version):
+    weights = ','.join(f'{topic_id}:{weight}' for topic_id, weight in sorted((weights or {}).items()))
+    digest = hashlib.sha256(f'{count}|{weights}|{seed}'.encode('utf-8')).hexdigest()
+    return f'quizzes:generated:{module_id}:{version}:{digest}'
+
+
+def generate_question_set(module, count, seed, weights=None):
+    """Draw ``count`` questions from the topics of a module for a seed.
+
+    ``weights`` is an optional dict of topic id -> weight; without it the
+    questions are allocated in proportion to the topics' pool sizes, and
+    with it only topics with a positive weight are drawn from. Returns a
+    list of dicts with ``question_type``, ``question_id`` and ``topic``, in
+    a seeded random order; fewer than ``count`` if the pools are smaller.
+    The same module, count, weights and seed give the same set until the
+    question bank changes.
+    """
+    module_id = getattr(module, 'pk', module)
+    version = bank_version()
+    key = _set_cache_key(module_id, count, seed, weights, version)
+    questions = cache.get(key)
+    if questions is not None:
+        return questions
+
+    pools = topic_pools(module_id, version)
+    sizes = {topic_id: len(pool) for topic_id, pool in pools.items()}
+    allocation = allocate(count, sizes, weights if weights is not None else sizes)
+    picked = []
+    for topic_id, number in sorted(allocation.items()):
+        if number:
+            picked.extend(random.Random(f'{seed}:{topic_id}').sample(pools[topic_id], number))
+    random.Random(f'{seed}:order').shuffle(picked)
+
+    refs = {
+        ref_id: (question_type, question_id, topic_id)
+        for ref_id, question_type, question_id, topic_id in QuestionRef.objects.filter(
+            id__in=picked
+        ).order_by().values_list('id', 'question_type', 'question_id', 'topic_id')
+    } if picked else {}
+    questions = [
+        {'question_type': question_type, 'question_id': question_id, 'topic': topic_id}
+        for question_type, question_id, topic_id in (refs[ref_id] for ref_id in picked if ref_id in refs)
+    ]
+    cache.set(key, questions, timeout=settings.QUIZ_GENERATION_CACHE_TIMEOUT)
+    return questions
@@ -0,0 +1,136 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+QUESTION_MODELS = ["multiplechoicequestion", "orderquestion", "connectquestion", "numberquestion"]
+
+
+def populate_question_refs(apps, schema_editor):
+    """Create a registry row for every existing question."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    QuestionRef = apps.get_model("quizzes", "QuestionRef")
+    for model_name in QUESTION_MODELS:
+        model = apps.get_model("quizzes", model_name)
+        content_type, _ = ContentType.objects.get_or_create(app_label="quizzes", model=model_name)
+        QuestionRef.objects.bulk_create(
+            [
+                QuestionRef(
+                    organization_id=question.organization_id,
+                    question_type=question.question_type,
+                    question_content_type=content_type,
+                    question_id=question.id,
+                    quiz_id=question.quiz_id,
+                    topic_id=question.topic_id,
+                    order=question.order,
+                    question_created_at=question.created_at,
+                )
+                for question in model.objects.all().iterator()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("courses", "0005_remove_material_lesson_remove_material_module_and_more"),
+        ("organizations", "0001_initial"),
+        ("quizzes", "0010_connectoption_connectable"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionRef",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "question_type",
+                    models.CharField(
+                        choices=[
+                            ("multiple_choice", "Multiple Choice"),
+                            ("order", "Order"),
+                            ("connect", "Connect"),
+                            ("number", "Number"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("question_id", models.PositiveIntegerField()),
+                ("order", models.PositiveIntegerField(default=0)),
+                ("question_created_at", models.DateTimeField()),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="organizations.organization",
+                    ),
+                ),
+                (
+                    "question_content_type",
+                    models.ForeignKey(
+                        limit_choices_to={
+                            "model__in": [
+                                "multiplechoicequestion",
+                                "orderquestion",
+                                "connectquestion",
+                                "numberquestion",
+                            ]
+                        },
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+                (
+                    "quiz",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="question_refs",
+                        to="quizzes.quiz",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="question_refs",
+                        to="courses.topic",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["order", "question_created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["quiz", "order", "question_created_at"],
+                        name="questionref_quiz_order_idx",
+                    ),
+                    models.Index(
+                        fields=["topic", "question_type"],
+                        name="questionref_topic_type_idx",
+                    ),
+                    models.Index(
+                        fields=["organization", "question_type"],
+                        name="questionref_org_type_idx",
+                    ),
+                ],
+                "unique_together": {("question_content_type", "question_id")},
+            },
+        ),
+        migrations.RunPython(populate_question_refs, migrations.RunPython.noop),
+    ]
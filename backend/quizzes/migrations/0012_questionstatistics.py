@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0001_initial"),
+        ("quizzes", "0011_questionref"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionStatistics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("responses", models.PositiveIntegerField(default=0)),
+                (
+                    "p_value",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Difficulty: fraction of responses that are correct",
+                        null=True,
+                    ),
+                ),
+                (
+                    "mean_score",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Mean partial-credit score of the responses",
+                        null=True,
+                    ),
+                ),
+                (
+                    "point_biserial",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Discrimination: correlation between answering this question correctly and the rest score",
+                        null=True,
+                    ),
+                ),
+                (
+                    "option_rates",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Selection rate per option id (multiple choice questions only)",
+                    ),
+                ),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="organizations.organization",
+                    ),
+                ),
+                (
+                    "question_ref",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="statistics",
+                        to="quizzes.questionref",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Question statistics",
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        ('quizzes', '0012_questionstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('number', models.PositiveIntegerField()),
+                ('content_hash', models.CharField(help_text='SHA-256 of the canonical JSON encoding of the snapshot', max_length=64)),
+                ('snapshot', models.JSONField()),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_set', to='organizations.organization')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='quizzes.quiz')),
+            ],
+            options={
+                'ordering': ['quiz', 'number'],
+                'unique_together': {('quiz', 'number')},
+            },
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='published_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='quizzes.quizversion'),
+        ),
+    ]
@@ -1,4 +1,9 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.core.exceptions import ValidationError
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from organizations.models import OrganizationModel
 
 
@@ -31,6 +36,18 @@ class Quiz(OrganizationModel):
         related_name='quizzes',
         blank=True
     )
+    # Deliver questions and options in a per-student order (see quizzes.shuffle)
+    shuffle_questions = models.BooleanField(default=False)
+    shuffle_options = models.BooleanField(default=False)
+    # The version students take and are graded against; None delivers the live questions
+    published_version = models.ForeignKey(
+        'QuizVersion',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False
+    )
     
     class Meta:
         ordering = ['created_at']
@@ -42,14 +59,34 @@ class Quiz(OrganizationModel):
         return self.name
     
     def get_all_questions(self):
-        """Get all questions of any type for this quiz."""
-        questions = []
-        # Use the related_name from BaseQuestion: %(class)s_questions
-        questions.extend(self.multiplechoicequestion_questions.all())
-        questions.extend(self.orderquestion_questions.all())
-        questions.extend(self.connectquestion_questions.all())
-        questions.extend(self.numberquestion_questions.all())
-        return sorted(questions, key=lambda q: (q.order, q.created_at))
+        """Get all questions of any type for this quiz, in quiz order.
+        
+        The order comes from the QuestionRef registry; the concrete questions
+        are then loaded with one query per question type.
+        """
+        refs = self.question_refs.prefetch_related('question')
+        return [ref.question for ref in refs if ref.question is not None]
+    
+    def iter_questions(self):
+        """Get a lazy stream of all questions of any type for this quiz, in quiz order.
+        
+        The question tables are read already ordered and merged as they are
+        iterated; the stream supports ``only()`` and slicing, e.g.
+        ``quiz.iter_questions().only('text')[20:40]``.
+        """
+        from .streaming import QuestionStream
+        return QuestionStream(self)
+    
+    @staticmethod
+    def generate_questions(module, count, seed, weights=None):
+        """Draw a question set of ``count`` questions from the question bank of a module.
+        
+        Questions of all types are sampled per topic, stratified by topic
+        weight, reproducibly for each seed; see
+        ``quizzes.generation.generate_question_set``.
+        """
+        from .generation import generate_question_set
+        return generate_question_set(module, count, seed, weights=weights)
 
 
 class BaseQuestion(OrganizationModel):
@@ -87,6 +124,12 @@ class BaseQuestion(OrganizationModel):
         on_delete=models.CASCADE,
         related_name='%(class)s_questions'
     )
+    # Registry row in QuestionRef; deleted together with the question
+    refs = GenericRelation(
+        'quizzes.QuestionRef',
+        content_type_field='question_content_type',
+        object_id_field='question_id'
+    )
     
     class Meta:
         abstract = True
@@ -259,5 +302,143 @@ class NumberQuestion(BaseQuestion):
         return f"{self.topic.name} - {self.text[:50]}... (answer: {self.correct_answer})"
 
 
+class QuestionRef(OrganizationModel):
+    """Registry of all questions of any type under a single global id.
+    
+    Each row mirrors the quiz, topic, order and creation time of one concrete
+    question and is kept in sync by the signal handlers in
+    ``quizzes.signals``. Listing, ordering, counting and looking up questions
+    across all four question tables is a single indexed query on this table.
+    """
+    
+    question_type = models.CharField(
+        max_length=20,
+        choices=BaseQuestion.QUESTION_TYPE_CHOICES
+    )
+    question_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        limit_choices_to={'model__in': ['multiplechoicequestion', 'orderquestion', 'connectquestion', 'numberquestion']}
+    )
+    question_id = models.PositiveIntegerField()
+    question = GenericForeignKey('question_content_type', 'question_id')
+    quiz = models.ForeignKey(
+        Quiz,
+        on_delete=models.CASCADE,
+        related_name='question_refs',
+        null=True,
+        blank=True
+    )
+    topic = models.ForeignKey(
+        'courses.Topic',
+        on_delete=models.CASCADE,
+        related_name='question_refs'
+    )
+    order = models.PositiveIntegerField(default=0)
+    question_created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['order', 'question_created_at']
+        unique_together = ['question_content_type', 'question_id']
+        indexes = [
+            models.Index(fields=['quiz', 'order', 'question_created_at'], name='questionref_quiz_order_idx'),
+            models.Index(fields=['topic', 'question_type'], name='questionref_topic_type_idx'),
+            models.Index(fields=['organization', 'question_type'], name='questionref_org_type_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.question_type} #{self.question_id}"
+
+
+def question_count_subquery(quiz_ref='pk'):
+    """Return an expression counting the questions of all types of the quiz at ``quiz_ref``.
+    
+    A correlated subquery on the QuestionRef registry, for annotating quiz
+    querysets without a COUNT query per quiz.
+    """
+    counts = QuestionRef.objects.filter(quiz=OuterRef(quiz_ref)).order_by().values('quiz').annotate(
+        total=Count('id')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class QuestionStatistics(OrganizationModel):
+    """Item-analysis statistics of a question, computed from student answers.
+    
+    Written in batches by ``students.item_analysis.compute_item_statistics``
+    (the ``compute_item_statistics`` management command or the quiz
+    ``item-statistics`` endpoint) and read as-is by the question serializers.
+    """
+    
+    question_ref = models.OneToOneField(
+        QuestionRef,
+        on_delete=models.CASCADE,
+        related_name='statistics'
+    )
+    responses = models.PositiveIntegerField(default=0)
+    p_value = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Difficulty: fraction of responses that are correct"
+    )
+    mean_score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Mean partial-credit score of the responses"
+    )
+    point_biserial = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Discrimination: correlation between answering this question correctly and the rest score"
+    )
+    option_rates = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Selection rate per option id (multiple choice questions only)"
+    )
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = 'Question statistics'
+    
+    def __str__(self):
+        return f"Statistics for {self.question_ref}"
+
+
+class QuizVersion(OrganizationModel):
+    """An immutable published snapshot of a quiz.
+    
+    ``snapshot`` holds the delivery document of the quiz (questions, options
+    and connect layouts, without answer keys) under ``quiz`` and
+    ``questions``, plus the answer key and hierarchy placement of every
+    question under ``keys``. Written by ``quizzes.versions.publish_quiz``;
+    delivery and grading of a published quiz read only this row.
+    """
+    
+    quiz = models.ForeignKey(
+        Quiz,
+        on_delete=models.CASCADE,
+        related_name='versions'
+    )
+    number = models.PositiveIntegerField()
+    content_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the canonical JSON encoding of the snapshot"
+    )
+    snapshot = models.JSONField()
+    
+    class Meta:
+        ordering = ['quiz', 'number']
+        unique_together = ['quiz', 'number']
+    
+    def __str__(self):
+        return f"{self.quiz} v{self.number}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError('Published quiz versions cannot be changed.')
+        super().save(*args, **kwargs)
+
+
 # Backward compatibility alias
-Question = MultipleChoiceQuestion
\ No newline at end of file
+Question = MultipleChoiceQuestion
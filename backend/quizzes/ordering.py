@@ -0,0 +1,111 @@
+"""Sparse ordering keys for the questions of a quiz.
+
+Question ``order`` values are spaced ``ORDER_GAP`` apart, so moving one
+question in front of another only gives that question a key between its
+new neighbours: one row of its question table and its QuestionRef row are
+written. Only when two neighbours have no key left between them is the
+whole quiz renumbered, with a single ``CASE`` UPDATE per question table
+(and one for the QuestionRef registry) in one transaction.
+
+Updates bypass ``save()`` and the signal handlers, so the registry and the
+cached delivery payload are kept in sync here.
+"""
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, Q, Value, When
+
+from .delivery import invalidate_play_payload
+from .models import MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion, QuestionRef
+
+
+ORDER_GAP = 1024
+
+QUESTION_MODELS = {
+    'multiple_choice': MultipleChoiceQuestion,
+    'order': OrderQuestion,
+    'connect': ConnectQuestion,
+    'number': NumberQuestion,
+}
+
+
+def _order_case(whens):
+    return Case(*whens, output_field=models.PositiveIntegerField())
+
+
+def write_orders(quiz, orders):
+    """Set the order of questions of a quiz with one UPDATE per question table.
+
+    ``orders`` is a dict of question type -> {question id -> order}.
+    Questions that aren't part of the quiz are ignored. Returns the number
+    of questions written.
+    """
+    orders = {question_type: id_orders for question_type, id_orders in orders.items() if id_orders}
+    if not orders:
+        return 0
+    updated = 0
+    with transaction.atomic():
+        for question_type, id_orders in orders.items():
+            updated += QUESTION_MODELS[question_type].objects.filter(quiz=quiz, id__in=id_orders).update(
+                order=_order_case([When(id=question_id, then=Value(order)) for question_id, order in id_orders.items()])
+            )
+        QuestionRef.objects.filter(reduce(or_, (
+            Q(question_type=question_type, question_id__in=id_orders)
+            for question_type, id_orders in orders.items()
+        )), quiz=quiz).update(order=_order_case([
+            When(question_type=question_type, question_id=question_id, then=Value(order))
+            for question_type, id_orders in orders.items()
+            for question_id, order in id_orders.items()
+        ]))
+    invalidate_play_payload(quiz.id)
+    return updated
+
+
+def renumber(quiz, keys):
+    """Give the questions ``keys`` ((question type, question id) pairs), in that order, evenly spaced orders."""
+    orders = {}
+    for position, (question_type, question_id) in enumerate(keys, start=1):
+        orders.setdefault(question_type, {})[question_id] = position * ORDER_GAP
+    return write_orders(quiz, orders)
+
+
+def _key_between(previous, following):
+    """Return an order strictly between two neighbours' orders (None for no neighbour), or None if there is none."""
+    if following is None:
+        return ORDER_GAP if previous is None else previous + ORDER_GAP
+    if previous is None:
+        return following // 2 if following > 0 else None
+    return (previous + following) // 2 if following - previous > 1 else None
+
+
+def move_question(quiz, question, before=None):
+    """Move a question of a quiz in front of another one, or to the end if ``before`` is None.
+
+    ``question`` and ``before`` are (question type, question id) pairs.
+    Writes only the moved question unless its new neighbours have adjacent
+    orders, in which case the whole quiz is renumbered. Raises
+    ValidationError if either question isn't part of the quiz. Returns the
+    number of questions written.
+    """
+    with transaction.atomic():
+        sequence = list(QuestionRef.objects.select_for_update().filter(quiz=quiz).order_by(
+            'order', 'question_created_at'
+        ).values_list('question_type', 'question_id', 'order'))
+        orders = {(question_type, question_id): order for question_type, question_id, order in sequence}
+        if question not in orders:
+            raise ValidationError(f'Question {question[0]} #{question[1]} is not part of this quiz.')
+        if before is not None and (before not in orders or before == question):
+            raise ValidationError(f'Question {before[0]} #{before[1]} is not another question of this quiz.')
+
+        keys = [key for key in orders if key != question]
+        index = keys.index(before) if before is not None else len(keys)
+        order = _key_between(
+            orders[keys[index - 1]] if index > 0 else None,
+            orders[keys[index]] if index < len(keys) else None
+        )
+        if order is not None:
+            return write_orders(quiz, {question[0]: {question[1]: order}})
+        keys.insert(index, question)
+        return renumber(quiz, keys)
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from courses.models import Module
 from .models import (
-    Quiz, 
+    Quiz, QuizVersion, BaseQuestion,
     MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion,
-    Option, OrderOption, ConnectOption, ConnectOptionConnection
+    Option, OrderOption, ConnectOption, ConnectOptionConnection, QuestionRef, QuestionStatistics
 )
 
 # Backward compatibility
@@ -60,6 +61,33 @@ class ConnectOptionConnectionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class QuestionStatisticsSerializer(serializers.ModelSerializer):
+    """Serializer for the stored item-analysis statistics of a question."""
+    
+    question_type = serializers.CharField(source='question_ref.question_type', read_only=True)
+    question_id = serializers.IntegerField(source='question_ref.question_id', read_only=True)
+    
+    class Meta:
+        model = QuestionStatistics
+        fields = [
+            'question_type', 'question_id', 'responses', 'p_value', 'mean_score',
+            'point_biserial', 'option_rates', 'computed_at'
+        ]
+        read_only_fields = fields
+
+
+def quiz_question_statistics(quiz):
+    """Return the stored statistics of all questions in ``quiz``, keyed by (question type, question id).
+
+    One query for every question type, passed to the quiz's question
+    serializers as the ``question_statistics`` context.
+    """
+    return {
+        (statistics.question_ref.question_type, statistics.question_ref.question_id): statistics
+        for statistics in QuestionStatistics.objects.filter(question_ref__quiz=quiz).select_related('question_ref')
+    }
+
+
 class BaseQuestionSerializer(serializers.ModelSerializer):
     """Base serializer for all question types."""
     
@@ -68,15 +96,36 @@ class BaseQuestionSerializer(serializers.ModelSerializer):
     lesson_name = serializers.CharField(source='topic.lesson.name', read_only=True)
     module_name = serializers.CharField(source='topic.lesson.module.name', read_only=True)
     course_name = serializers.CharField(source='topic.lesson.module.course.name', read_only=True)
+    statistics = serializers.SerializerMethodField()
     
     class Meta:
         fields = [
             'id', 'text', 'order', 'question_type', 'image', 'video', 'hide_text',
             'organization', 'quiz', 'topic',
             'quiz_name', 'topic_name', 'lesson_name', 'module_name', 'course_name',
-            'created_at', 'updated_at'
+            'statistics', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'question_type', 'created_at', 'updated_at']
+        # Relations read by method fields, loaded by organizations.query_plan.QueryPlanMixin
+        prefetch_related = ['refs__statistics']
+    
+    def get_statistics(self, obj):
+        """Stored item statistics, or None if they haven't been computed yet.
+        
+        Read from the ``question_statistics`` context when the view loaded
+        them (see ``quiz_question_statistics``), otherwise from the refs:
+        prefetch ``refs__statistics`` (``Meta.prefetch_related``) to avoid a
+        query per question.
+        """
+        question_statistics = self.context.get('question_statistics')
+        if question_statistics is not None:
+            statistics = question_statistics.get((obj.question_type, obj.id))
+            return QuestionStatisticsSerializer(statistics).data if statistics is not None else None
+        for ref in obj.refs.all():
+            statistics = getattr(ref, 'statistics', None)
+            if statistics is not None:
+                return QuestionStatisticsSerializer(statistics).data
+        return None
 
 
 class MultipleChoiceQuestionSerializer(BaseQuestionSerializer):
@@ -87,6 +136,7 @@ class MultipleChoiceQuestionSerializer(BaseQuestionSerializer):
     class Meta(BaseQuestionSerializer.Meta):
         model = MultipleChoiceQuestion
         fields = BaseQuestionSerializer.Meta.fields + ['options_count']
+        prefetch_related = BaseQuestionSerializer.Meta.prefetch_related + ['options']
     
     def get_options_count(self, obj):
         return obj.options.count()
@@ -109,6 +159,7 @@ class OrderQuestionSerializer(BaseQuestionSerializer):
     class Meta(BaseQuestionSerializer.Meta):
         model = OrderQuestion
         fields = BaseQuestionSerializer.Meta.fields + ['order_options_count']
+        prefetch_related = BaseQuestionSerializer.Meta.prefetch_related + ['order_options']
     
     def get_order_options_count(self, obj):
         return obj.order_options.count()
@@ -132,6 +183,7 @@ class ConnectQuestionSerializer(BaseQuestionSerializer):
     class Meta(BaseQuestionSerializer.Meta):
         model = ConnectQuestion
         fields = BaseQuestionSerializer.Meta.fields + ['connect_options_count', 'connections_count']
+        prefetch_related = BaseQuestionSerializer.Meta.prefetch_related + ['connect_options', 'correct_connections']
     
     def get_connect_options_count(self, obj):
         return obj.connect_options.count()
@@ -165,11 +217,97 @@ class NumberQuestionDetailSerializer(NumberQuestionSerializer):
         fields = NumberQuestionSerializer.Meta.fields
 
 
+class QuizMultipleChoiceQuestionSerializer(MultipleChoiceQuestionSerializer):
+    """MultipleChoiceQuestion of a quiz, with its statistics from the ``question_statistics`` context."""
+    
+    class Meta(MultipleChoiceQuestionSerializer.Meta):
+        prefetch_related = ['options']
+
+
+class QuizOrderQuestionSerializer(OrderQuestionSerializer):
+    """OrderQuestion of a quiz, with its statistics from the ``question_statistics`` context."""
+    
+    class Meta(OrderQuestionSerializer.Meta):
+        prefetch_related = ['order_options']
+
+
+class QuizConnectQuestionSerializer(ConnectQuestionSerializer):
+    """ConnectQuestion of a quiz, with its statistics from the ``question_statistics`` context."""
+    
+    class Meta(ConnectQuestionSerializer.Meta):
+        prefetch_related = ['connect_options', 'correct_connections']
+
+
+class QuizNumberQuestionSerializer(NumberQuestionSerializer):
+    """NumberQuestion of a quiz, with its statistics from the ``question_statistics`` context."""
+    
+    class Meta(NumberQuestionSerializer.Meta):
+        prefetch_related = []
+
+
 # Backward compatibility aliases
 QuestionSerializer = MultipleChoiceQuestionSerializer
 QuestionDetailSerializer = MultipleChoiceQuestionDetailSerializer
 
 
+class QuestionRefSerializer(serializers.ModelSerializer):
+    """Serializer for QuestionRef, the registry of questions of all types."""
+    
+    class Meta:
+        model = QuestionRef
+        fields = [
+            'id', 'question_type', 'question_id', 'quiz', 'topic', 'order',
+            'organization', 'question_created_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class QuizVersionSerializer(serializers.ModelSerializer):
+    """Serializer for QuizVersion metadata; the snapshot itself is served by the quiz play endpoint."""
+    
+    class Meta:
+        model = QuizVersion
+        fields = ['id', 'quiz', 'number', 'content_hash', 'organization', 'created_at']
+        read_only_fields = fields
+
+
+class QuestionSetRequestSerializer(serializers.Serializer):
+    """Parameters of a question set drawn from the question bank of a module."""
+    
+    module = serializers.PrimaryKeyRelatedField(queryset=Module.objects.all())
+    count = serializers.IntegerField(min_value=1, max_value=1000)
+    seed = serializers.CharField(max_length=255)
+    weights = serializers.DictField(
+        child=serializers.FloatField(min_value=0), required=False,
+        help_text="Topic id -> weight; defaults to the number of questions of each topic"
+    )
+    
+    def validate_weights(self, weights):
+        try:
+            return {int(topic_id): weight for topic_id, weight in weights.items()}
+        except ValueError:
+            raise serializers.ValidationError('Keys must be topic ids.')
+
+
+class QuestionKeySerializer(serializers.Serializer):
+    """A question of any type, identified by its type and id."""
+    
+    question_type = serializers.ChoiceField(choices=BaseQuestion.QUESTION_TYPE_CHOICES)
+    question_id = serializers.IntegerField(min_value=1)
+
+
+class QuestionMoveSerializer(QuestionKeySerializer):
+    """A move of a question in front of another question of the quiz, or to the end if ``before`` is null."""
+    
+    before = QuestionKeySerializer(allow_null=True, required=False)
+
+
+class QuestionRenumberSerializer(serializers.Serializer):
+    """Question ids in their new order; each id is matched against every question type."""
+    
+    ordered_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+
+
 class QuizSerializer(serializers.ModelSerializer):
     """Serializer for Quiz model."""
     
@@ -182,33 +320,39 @@ class QuizSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'organization', 'course', 'module',
             'lessons', 'topics', 'course_name', 'module_name',
-            'questions_count', 'created_at', 'updated_at'
+            'shuffle_questions', 'shuffle_options', 'questions_count', 'published_version',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'published_version', 'created_at', 'updated_at']
     
     def get_questions_count(self, obj):
-        """Get total count of all question types."""
-        return (
-            obj.multiplechoicequestion_questions.count() +
-            obj.orderquestion_questions.count() +
-            obj.connectquestion_questions.count() +
-            obj.numberquestion_questions.count()
-        )
+        """Get total count of all question types.
+        
+        Reads the ``questions_count`` annotation of QuizViewSet's queryset,
+        counting through the registry only for quizzes loaded without it.
+        """
+        if hasattr(obj, 'questions_count'):
+            return obj.questions_count
+        return obj.question_refs.count()
 
 
 class QuizDetailSerializer(QuizSerializer):
-    """Detailed serializer for Quiz with all question types."""
+    """Detailed serializer for Quiz with all question types.
+    
+    Pass ``quiz_question_statistics(quiz)`` as the ``question_statistics``
+    context, otherwise reading each question's statistics costs a query.
+    """
     
-    multiple_choice_questions = MultipleChoiceQuestionSerializer(
+    multiple_choice_questions = QuizMultipleChoiceQuestionSerializer(
         source='multiplechoicequestion_questions', many=True, read_only=True
     )
-    order_questions = OrderQuestionSerializer(
+    order_questions = QuizOrderQuestionSerializer(
         source='orderquestion_questions', many=True, read_only=True
     )
-    connect_questions = ConnectQuestionSerializer(
+    connect_questions = QuizConnectQuestionSerializer(
         source='connectquestion_questions', many=True, read_only=True
     )
-    number_questions = NumberQuestionSerializer(
+    number_questions = QuizNumberQuestionSerializer(
         source='numberquestion_questions', many=True, read_only=True
     )
     
@@ -0,0 +1,48 @@
+"""Deterministic per-student shuffling of quiz questions and options.
+
+Shuffling the delivery document per request would defeat its cache. Instead
+the question and option order of a student is derived from a hash of (quiz,
+published version, student), and the shared cached payload is reassembled
+in that order from its pre-encoded pieces: per request only a permutation
+of the questions and of each question's options is computed.
+
+The shuffled payload keeps the ids of questions and options, and answers
+are submitted by id, so grading needs no mapping back from positions.
+"""
+import hashlib
+import random
+
+from .delivery import CompiledPayload, assemble_play_payload
+
+
+def shuffle_seed(quiz, student_id):
+    """Return the seed of a student's order of a quiz.
+
+    The seed changes when the quiz is published at a new version, so a
+    student sees a stable order for as long as the content they take does.
+    """
+    key = f'{quiz.id}:{quiz.published_version_id or 0}:{student_id}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def shuffle_play_payload(payload, seed, questions=True, options=True):
+    """Return a CompiledPayload with its questions and/or each question's options reordered.
+
+    Question and option orders are drawn from separate random streams of
+    the seed, so enabling option shuffling doesn't change the question
+    order. The ETag combines the payload's ETag with the seed and the
+    enabled orders, so it changes whenever the bytes do.
+    """
+    pieces = list(payload.questions)
+    if options:
+        rng = random.Random(f'{seed}:options')
+        pieces = [
+            (fields, choices if choices is None else tuple(rng.sample(choices, len(choices))))
+            for fields, choices in pieces
+        ]
+    if questions:
+        random.Random(f'{seed}:questions').shuffle(pieces)
+    body = assemble_play_payload(payload.head, pieces)
+    flags = ('q' if questions else '') + ('o' if options else '')
+    etag = f'"{payload.etag[1:-1]}-{seed[:16]}{flags}"'
+    return CompiledPayload(body, etag, payload.head, tuple(pieces))
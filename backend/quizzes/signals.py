@@ -0,0 +1,99 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import Lesson, Topic
+from .delivery import invalidate_play_payload
+from .generation import invalidate_question_bank
+from .models import (
+    Quiz, MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion, QuestionRef,
+    Option, OrderOption, ConnectOption
+)
+
+
+def question_ref_fields(question):
+    """Return the QuestionRef fields mirrored from a concrete question."""
+    return {
+        'organization_id': question.organization_id,
+        'question_type': question.question_type,
+        'quiz_id': question.quiz_id,
+        'topic_id': question.topic_id,
+        'order': question.order,
+        'question_created_at': question.created_at,
+    }
+
+
+@receiver(post_save, sender=MultipleChoiceQuestion)
+@receiver(post_save, sender=OrderQuestion)
+@receiver(post_save, sender=ConnectQuestion)
+@receiver(post_save, sender=NumberQuestion)
+def sync_question_ref(sender, instance, created, raw=False, **kwargs):
+    """Create or update the registry row of a question.
+
+    Deletes need no handler: the ``refs`` GenericRelation on the question
+    removes its QuestionRef together with it.
+    """
+    content_type = ContentType.objects.get_for_model(sender)
+    fields = question_ref_fields(instance)
+    if not created and QuestionRef.objects.filter(
+        question_content_type=content_type, question_id=instance.id
+    ).update(**fields):
+        return
+    QuestionRef.objects.update_or_create(
+        question_content_type=content_type, question_id=instance.id, defaults=fields
+    )
+
+
+@receiver(pre_save, sender=MultipleChoiceQuestion)
+@receiver(pre_save, sender=OrderQuestion)
+@receiver(pre_save, sender=ConnectQuestion)
+@receiver(pre_save, sender=NumberQuestion)
+def invalidate_previous_quiz_payload(sender, instance, raw=False, **kwargs):
+    """Drop the delivery payload of the quiz a question is moved away from."""
+    if raw or instance.pk is None:
+        return
+    previous_quiz_id = sender.objects.filter(pk=instance.pk).values_list('quiz_id', flat=True).first()
+    if previous_quiz_id != instance.quiz_id:
+        invalidate_play_payload(previous_quiz_id)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_payload(sender, instance, **kwargs):
+    invalidate_play_payload(instance.pk)
+
+
+@receiver(post_save, sender=MultipleChoiceQuestion)
+@receiver(post_save, sender=OrderQuestion)
+@receiver(post_save, sender=ConnectQuestion)
+@receiver(post_save, sender=NumberQuestion)
+@receiver(post_delete, sender=MultipleChoiceQuestion)
+@receiver(post_delete, sender=OrderQuestion)
+@receiver(post_delete, sender=ConnectQuestion)
+@receiver(post_delete, sender=NumberQuestion)
+def invalidate_question_payload(sender, instance, **kwargs):
+    invalidate_play_payload(instance.quiz_id)
+    invalidate_question_bank()
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Lesson)
+def invalidate_topic_pools(sender, instance, **kwargs):
+    """Drop the cached topic pools, which group the questions of a module by topic."""
+    invalidate_question_bank()
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_save, sender=OrderOption)
+@receiver(post_save, sender=ConnectOption)
+@receiver(post_delete, sender=Option)
+@receiver(post_delete, sender=OrderOption)
+@receiver(post_delete, sender=ConnectOption)
+def invalidate_option_payload(sender, instance, **kwargs):
+    """Drop the delivery payload of the quiz an option's question belongs to."""
+    question_model = sender._meta.get_field('question').related_model
+    invalidate_play_payload(
+        question_model.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    )
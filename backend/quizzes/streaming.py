@@ -0,0 +1,81 @@
+"""Lazy, merged iteration over the questions of a quiz in quiz order.
+
+``Quiz.get_all_questions`` loads every question of a quiz with all its
+columns. ``QuestionStream`` (``Quiz.iter_questions()``) instead reads the
+four question tables as separate queries, each already ordered by
+(order, created_at, id) in the database and fetched in chunks, and merges
+them lazily with a k-way heap merge. Like a queryset it supports
+``only()`` column projection and slicing. A slice's stop bound is pushed
+into every query as a LIMIT, so paging through a quiz never reads more
+than the rows up to the end of the page.
+"""
+import heapq
+from itertools import islice
+
+from .models import MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion
+
+
+# Merge order of the question types among questions with the same order and creation time
+QUESTION_MODELS = [MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion]
+
+# Columns the merge sorts on, always loaded
+MERGE_FIELDS = ['order', 'created_at']
+
+
+class QuestionStream:
+    """The questions of all types of a quiz, merged lazily in (order, created_at) order."""
+
+    def __init__(self, quiz, fields=None, start=0, stop=None, chunk_size=500):
+        self.quiz = quiz
+        self.fields = fields
+        self.start = start
+        self.stop = stop
+        self.chunk_size = chunk_size
+
+    def _clone(self, **kwargs):
+        params = {
+            'fields': self.fields, 'start': self.start, 'stop': self.stop, 'chunk_size': self.chunk_size
+        }
+        params.update(kwargs)
+        return QuestionStream(self.quiz, **params)
+
+    def only(self, *fields):
+        """Return a stream that loads only the given fields (plus the id and the merge columns)."""
+        return self._clone(fields=fields)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key < 0:
+                raise ValueError('Negative indexing is not supported.')
+            try:
+                return next(iter(self[key:key + 1]))
+            except StopIteration:
+                raise IndexError('QuestionStream index out of range')
+        if not isinstance(key, slice):
+            raise TypeError('QuestionStream indices must be integers or slices')
+        if (key.start or 0) < 0 or (key.stop or 0) < 0 or key.step not in (None, 1):
+            raise ValueError('Negative indexing and slice steps are not supported.')
+        start = self.start + (key.start or 0)
+        stop = self.stop
+        if key.stop is not None:
+            stop = self.start + key.stop if stop is None else min(stop, self.start + key.stop)
+        return self._clone(start=start, stop=max(start, stop) if stop is not None else None)
+
+    def _rows(self, rank, model):
+        queryset = model.objects.filter(quiz=self.quiz).order_by('order', 'created_at', 'id')
+        if self.fields is not None:
+            queryset = queryset.only(*self.fields, *MERGE_FIELDS)
+        if self.stop is not None:
+            # Only the first `stop` questions of a type can be among the first `stop` of the quiz
+            queryset = queryset[:self.stop]
+        for question in queryset.iterator(chunk_size=self.chunk_size):
+            yield (question.order, question.created_at, rank, question.id), question
+
+    def __iter__(self):
+        if self.stop is not None and self.stop <= self.start:
+            return iter(())
+        merged = heapq.merge(
+            *(self._rows(rank, model) for rank, model in enumerate(QUESTION_MODELS)),
+            key=lambda row: row[0]
+        )
+        return (question for _, question in islice(merged, self.start, self.stop))
@@ -0,0 +1,97 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.generation import allocate
+from quizzes.models import Quiz, MultipleChoiceQuestion, NumberQuestion, OrderQuestion
+
+
+class QuestionSetGenerationTests(TestCase):
+    """Question sets are drawn per topic from the module's bank, reproducibly per seed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        cls.module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=cls.module, name='Lesson')
+        cls.topics = [
+            Topic.objects.create(organization=cls.organization, lesson=lesson, name=f'Topic {index}')
+            for index in range(3)
+        ]
+        # 30 questions of mixed types in the first topic, 10 in the second, none in the third
+        for index in range(30):
+            if index % 3 == 0:
+                MultipleChoiceQuestion.objects.create(
+                    organization=cls.organization, topic=cls.topics[0], text=f'A{index}'
+                )
+            elif index % 3 == 1:
+                OrderQuestion.objects.create(organization=cls.organization, topic=cls.topics[0], text=f'A{index}')
+            else:
+                NumberQuestion.objects.create(
+                    organization=cls.organization, topic=cls.topics[0], text=f'A{index}', correct_answer=index
+                )
+        for index in range(10):
+            NumberQuestion.objects.create(
+                organization=cls.organization, topic=cls.topics[1], text=f'B{index}', correct_answer=index
+            )
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        cache.clear()
+
+    def topic_counts(self, questions):
+        return Counter(question['topic'] for question in questions)
+
+    def test_allocation_is_proportional_and_capped(self):
+        self.assertEqual(allocate(8, {1: 30, 2: 10, 3: 0}, {1: 30, 2: 10, 3: 0}), {1: 6, 2: 2, 3: 0})
+        self.assertEqual(allocate(20, {1: 30, 2: 5}, {1: 1, 2: 1}), {1: 15, 2: 5})
+        self.assertEqual(allocate(100, {1: 30, 2: 10}, {1: 1, 2: 1}), {1: 30, 2: 10})
+
+    def test_draws_are_stratified_reproducible_and_cached(self):
+        questions = Quiz.generate_questions(self.module, 8, 'student-1')
+
+        self.assertEqual(self.topic_counts(questions), {self.topics[0].id: 6, self.topics[1].id: 2})
+        self.assertEqual(len({(q['question_type'], q['question_id']) for q in questions}), 8)
+        self.assertEqual(
+            Counter(q['question_type'] for q in Quiz.generate_questions(self.module, 40, 'all')),
+            {'multiple_choice': 10, 'order': 10, 'number': 20}
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(Quiz.generate_questions(self.module, 8, 'student-1'), questions)
+        # A new seed only resolves its draw against the cached topic pools
+        with self.assertNumQueries(1):
+            other = Quiz.generate_questions(self.module, 8, 'student-2')
+        self.assertNotEqual(other, questions)
+
+        cache.clear()
+        self.assertEqual(Quiz.generate_questions(self.module, 8, 'student-1'), questions)
+
+    def test_weights_and_bank_changes(self):
+        questions = Quiz.generate_questions(self.module, 5, 'seed', weights={self.topics[1].id: 1})
+        self.assertEqual(self.topic_counts(questions), {self.topics[1].id: 5})
+
+        NumberQuestion.objects.create(
+            organization=self.organization, topic=self.topics[2], text='C', correct_answer=1
+        )
+        questions = Quiz.generate_questions(self.module, 5, 'seed', weights={self.topics[2].id: 1})
+        self.assertEqual(self.topic_counts(questions), {self.topics[2].id: 1})
+
+    def test_generate_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post('/api/quizzes/quizzes/generate/', {
+            'module': self.module.id, 'count': 4, 'seed': 'abc',
+            'weights': {str(self.topics[0].id): 1, str(self.topics[1].id): 1},
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 4)
+        self.assertEqual(
+            self.topic_counts(response.json()['questions']), {self.topics[0].id: 2, self.topics[1].id: 2}
+        )
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization
+from quizzes.models import Quiz, MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion
+
+
+class QuestionStreamTests(TestCase):
+    """Quiz.iter_questions merges the question tables lazily in quiz order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        common = {'organization': cls.organization, 'quiz': cls.quiz, 'topic': topic}
+        for index in range(12):
+            order = (index * 7) % 12
+            if index % 4 == 0:
+                MultipleChoiceQuestion.objects.create(text=f'Q{order}', order=order, **common)
+            elif index % 4 == 1:
+                OrderQuestion.objects.create(text=f'Q{order}', order=order, **common)
+            elif index % 4 == 2:
+                ConnectQuestion.objects.create(text=f'Q{order}', order=order, **common)
+            else:
+                NumberQuestion.objects.create(text=f'Q{order}', order=order, correct_answer=order, **common)
+        # Same order as Q0, created earlier
+        earlier = MultipleChoiceQuestion.objects.create(text='Q0-earlier', order=0, **common)
+        created_at = timezone.now() - timedelta(days=1)
+        MultipleChoiceQuestion.objects.filter(pk=earlier.pk).update(created_at=created_at)
+        earlier.refs.update(question_created_at=created_at)
+
+    def test_merged_order_matches_get_all_questions(self):
+        texts = [question.text for question in self.quiz.iter_questions()]
+
+        self.assertEqual(texts, ['Q0-earlier'] + [f'Q{order}' for order in range(12)])
+        self.assertEqual(texts, [question.text for question in self.quiz.get_all_questions()])
+
+    def test_slicing_and_projection(self):
+        page = self.quiz.iter_questions().only('text')[4:8]
+
+        with self.assertNumQueries(4):
+            questions = list(page)
+        self.assertEqual([question.text for question in questions], ['Q3', 'Q4', 'Q5', 'Q6'])
+        self.assertEqual(questions[0].get_deferred_fields(), {
+            field.attname for field in type(questions[0])._meta.concrete_fields
+        } - {'id', 'text', 'order', 'created_at'})
+        self.assertEqual([q.text for q in page[1:3]], ['Q4', 'Q5'])
+        self.assertEqual(self.quiz.iter_questions()[12].text, 'Q11')
+        with self.assertRaises(IndexError):
+            self.quiz.iter_questions()[13]
+        self.assertEqual(list(self.quiz.iter_questions()[5:5]), [])
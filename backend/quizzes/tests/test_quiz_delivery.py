@@ -0,0 +1,201 @@
+import random
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.delivery import build_play_payload, option_permutation_seed, play_cache_key
+from students.models import Student, StudentQuestionAnswer
+from quizzes.models import (
+    Quiz, QuizVersion, MultipleChoiceQuestion, Option, OrderQuestion, OrderOption,
+    ConnectQuestion, ConnectOption, ConnectOptionConnection, NumberQuestion
+)
+
+
+class QuizPlayPayloadTests(TestCase):
+    """The play endpoint serves one cached document per quiz, invalidated on edits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+
+        cls.multiple_choice = MultipleChoiceQuestion.objects.create(
+            organization=cls.organization, quiz=cls.quiz, topic=topic, text='Pick', order=1
+        )
+        cls.option = Option.objects.create(
+            organization=cls.organization, question=cls.multiple_choice, text='Right', is_correct=True
+        )
+        Option.objects.create(organization=cls.organization, question=cls.multiple_choice, text='Wrong')
+        order = OrderQuestion.objects.create(
+            organization=cls.organization, quiz=cls.quiz, topic=topic, text='Order', order=2
+        )
+        second = OrderOption.objects.create(
+            organization=cls.organization, question=order, text='Second', correct_order=2
+        )
+        OrderOption.objects.create(organization=cls.organization, question=order, text='First', correct_order=1)
+        connect = ConnectQuestion.objects.create(
+            organization=cls.organization, quiz=cls.quiz, topic=topic, text='Connect', order=3
+        )
+        left = ConnectOption.objects.create(
+            organization=cls.organization, question=connect, text='Left', position_x=0.1, position_y=0.5
+        )
+        right = ConnectOption.objects.create(
+            organization=cls.organization, question=connect, text='Right', position_x=0.9, position_y=0.5
+        )
+        ConnectOptionConnection.objects.create(
+            organization=cls.organization, question=connect, from_option=left, to_option=right
+        )
+        NumberQuestion.objects.create(
+            organization=cls.organization, quiz=cls.quiz, topic=topic, text='Number', order=4,
+            correct_answer=42, tolerance=1
+        )
+        cls.second_order_option = second
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/quizzes/quizzes/{self.quiz.id}/play/'
+
+    def test_payload_contains_questions_without_answer_keys(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(
+            [question['question_type'] for question in payload['questions']],
+            ['multiple_choice', 'order', 'connect', 'number']
+        )
+        multiple_choice, order, connect, number = payload['questions']
+        self.assertCountEqual([option['text'] for option in multiple_choice['options']], ['Right', 'Wrong'])
+        self.assertNotIn('is_correct', multiple_choice['options'][0])
+        self.assertCountEqual([option['text'] for option in order['options']], ['Second', 'First'])
+        self.assertNotIn('correct_order', order['options'][0])
+        self.assertEqual({option['text']: option['position_x'] for option in connect['options']}['Left'], 0.1)
+        self.assertNotIn('correct_connections', connect)
+        self.assertNotIn('correct_answer', number)
+
+    def test_options_are_delivered_in_a_secret_permutation(self):
+        question = OrderQuestion.objects.create(
+            organization=self.organization, quiz=self.quiz, topic=self.multiple_choice.topic, text='Steps', order=5
+        )
+        steps = [
+            OrderOption.objects.create(
+                organization=self.organization, question=question, text=f'Step {index}', correct_order=index
+            )
+            for index in range(6)
+        ]
+
+        def delivered():
+            payload = build_play_payload(self.quiz)
+            return [option['id'] for option in payload['questions'][-1]['options']]
+
+        expected = [step.id for step in steps]
+        random.Random(option_permutation_seed('order', question.id)).shuffle(expected)
+        self.assertEqual(delivered(), expected)
+        self.assertNotEqual(expected, [step.id for step in steps])
+        self.assertEqual(delivered(), expected)
+        with override_settings(SECRET_KEY='another secret key'):
+            self.assertNotEqual(delivered(), expected)
+
+    def test_cached_payload_and_etag(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.option.text = 'Correct'
+        self.option.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Correct', [option['text'] for option in response.json()['questions'][0]['options']])
+
+    def test_reorder_invalidates_payload(self):
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(play_cache_key(self.quiz.id)))
+
+        response = self.client.post(f'/api/quizzes/quizzes/{self.quiz.id}/reorder/', {
+            'ordered_ids': [self.second_order_option.question_id]
+        }, format='json')
+
+        self.assertGreater(response.json()['updated'], 0)
+        self.assertIsNone(cache.get(play_cache_key(self.quiz.id)))
+
+    def test_published_version_is_delivered_and_graded_until_republished(self):
+        live_etag = self.client.get(self.url)['ETag']
+        response = self.client.post(f'/api/quizzes/quizzes/{self.quiz.id}/publish/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['number'], 1)
+        version_etag = self.client.get(self.url)['ETag']
+        self.assertEqual(version_etag, live_etag)
+
+        # Edits after publishing reach neither delivery nor grading
+        wrong = self.multiple_choice.options.get(is_correct=False)
+        self.option.text = 'Edited'
+        self.option.is_correct = False
+        self.option.save()
+        wrong.is_correct = True
+        wrong.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=version_etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(self.url).json()['questions'][0]['options'][0]['text'], 'Right')
+
+        student = Student.objects.create(organization=self.organization, first_name='A', last_name='B')
+        response = self.client.post(f'/api/quizzes/quizzes/{self.quiz.id}/submit/', {
+            'student': student.id,
+            'answers': [{
+                'question_type': 'multiple_choice', 'question_id': self.multiple_choice.id, 'answer': self.option.id
+            }],
+        }, format='json')
+        self.assertTrue(response.json()['results'][0]['correct'])
+        answer = StudentQuestionAnswer.objects.get()
+        self.assertEqual(answer.quiz_version.number, 1)
+
+        # Publishing again freezes the edits; unchanged content is not versioned twice
+        self.assertEqual(self.client.post(f'/api/quizzes/quizzes/{self.quiz.id}/publish/').json()['number'], 2)
+        self.assertEqual(self.client.post(f'/api/quizzes/quizzes/{self.quiz.id}/publish/').json()['number'], 2)
+        self.assertEqual(self.client.get(self.url).json()['questions'][0]['options'][0]['text'], 'Edited')
+        self.assertEqual(QuizVersion.objects.filter(quiz=self.quiz).count(), 2)
+
+        # The earlier answer keeps the grade of the version it was given to
+        answer.refresh_from_db()
+        self.assertTrue(answer.is_correct)
+
+    def test_shuffled_payload_is_deterministic_per_student(self):
+        canonical = self.client.get(self.url).json()
+        self.quiz.shuffle_questions = self.quiz.shuffle_options = True
+        self.quiz.save()
+
+        def order(payload):
+            return [
+                (question['id'], [option['id'] for option in question.get('options', [])])
+                for question in payload['questions']
+            ]
+
+        response = self.client.get(self.url, {'student': 1})
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url, {'student': 1}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        orders = {str(order(self.client.get(self.url, {'student': student}).json())) for student in range(20)}
+        self.assertGreater(len(orders), 1)
+        shuffled = self.client.get(self.url, {'student': 7}).json()
+        self.assertCountEqual(
+            [(question, sorted(options)) for question, options in order(shuffled)],
+            [(question, sorted(options)) for question, options in order(canonical)]
+        )
+        self.assertEqual(self.client.get(self.url).json(), canonical)
@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.models import Quiz, MultipleChoiceQuestion, NumberQuestion, QuestionStatistics
+
+
+class QuizListTests(TestCase):
+    """Listing quizzes costs a fixed number of queries however many quizzes there are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        for index in range(20):
+            quiz = Quiz.objects.create(
+                organization=cls.organization, name=f'Quiz {index}', course=course, module=module
+            )
+            quiz.lessons.add(lesson)
+            quiz.topics.add(topic)
+            for _ in range(index % 3):
+                MultipleChoiceQuestion.objects.create(
+                    organization=cls.organization, quiz=quiz, topic=topic, text='Pick'
+                )
+            NumberQuestion.objects.create(
+                organization=cls.organization, quiz=quiz, topic=topic, text='Number', correct_answer=1
+            )
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def test_list_query_count(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # Page count, quizzes with course, module and question counts, lessons, topics
+        with self.assertNumQueries(4):
+            response = client.get('/api/quizzes/quizzes/')
+
+        results = response.json()['results']
+        self.assertEqual(len(results), 20)
+        self.assertEqual([quiz['questions_count'] for quiz in results], [index % 3 + 1 for index in range(20)])
+        self.assertEqual(results[0]['module_name'], 'Module')
+        self.assertEqual(len(results[0]['topics']), 1)
+
+
+class QuizDetailTests(TestCase):
+    """The statistics of all the quiz's questions are read in one query, whatever their types."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', course=course, module=module)
+        common = {'organization': cls.organization, 'quiz': cls.quiz, 'topic': topic}
+        cls.pick = MultipleChoiceQuestion.objects.create(text='Pick', **common)
+        for index in range(3):
+            number = NumberQuestion.objects.create(text=f'Number {index}', correct_answer=index, **common)
+            QuestionStatistics.objects.create(
+                organization=cls.organization, question_ref=number.refs.get(),
+                responses=index + 1, p_value=0.5, computed_at=timezone.now()
+            )
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_reads_statistics_once(self):
+        # Quiz, lessons, topics, statistics, the four question tables, multiple choice options
+        with self.assertNumQueries(9):
+            response = self.client.get(f'/api/quizzes/quizzes/{self.quiz.id}/')
+
+        data = response.json()
+        self.assertIsNone(data['multiple_choice_questions'][0]['statistics'])
+        self.assertEqual(
+            sorted(question['statistics']['responses'] for question in data['number_questions']), [1, 2, 3]
+        )
+        self.assertEqual(data['number_questions'][0]['statistics']['question_type'], 'number')
+
+    def test_questions_read_statistics_once(self):
+        # Quiz, statistics, the four question tables, multiple choice options
+        with self.assertNumQueries(7):
+            response = self.client.get(f'/api/quizzes/quizzes/{self.quiz.id}/questions/')
+
+        data = response.json()
+        self.assertIsNone(data['multiple_choice'][0]['statistics'])
+        self.assertEqual(sorted(question['statistics']['responses'] for question in data['number']), [1, 2, 3])
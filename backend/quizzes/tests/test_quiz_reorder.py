@@ -0,0 +1,89 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.models import Quiz, MultipleChoiceQuestion, OrderQuestion, NumberQuestion, QuestionRef
+
+
+class QuizReorderTests(TestCase):
+    """Questions are reordered with sparse keys, writing one row per move."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        common = {'organization': cls.organization, 'quiz': cls.quiz, 'topic': topic}
+        # Dense orders, as written by the old full-list reorder
+        cls.questions = [
+            ('multiple_choice', MultipleChoiceQuestion.objects.create(text='A', order=1, **common)),
+            ('order', OrderQuestion.objects.create(text='B', order=2, **common)),
+            ('number', NumberQuestion.objects.create(text='C', order=3, correct_answer=1, **common)),
+            ('multiple_choice', MultipleChoiceQuestion.objects.create(text='D', order=4, **common)),
+        ]
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/quizzes/quizzes/{self.quiz.id}/reorder/'
+
+    def key(self, index):
+        question_type, question = self.questions[index]
+        return {'question_type': question_type, 'question_id': question.id}
+
+    def move(self, index, before=None):
+        return self.client.post(self.url, {
+            'moves': [{**self.key(index), 'before': None if before is None else self.key(before)}]
+        }, format='json')
+
+    def texts(self):
+        return [question.text for question in self.quiz.get_all_questions()]
+
+    def test_moves_write_one_row_unless_the_quiz_is_renumbered(self):
+        # No key left between the dense orders 1 and 2: the whole quiz is renumbered
+        response = self.move(3, before=1)
+        self.assertEqual(response.json()['updated'], 4)
+        self.assertEqual(self.texts(), ['A', 'D', 'B', 'C'])
+        self.assertEqual(
+            list(QuestionRef.objects.filter(quiz=self.quiz).values_list('order', flat=True)),
+            [1024, 2048, 3072, 4096]
+        )
+
+        # Now there are gaps, so each move writes one question
+        response = self.move(2, before=0)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(self.texts(), ['C', 'A', 'D', 'B'])
+        response = self.move(2)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(self.texts(), ['A', 'D', 'B', 'C'])
+        self.assertEqual(
+            [ref.order for ref in QuestionRef.objects.filter(quiz=self.quiz)],
+            [question.order for question in self.quiz.get_all_questions()]
+        )
+
+    def test_renumber_runs_one_update_per_table(self):
+        # Ids are matched against every question type, so id 1 is A, B and C at once
+        ordered_ids = [self.questions[3][1].id, self.questions[0][1].id]
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url, {'ordered_ids': ordered_ids}, format='json')
+        self.assertEqual(response.json()['updated'], 4)
+        self.assertEqual(self.texts(), ['D', 'A', 'B', 'C'])
+
+    def test_invalid_ordered_ids_are_rejected(self):
+        for ordered_ids in ('1,2', [1, 'two'], [0], [None]):
+            response = self.client.post(self.url, {'ordered_ids': ordered_ids}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ordered_ids', response.json())
+        self.assertEqual(self.texts(), ['A', 'B', 'C', 'D'])
+
+    def test_invalid_move_is_rejected(self):
+        response = self.client.post(self.url, {
+            'moves': [{'question_type': 'number', 'question_id': 999, 'before': None}]
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.texts(), ['A', 'B', 'C', 'D'])
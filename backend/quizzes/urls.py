@@ -4,7 +4,7 @@ from .views import (
     QuizViewSet,
     MultipleChoiceQuestionViewSet, OrderQuestionViewSet, ConnectQuestionViewSet, NumberQuestionViewSet,
     OptionViewSet, OrderOptionViewSet, ConnectOptionViewSet,
-    ConnectOptionConnectionViewSet,
+    ConnectOptionConnectionViewSet, QuestionRefViewSet,
 )
 
 router = DefaultRouter()
@@ -16,6 +16,8 @@ router.register(r'multiple-choice-questions', MultipleChoiceQuestionViewSet, bas
 router.register(r'order-questions', OrderQuestionViewSet)
 router.register(r'connect-questions', ConnectQuestionViewSet)
 router.register(r'number-questions', NumberQuestionViewSet)
+# Registry of questions of all types
+router.register(r'question-refs', QuestionRefViewSet)
 # Option type endpoints
 router.register(r'options', OptionViewSet)  # MultipleChoiceQuestion options
 router.register(r'order-options', OrderOptionViewSet)
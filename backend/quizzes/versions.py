@@ -0,0 +1,68 @@
+"""Immutable published versions of quizzes.
+
+Editing a quiz while students are taking it used to change what they were
+graded against. ``publish_quiz`` freezes the quiz into a ``QuizVersion``
+row: the delivery document of ``quizzes.delivery`` plus the answer key and
+hierarchy placement of every question, as one JSON snapshot with a content
+hash. While a quiz has a published version, the play endpoint delivers the
+snapshot, submissions are validated and graded against it and the answers
+record it, so later edits only reach students once the quiz is published
+again.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .delivery import build_play_payload, invalidate_play_payload
+from .models import Quiz, QuizVersion, QuestionRef
+
+
+def snapshot_hash(snapshot):
+    """Return the SHA-256 of the canonical JSON encoding of a snapshot."""
+    encoded = json.dumps(snapshot, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def build_snapshot(quiz):
+    """Return the snapshot of the quiz's current questions and answer keys."""
+    from students.grading import AnswerKeys
+
+    snapshot = build_play_payload(quiz)
+    question_ids = {}
+    for question_type, question_id in QuestionRef.objects.filter(quiz=quiz).order_by().values_list(
+        'question_type', 'question_id'
+    ):
+        question_ids.setdefault(question_type, set()).add(question_id)
+    keys = AnswerKeys()
+    keys.load_questions(question_ids)
+    snapshot['keys'] = keys.snapshot()
+    # Round-trip through JSON so the stored snapshot and its hash see the same values
+    return json.loads(json.dumps(snapshot, cls=DjangoJSONEncoder))
+
+
+def publish_quiz(quiz):
+    """Freeze the current state of a quiz into a QuizVersion and make it the published one.
+
+    Publishing a quiz whose content hasn't changed since its latest version
+    republishes that version instead of creating an identical one. Returns
+    the published QuizVersion.
+    """
+    snapshot = build_snapshot(quiz)
+    content_hash = snapshot_hash(snapshot)
+    with transaction.atomic():
+        Quiz.objects.select_for_update().filter(pk=quiz.pk).values_list('pk', flat=True).get()
+        version = QuizVersion.objects.filter(quiz=quiz).order_by('-number').first()
+        if version is None or version.content_hash != content_hash:
+            version = QuizVersion.objects.create(
+                organization_id=quiz.organization_id,
+                quiz=quiz,
+                number=version.number + 1 if version else 1,
+                content_hash=content_hash,
+                snapshot=snapshot,
+            )
+        Quiz.objects.filter(pk=quiz.pk).update(published_version=version)
+    quiz.published_version = version
+    invalidate_play_payload(quiz.id)
+    return version
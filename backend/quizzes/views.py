@@ -2,10 +2,20 @@ from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from organizations.query_plan import QueryPlanMixin, plan_queryset
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from .delivery import play_payload
+from .shuffle import shuffle_seed, shuffle_play_payload
+from .ordering import ORDER_GAP, QUESTION_MODELS, move_question, write_orders
+from .versions import publish_quiz
 from .models import (
-    Quiz,
+    Quiz, question_count_subquery,
     MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion,
-    Option, OrderOption, ConnectOption, ConnectOptionConnection
+    Option, OrderOption, ConnectOption, ConnectOptionConnection, QuestionRef, QuestionStatistics,
+    QuizVersion
 )
 from .serializers import (
     QuizSerializer, QuizDetailSerializer,
@@ -13,10 +23,14 @@ from .serializers import (
     OrderQuestionSerializer, OrderQuestionDetailSerializer,
     ConnectQuestionSerializer, ConnectQuestionDetailSerializer,
     NumberQuestionSerializer, NumberQuestionDetailSerializer,
+    QuizMultipleChoiceQuestionSerializer, QuizOrderQuestionSerializer,
+    QuizConnectQuestionSerializer, QuizNumberQuestionSerializer, quiz_question_statistics,
     OptionSerializer, OptionDetailSerializer,
     OrderOptionSerializer, OrderOptionDetailSerializer,
     ConnectOptionSerializer, ConnectOptionDetailSerializer,
     ConnectOptionConnectionSerializer,
+    QuestionRefSerializer, QuestionStatisticsSerializer, QuizVersionSerializer, QuestionSetRequestSerializer,
+    QuestionMoveSerializer, QuestionRenumberSerializer,
     # Backward compatibility
     QuestionSerializer, QuestionDetailSerializer
 )
@@ -25,7 +39,7 @@ from .serializers import (
 Question = MultipleChoiceQuestion
 
 
-class QuizViewSet(viewsets.ModelViewSet):
+class QuizViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Quiz model."""
     
     queryset = Quiz.objects.all()
@@ -41,22 +55,37 @@ class QuizViewSet(viewsets.ModelViewSet):
             return QuizDetailSerializer
         return QuizSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Relations are loaded by QueryPlanMixin from the serializer's fields
+            queryset = queryset.annotate(questions_count=question_count_subquery())
+        return queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        quiz = self.get_object()
+        serializer = self.get_serializer(quiz)
+        # The statistics of every question type in one query, rather than a prefetch per type
+        serializer.context['question_statistics'] = quiz_question_statistics(quiz)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def questions(self, request, pk=None):
         """Get all questions for this quiz (all types)."""
         quiz = self.get_object()
+        context = {'question_statistics': quiz_question_statistics(quiz)}
         
         # Get all question types using the related_name
-        mc_questions = quiz.multiplechoicequestion_questions.all()
-        order_questions = quiz.orderquestion_questions.all()
-        connect_questions = quiz.connectquestion_questions.all()
-        number_questions = quiz.numberquestion_questions.all()
+        mc_questions = plan_queryset(quiz.multiplechoicequestion_questions.all(), QuizMultipleChoiceQuestionSerializer)
+        order_questions = plan_queryset(quiz.orderquestion_questions.all(), QuizOrderQuestionSerializer)
+        connect_questions = plan_queryset(quiz.connectquestion_questions.all(), QuizConnectQuestionSerializer)
+        number_questions = plan_queryset(quiz.numberquestion_questions.all(), QuizNumberQuestionSerializer)
         
         # Serialize each type
-        mc_data = MultipleChoiceQuestionSerializer(mc_questions, many=True).data
-        order_data = OrderQuestionSerializer(order_questions, many=True).data
-        connect_data = ConnectQuestionSerializer(connect_questions, many=True).data
-        number_data = NumberQuestionSerializer(number_questions, many=True).data
+        mc_data = QuizMultipleChoiceQuestionSerializer(mc_questions, many=True, context=context).data
+        order_data = QuizOrderQuestionSerializer(order_questions, many=True, context=context).data
+        connect_data = QuizConnectQuestionSerializer(connect_questions, many=True, context=context).data
+        number_data = QuizNumberQuestionSerializer(number_questions, many=True, context=context).data
         
         return Response({
             'multiple_choice': mc_data,
@@ -65,70 +94,177 @@ class QuizViewSet(viewsets.ModelViewSet):
             'number': number_data
         })
 
-    @action(detail=True, methods=['post'])
-    def reorder(self, request, pk=None):
-        """Reorder questions within this quiz (all types).
+    @action(detail=True, methods=['get', 'post'], url_path='item-statistics')
+    def item_statistics(self, request, pk=None):
+        """Get the item-analysis statistics of all questions in this quiz.
+        
+        GET returns the stored statistics; POST recomputes them from the
+        current student answers first.
+        """
+        from students.item_analysis import compute_item_statistics
+        
+        quiz = self.get_object()
+        if request.method == 'POST':
+            compute_item_statistics(quiz=quiz)
+        statistics = QuestionStatistics.objects.filter(
+            question_ref__quiz=quiz
+        ).select_related('question_ref').order_by('question_ref__order', 'question_ref__question_created_at')
+        return Response(QuestionStatisticsSerializer(statistics, many=True).data)
 
-        Expects JSON body: { "ordered_ids": [q1, q2, ...] }
-        Works across all question types.
+    @action(detail=True, methods=['get'])
+    def play(self, request, pk=None):
+        """Get the complete delivery document of this quiz for taking it.
+        
+        Returns all questions of all types in quiz order with their options,
+        connect layouts and media URLs, without the answer keys, as one
+        precompiled and cached JSON document. Responses carry a strong ETag;
+        a matching If-None-Match returns 304 Not Modified.
+        
+        With ?student=<id>, a quiz with shuffle_questions or shuffle_options
+        is delivered in that student's deterministic order, reassembled from
+        the same cached document.
         """
         quiz = self.get_object()
-        ordered_ids = request.data.get('ordered_ids', [])
-        if not isinstance(ordered_ids, list):
-            return Response({"detail": "ordered_ids must be a list"}, status=400)
+        payload = play_payload(quiz)
+        student = request.query_params.get('student')
+        if student is not None and (quiz.shuffle_questions or quiz.shuffle_options):
+            if not student.isdigit():
+                return Response({'student': 'A valid student id is required.'}, status=400)
+            payload = shuffle_play_payload(
+                payload, shuffle_seed(quiz, int(student)),
+                questions=quiz.shuffle_questions, options=quiz.shuffle_options
+            )
+        if payload.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(payload.body, content_type='application/json')
+        response['ETag'] = payload.etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Draw a question set from the question bank of a module.
         
-        # Assign incremental order based on provided list
-        order_map = {int(qid): index for index, qid in enumerate(ordered_ids)}
-        to_update = []
+        Expects JSON body: { "module": id, "count": n, "seed": "...",
+        "weights": { topic_id: weight, ... } (optional) }. Questions of all
+        types are sampled per topic in proportion to the weights (by default
+        the topics' question counts); the same seed always gets the same
+        set while the bank is unchanged.
+        """
+        serializer = QuestionSetRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        questions = Quiz.generate_questions(
+            params['module'], params['count'], params['seed'], weights=params.get('weights')
+        )
+        return Response({
+            'module': params['module'].id,
+            'seed': params['seed'],
+            'count': len(questions),
+            'questions': questions,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def publish(self, request, pk=None):
+        """Freeze the current questions and answer keys of this quiz into a new published version.
         
-        # Update MultipleChoiceQuestions
-        for question in quiz.multiplechoicequestion_questions.filter(id__in=order_map.keys()):
-            new_order = order_map.get(question.id)
-            if new_order is not None and question.order != new_order:
-                question.order = new_order
-                to_update.append(question)
+        From then on the quiz is delivered, validated and graded from the
+        version's snapshot, and new answers record the version; later edits
+        take effect when the quiz is published again. Publishing an
+        unchanged quiz republishes its latest version.
+        """
+        version = publish_quiz(self.get_object())
+        return Response(QuizVersionSerializer(version).data, status=201)
+    
+    @action(detail=True, methods=['get'])
+    def versions(self, request, pk=None):
+        """Get the published versions of this quiz, oldest first."""
+        quiz = self.get_object()
+        versions = QuizVersion.objects.filter(quiz=quiz).defer('snapshot')
+        return Response(QuizVersionSerializer(versions, many=True).data)
+    
+    @action(detail=True, methods=['get'], url_path='next-question')
+    def next_question(self, request, pk=None):
+        """Get the next question of this quiz for a student's formative practice.
         
-        # Update OrderQuestions
-        for question in quiz.orderquestion_questions.filter(id__in=order_map.keys()):
-            new_order = order_map.get(question.id)
-            if new_order is not None and question.order != new_order:
-                question.order = new_order
-                to_update.append(question)
+        Expects ?student=<id>. Picks the first unanswered question on the
+        topic the student is weakest at, by their knowledge tracing
+        estimate. Returns { "question": null } once every question is
+        answered.
+        """
+        from students.adaptive import next_question
+        from students.models import Student
         
-        # Update ConnectQuestions
-        for question in quiz.connectquestion_questions.filter(id__in=order_map.keys()):
-            new_order = order_map.get(question.id)
-            if new_order is not None and question.order != new_order:
-                question.order = new_order
-                to_update.append(question)
+        student = request.query_params.get('student', '')
+        if not student.isdigit():
+            return Response({'student': 'A valid student id is required.'}, status=400)
+        quiz = self.get_object()
+        if not Student.objects.filter(pk=int(student), organization_id=quiz.organization_id).exists():
+            return Response({'student': 'Student does not belong to the organization of this quiz.'}, status=400)
+        selection = next_question(int(student), quiz)
+        return Response(selection or {'question': None, 'remaining': 0})
+    
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """Submit all answers of a student's attempt at this quiz at once.
         
-        # Update NumberQuestions
-        for question in quiz.numberquestion_questions.filter(id__in=order_map.keys()):
-            new_order = order_map.get(question.id)
-            if new_order is not None and question.order != new_order:
-                question.order = new_order
-                to_update.append(question)
+        Expects JSON body: { "student": id, "answers": [{ "question_type",
+        "question_id", "answer" (option id) or "answer_data" }, ...] }.
+        Answers are validated against the preloaded questions and options,
+        graded in batch and written in one transaction; answering a question
+        again replaces the earlier answer. Returns the correctness and score
+        of every answer.
+        """
+        from students.serializers import QuizSubmissionSerializer
         
-        if to_update:
-            # Separate by type for bulk update
-            mc_to_update = [q for q in to_update if q.__class__ == MultipleChoiceQuestion]
-            order_to_update = [q for q in to_update if q.__class__ == OrderQuestion]
-            connect_to_update = [q for q in to_update if q.__class__ == ConnectQuestion]
-            number_to_update = [q for q in to_update if q.__class__ == NumberQuestion]
-            
-            if mc_to_update:
-                MultipleChoiceQuestion.objects.bulk_update(mc_to_update, ['order'])
-            if order_to_update:
-                OrderQuestion.objects.bulk_update(order_to_update, ['order'])
-            if connect_to_update:
-                ConnectQuestion.objects.bulk_update(connect_to_update, ['order'])
-            if number_to_update:
-                NumberQuestion.objects.bulk_update(number_to_update, ['order'])
+        quiz = self.get_object()
+        serializer = QuizSubmissionSerializer(data=request.data, context={'quiz': quiz})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=201)
+
+    @action(detail=True, methods=['post'])
+    def reorder(self, request, pk=None):
+        """Reorder questions within this quiz (all types).
+
+        Expects JSON body with either
+        - "moves": [{ "question_type", "question_id", "before": { "question_type",
+          "question_id" } or null }, ...] to move questions one at a time in
+          front of another question (or to the end), writing only the moved
+          questions unless the quiz has to be renumbered, or
+        - "ordered_ids": [q1, q2, ...] to renumber the listed questions of all
+          types in that order.
+        """
+        quiz = self.get_object()
+        if 'moves' in request.data:
+            serializer = QuestionMoveSerializer(data=request.data['moves'], many=True)
+            serializer.is_valid(raise_exception=True)
+            updated = 0
+            try:
+                with transaction.atomic():
+                    for move in serializer.validated_data:
+                        before = move.get('before')
+                        updated += move_question(
+                            quiz, (move['question_type'], move['question_id']),
+                            before=(before['question_type'], before['question_id']) if before else None
+                        )
+            except DjangoValidationError as error:
+                return Response({'moves': error.messages}, status=400)
+            return Response({"updated": updated})
+
+        serializer = QuestionRenumberSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        return Response({"updated": len(to_update)})
+        # Question ids are matched against every question type
+        id_orders = {
+            qid: (index + 1) * ORDER_GAP for index, qid in enumerate(serializer.validated_data['ordered_ids'])
+        }
+        updated = write_orders(quiz, {question_type: id_orders for question_type in QUESTION_MODELS})
+        return Response({"updated": updated})
 
 
-class MultipleChoiceQuestionViewSet(viewsets.ModelViewSet):
+class MultipleChoiceQuestionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for MultipleChoiceQuestion model."""
     
     queryset = MultipleChoiceQuestion.objects.all()
@@ -165,7 +301,7 @@ class MultipleChoiceQuestionViewSet(viewsets.ModelViewSet):
 QuestionViewSet = MultipleChoiceQuestionViewSet
 
 
-class OrderQuestionViewSet(viewsets.ModelViewSet):
+class OrderQuestionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for OrderQuestion model."""
     
     queryset = OrderQuestion.objects.all()
@@ -190,7 +326,7 @@ class OrderQuestionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ConnectQuestionViewSet(viewsets.ModelViewSet):
+class ConnectQuestionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for ConnectQuestion model."""
     
     queryset = ConnectQuestion.objects.all()
@@ -218,12 +354,14 @@ class ConnectQuestionViewSet(viewsets.ModelViewSet):
     def connections(self, request, pk=None):
         """Get all correct connections for this question."""
         question = self.get_object()
-        connections = ConnectOptionConnection.objects.filter(question=question)
+        connections = plan_queryset(
+            ConnectOptionConnection.objects.filter(question=question), ConnectOptionConnectionSerializer
+        )
         serializer = ConnectOptionConnectionSerializer(connections, many=True)
         return Response(serializer.data)
 
 
-class OptionViewSet(viewsets.ModelViewSet):
+class OptionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Option model (MultipleChoiceQuestion)."""
     
     queryset = Option.objects.all()
@@ -240,7 +378,7 @@ class OptionViewSet(viewsets.ModelViewSet):
         return OptionSerializer
 
 
-class OrderOptionViewSet(viewsets.ModelViewSet):
+class OrderOptionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for OrderOption model."""
     
     queryset = OrderOption.objects.all()
@@ -257,7 +395,7 @@ class OrderOptionViewSet(viewsets.ModelViewSet):
         return OrderOptionSerializer
 
 
-class ConnectOptionViewSet(viewsets.ModelViewSet):
+class ConnectOptionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for ConnectOption model."""
     
     queryset = ConnectOption.objects.all()
@@ -274,7 +412,7 @@ class ConnectOptionViewSet(viewsets.ModelViewSet):
         return ConnectOptionSerializer
 
 
-class ConnectOptionConnectionViewSet(viewsets.ModelViewSet):
+class ConnectOptionConnectionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for ConnectOptionConnection model."""
     
     queryset = ConnectOptionConnection.objects.all()
@@ -289,7 +427,7 @@ class ConnectOptionConnectionViewSet(viewsets.ModelViewSet):
         return ConnectOptionConnectionSerializer
 
 
-class NumberQuestionViewSet(viewsets.ModelViewSet):
+class NumberQuestionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for NumberQuestion model."""
     
     queryset = NumberQuestion.objects.all()
@@ -303,4 +441,16 @@ class NumberQuestionViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return NumberQuestionDetailSerializer
-        return NumberQuestionSerializer
\ No newline at end of file
+        return NumberQuestionSerializer
+
+
+class QuestionRefViewSet(QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
+    """Read-only ViewSet listing questions of all types through the QuestionRef registry."""
+    
+    queryset = QuestionRef.objects.all()
+    serializer_class = QuestionRefSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['order', 'question_created_at', 'created_at']
+    ordering = ['order', 'question_created_at']
+    filterset_fields = ['organization', 'quiz', 'topic', 'question_type', 'question_id']
@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import StudentGroup, Student, StudentQuestionAnswer
+from .models import (
+    StudentGroup, Student, StudentQuestionAnswer, QuizAttempt, StudentTopicMastery,
+    TopicKnowledgeParams, ProgressSnapshot, ProgressRollupWatermark
+)
 
 
 admin.site.register(StudentGroup)
 admin.site.register(Student)
 admin.site.register(StudentQuestionAnswer)
-
+admin.site.register(QuizAttempt)
+admin.site.register(StudentTopicMastery)
+admin.site.register(TopicKnowledgeParams)
+admin.site.register(ProgressSnapshot)
+admin.site.register(ProgressRollupWatermark)
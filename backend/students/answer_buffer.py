@@ -0,0 +1,360 @@
+"""Optional write-behind buffer for student answer autosaves.
+
+During live exams many students autosave answers within the same few
+seconds. With ``ANSWER_BUFFER_ENABLED`` the answer upsert endpoint appends
+each validated answer to a local SQLite file in WAL mode (durable once the
+append returns) instead of writing it to the main database. A flusher
+periodically coalesces the buffer to the latest answer per (student, quiz,
+question) and writes those with ``students.submission.upsert_answers`` in
+one batch, so grading, mastery and knowledge tracing are updated exactly as
+for a direct write. If the batch fails, its answers are written one at a
+time and those that still fail move to the ``dead_answer`` table of the
+buffer file, so one bad answer can't keep the rest from draining.
+
+The flusher runs as a background thread in every worker process that
+buffered an answer (every ``ANSWER_BUFFER_FLUSH_INTERVAL_MS`` ms), or as a
+separate process with ``manage.py flush_answer_buffer --watch``. A flush
+claims its rows in a short SQLite transaction and writes them to the main
+database without holding the buffer's lock, so appends don't wait on it;
+a student's rows are claimed by one flush at a time, so concurrent flushers
+never reorder their answers. Reads of a student's answers or progress call
+``sync_student_answers`` first, which flushes that student's buffered
+answers so they see their own writes.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections
+from django.utils import timezone
+
+from quizzes.models import Option, Quiz
+from .grading import question_content_types
+from .models import Student, StudentQuestionAnswer
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS buffered_answer (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        organization_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        quiz_id INTEGER NOT NULL,
+        question_type TEXT NOT NULL,
+        question_id INTEGER NOT NULL,
+        answer_id INTEGER,
+        answer_data TEXT,
+        flush_id TEXT,
+        claimed_at REAL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS buffered_answer_student_idx ON buffered_answer (student_id)',
+    """
+    CREATE TABLE IF NOT EXISTS dead_answer (
+        seq INTEGER PRIMARY KEY,
+        organization_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        quiz_id INTEGER NOT NULL,
+        question_type TEXT NOT NULL,
+        question_id INTEGER NOT NULL,
+        answer_id INTEGER,
+        answer_data TEXT,
+        error TEXT NOT NULL,
+        failed_at TEXT NOT NULL
+    )
+    """,
+]
+
+COLUMNS = [
+    'seq', 'organization_id', 'student_id', 'quiz_id', 'question_type', 'question_id', 'answer_id', 'answer_data'
+]
+
+DEAD_LETTER_COLUMNS = COLUMNS + ['error', 'failed_at']
+
+# A claim older than this belongs to a flush that died; its rows are claimed again (writes are idempotent)
+CLAIM_TIMEOUT_SECONDS = 300
+
+# Errors meaning the main database can't be reached: the answers stay buffered for the next flush
+UNAVAILABLE_ERRORS = (OperationalError, InterfaceError)
+
+
+def buffer_enabled():
+    """Return whether answer saves go through the write-behind buffer."""
+    return getattr(settings, 'ANSWER_BUFFER_ENABLED', False)
+
+
+class AnswerBuffer:
+    """An append-only answer log in a local SQLite file, flushed to the main database in batches."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def _connection(self):
+        """Return this thread's connection to the buffer file, creating the schema on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(buffered_answer)')}
+            if 'flush_id' not in columns:
+                # Buffer files written before flushes claimed their rows
+                connection.execute('ALTER TABLE buffered_answer ADD COLUMN flush_id TEXT')
+                connection.execute('ALTER TABLE buffered_answer ADD COLUMN claimed_at REAL')
+            self._local.connection = connection
+        return connection
+
+    def append(self, question_type, answer):
+        """Append an unsaved, validated StudentQuestionAnswer to the buffer."""
+        self._connection().execute(
+            'INSERT INTO buffered_answer '
+            '(organization_id, student_id, quiz_id, question_type, question_id, answer_id, answer_data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                answer.organization_id, answer.student_id, answer.quiz_id, question_type,
+                answer.question_id, answer.answer_id,
+                None if answer.answer_data is None else json.dumps(answer.answer_data),
+            )
+        )
+
+    def pending(self, student_ids=None):
+        """Return the buffered rows, optionally of some students only, as dicts in append order."""
+        query, params = self._select(student_ids)
+        return [dict(zip(COLUMNS, row)) for row in self._connection().execute(query, params)]
+
+    def _select(self, student_ids):
+        query = f'SELECT {", ".join(COLUMNS)} FROM buffered_answer'
+        params = []
+        if student_ids is not None:
+            params = list(student_ids)
+            query += f' WHERE student_id IN ({", ".join("?" * len(params))})'
+        return query + ' ORDER BY seq', params
+
+    def dead_letters(self):
+        """Return the answers that failed to be written, as dicts in append order."""
+        return [
+            dict(zip(DEAD_LETTER_COLUMNS, row)) for row in self._connection().execute(
+                f'SELECT {", ".join(DEAD_LETTER_COLUMNS)} FROM dead_answer ORDER BY seq'
+            )
+        ]
+
+    def flush(self, student_ids=None, wait=False):
+        """Write the buffered answers, optionally of some students only, to the main database.
+
+        The rows are claimed for this flush in a short transaction, written
+        with no lock on the buffer held, and removed in a second short
+        transaction, so appends never wait for the main database. Rows of a
+        student with rows claimed by another flush in progress are left for
+        later, so a student's answers are always written in append order;
+        with ``wait``, the flush waits for those to be written too.
+
+        Answers that fail to be written on their own move to the dead
+        letters; if the main database is unavailable the claim is released
+        and they stay buffered for the next flush. Returns the number of
+        answers written.
+        """
+        if student_ids is not None:
+            student_ids = list(student_ids)
+            if not student_ids:
+                return 0
+        flush_id = uuid.uuid4().hex
+        rows = self._claim(flush_id, student_ids)
+        written = 0
+        if rows:
+            try:
+                written, failed = _write(rows)
+            except BaseException:
+                self._connection().execute(
+                    'UPDATE buffered_answer SET flush_id = NULL, claimed_at = NULL WHERE flush_id = ?', (flush_id,)
+                )
+                raise
+            self._finish(flush_id, failed)
+        if wait and student_ids is not None:
+            deadline = time.monotonic() + CLAIM_TIMEOUT_SECONDS
+            while self._claimed_students(student_ids) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        return written
+
+    def _claim(self, flush_id, student_ids):
+        """Mark the unclaimed rows of students with no flush in progress as ``flush_id``'s and return them."""
+        now = time.time()
+        stale = now - CLAIM_TIMEOUT_SECONDS
+        query = (
+            'UPDATE buffered_answer SET flush_id = ?, claimed_at = ? '
+            'WHERE (flush_id IS NULL OR claimed_at < ?) AND student_id NOT IN ('
+            'SELECT student_id FROM buffered_answer WHERE flush_id IS NOT NULL AND claimed_at >= ?)'
+        )
+        params = [flush_id, now, stale, stale]
+        if student_ids is not None:
+            query += f' AND student_id IN ({", ".join("?" * len(student_ids))})'
+            params += student_ids
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(query, params)
+            rows = [dict(zip(COLUMNS, row)) for row in connection.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM buffered_answer WHERE flush_id = ? ORDER BY seq', (flush_id,)
+            )]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return rows
+
+    def _finish(self, flush_id, failed):
+        """Move the ``failed`` (row, error) pairs to the dead letters and remove the rows of ``flush_id``."""
+        connection = self._connection()
+        failed_at = timezone.now().isoformat()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                f'INSERT INTO dead_answer ({", ".join(DEAD_LETTER_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(DEAD_LETTER_COLUMNS))})',
+                [[row[column] for column in COLUMNS] + [repr(error), failed_at] for row, error in failed]
+            )
+            connection.execute('DELETE FROM buffered_answer WHERE flush_id = ?', (flush_id,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _claimed_students(self, student_ids):
+        """Return whether any of the students has rows claimed by a flush in progress."""
+        return self._connection().execute(
+            f'SELECT 1 FROM buffered_answer WHERE flush_id IS NOT NULL AND claimed_at >= ? '
+            f'AND student_id IN ({", ".join("?" * len(student_ids))}) LIMIT 1',
+            [time.time() - CLAIM_TIMEOUT_SECONDS, *student_ids]
+        ).fetchone() is not None
+
+    def start_flusher(self, interval_ms):
+        """Start the background flusher thread of this process, if it isn't running yet."""
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self.run_flusher, args=(interval_ms,), name='answer-buffer-flusher', daemon=True
+            )
+            self._flusher.start()
+
+    def run_flusher(self, interval_ms):
+        """Flush the buffer every ``interval_ms`` milliseconds, forever."""
+        while True:
+            time.sleep(interval_ms / 1000)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing the answer buffer failed')
+            finally:
+                close_old_connections()
+
+
+def _answer(row, quizzes, content_types):
+    """Return the unsaved StudentQuestionAnswer of a buffered row."""
+    return StudentQuestionAnswer(
+        organization_id=row['organization_id'],
+        student_id=row['student_id'],
+        quiz_id=row['quiz_id'],
+        quiz_version_id=quizzes[row['quiz_id']],
+        question_content_type=content_types[row['question_type']],
+        question_id=row['question_id'],
+        answer_id=row['answer_id'],
+        answer_data=None if row['answer_data'] is None else json.loads(row['answer_data']),
+    )
+
+
+def _write(rows):
+    """Coalesce buffered rows to the latest answer per question and upsert them in one batch.
+
+    Answers whose student, quiz or option was deleted while they were
+    buffered are dropped. Answers record the version the quiz is published
+    at when they are flushed. If the batch fails, the answers are written one
+    at a time. Returns the number of answers written and a list of
+    (row, error) of the answers that could not be written.
+    """
+    from .submission import upsert_answers
+
+    latest = {}
+    for row in rows:
+        latest[(row['organization_id'], row['student_id'], row['quiz_id'], row['question_type'], row['question_id'])] = row
+    rows = list(latest.values())
+
+    students = set(Student.objects.filter(id__in={row['student_id'] for row in rows}).values_list('id', flat=True))
+    # quiz id -> id of its published version
+    quizzes = dict(Quiz.objects.filter(id__in={row['quiz_id'] for row in rows}).values_list(
+        'id', 'published_version_id'
+    ))
+    options = set(Option.objects.filter(
+        id__in={row['answer_id'] for row in rows if row['answer_id'] is not None}
+    ).values_list('id', flat=True))
+    content_types = question_content_types()
+
+    valid = []
+    for row in rows:
+        if row['student_id'] not in students or row['quiz_id'] not in quizzes or (
+            row['answer_id'] is not None and row['answer_id'] not in options
+        ):
+            logger.warning('Dropping buffered answer %s: its student, quiz or option no longer exists', row['seq'])
+            continue
+        valid.append(row)
+    if not valid:
+        return 0, []
+
+    try:
+        upsert_answers([_answer(row, quizzes, content_types) for row in valid])
+        return len(valid), []
+    except UNAVAILABLE_ERRORS:
+        raise
+    except Exception:
+        logger.exception('Writing %d buffered answers failed, writing them one at a time', len(valid))
+
+    written, failed = 0, []
+    for row in valid:
+        try:
+            upsert_answers([_answer(row, quizzes, content_types)])
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception as error:
+            logger.exception('Moving buffered answer %s to the dead letters', row['seq'])
+            failed.append((row, error))
+        else:
+            written += 1
+    return written, failed
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the process-wide AnswerBuffer for ``ANSWER_BUFFER_PATH``."""
+    path = str(settings.ANSWER_BUFFER_PATH)
+    with _buffers_lock:
+        if path not in _buffers:
+            _buffers[path] = AnswerBuffer(path)
+        return _buffers[path]
+
+
+def buffer_answer(question_type, answer):
+    """Append an answer to the buffer and make sure this process flushes it."""
+    answer_buffer = get_buffer()
+    answer_buffer.append(question_type, answer)
+    interval = getattr(settings, 'ANSWER_BUFFER_FLUSH_INTERVAL_MS', 0)
+    if interval > 0:
+        answer_buffer.start_flusher(interval)
+
+
+def sync_student_answers(student_id):
+    """Flush a student's buffered answers before reading them; a no-op without the buffer."""
+    if buffer_enabled():
+        get_buffer().flush([student_id], wait=True)
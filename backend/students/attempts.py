@@ -0,0 +1,122 @@
+"""Quiz attempts with server-side draft autosave.
+
+While an attempt is in progress, autosaves merge the student's answers into
+the attempt's ``draft_answers`` JSON object: one small UPDATE of one row,
+with no StudentQuestionAnswer rows or indexes touched. Submitting the
+attempt validates the drafts against the quiz, materializes them into
+answer rows with a single ``upsert_answers`` batch and stores the final
+score on the attempt.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QuizAttempt
+from .submission import upsert_answers
+
+
+def draft_key(question_type, question_id):
+    """Return the key of a question in ``QuizAttempt.draft_answers``."""
+    return f'{question_type}:{question_id}'
+
+
+def parse_draft_key(key):
+    """Return the (question_type, question_id) of a ``draft_answers`` key."""
+    question_type, question_id = key.rsplit(':', 1)
+    return question_type, int(question_id)
+
+
+def start_attempt(student, quiz):
+    """Return the student's in-progress attempt at the quiz, starting one if there is none."""
+    attempt, _ = QuizAttempt.objects.get_or_create(
+        student=student,
+        quiz=quiz,
+        status=QuizAttempt.STATUS_IN_PROGRESS,
+        defaults={'organization_id': quiz.organization_id}
+    )
+    return attempt
+
+
+def save_draft(attempt, answers):
+    """Merge autosaved answers into the draft of an in-progress attempt.
+
+    ``answers`` are dicts with ``question_type``, ``question_id`` and
+    ``answer`` or ``answer_data``; an answer with neither clears the
+    question. Locks the attempt row and writes it with one UPDATE. Returns
+    False, leaving the attempt unchanged, if it is no longer in progress.
+    """
+    with transaction.atomic():
+        draft = QuizAttempt.objects.select_for_update().filter(
+            pk=attempt.pk, status=QuizAttempt.STATUS_IN_PROGRESS
+        ).values_list('draft_answers', flat=True).first()
+        if draft is None:
+            return False
+        for item in answers:
+            key = draft_key(item['question_type'], item['question_id'])
+            if item.get('answer') is None and item.get('answer_data') is None:
+                draft.pop(key, None)
+            else:
+                draft[key] = {'answer': item.get('answer'), 'answer_data': item.get('answer_data')}
+        attempt.draft_answers = draft
+        attempt.updated_at = timezone.now()
+        QuizAttempt.objects.filter(pk=attempt.pk).update(
+            draft_answers=draft, updated_at=attempt.updated_at
+        )
+    return True
+
+
+def draft_errors(sheet, draft):
+    """Validate the drafts of an attempt against the quiz's AnswerSheet.
+
+    Returns a dict of draft key -> error message, empty if every draft is a
+    valid answer.
+    """
+    errors = {}
+    for key, value in draft.items():
+        question_type, question_id = parse_draft_key(key)
+        error = sheet.validate(
+            question_type, question_id, answer=value.get('answer'), answer_data=value.get('answer_data')
+        )
+        if error:
+            errors[key] = error
+    return errors
+
+
+def submit_attempt(attempt, sheet):
+    """Materialize the drafts of an attempt into answers and record its score.
+
+    ``sheet`` is the AnswerSheet of the attempt's quiz. The drafts are
+    validated under a lock on the attempt, and the answers, the mastery
+    updates and the attempt's final state are written in one transaction.
+    Raises ValidationError with the draft errors if a draft is invalid.
+    Returns False if the attempt is no longer in progress.
+    """
+    with transaction.atomic():
+        draft = QuizAttempt.objects.select_for_update().filter(
+            pk=attempt.pk, status=QuizAttempt.STATUS_IN_PROGRESS
+        ).values_list('draft_answers', flat=True).first()
+        if draft is None:
+            return False
+        errors = draft_errors(sheet, draft)
+        if errors:
+            raise ValidationError(errors)
+        answers = []
+        for key, value in draft.items():
+            question_type, question_id = parse_draft_key(key)
+            answers.append(sheet.build(
+                attempt.student, question_type, question_id,
+                answer=value.get('answer'), answer_data=value.get('answer_data')
+            ))
+        if answers:
+            upsert_answers(answers, versions=sheet.versions)
+
+        attempt.draft_answers = {}
+        attempt.status = QuizAttempt.STATUS_SUBMITTED
+        attempt.submitted_at = timezone.now()
+        attempt.score = sum(answer.score for answer in answers)
+        attempt.max_score = len(sheet.questions)
+        attempt.correct_count = sum(1 for answer in answers if answer.is_correct)
+        attempt.save(update_fields=[
+            'draft_answers', 'status', 'submitted_at', 'score', 'max_score', 'correct_count', 'updated_at'
+        ])
+    return True
@@ -0,0 +1,298 @@
+"""Batch grading of student answers.
+
+Grading a single answer used to resolve its generic question and then query
+that question's options or connections, costing several queries per answer.
+``AnswerKeys`` instead loads the answer keys of every question referenced by
+a batch of answers with one query per question type, after which any answer
+in the batch can be graded in memory.
+
+Answers recorded against a published ``QuizVersion`` are graded with the
+answer keys frozen in that version's snapshot rather than the live ones,
+so editing a quiz never changes the grade of an answer given to a
+published version.
+"""
+from collections import namedtuple
+
+from django.contrib.contenttypes.models import ContentType
+
+from quizzes.models import MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion, QuizVersion
+from .models import StudentQuestionAnswer
+
+
+# Outcome of grading one answer: full correctness plus partial credit in [0, 1]
+Grade = namedtuple('Grade', ['is_correct', 'score'])
+
+# Position of a question in the course hierarchy
+Placement = namedtuple('Placement', ['topic_id', 'lesson_id', 'module_id', 'course_id'])
+
+PLACEMENT_FIELDS = ['topic_id', 'topic__lesson_id', 'topic__lesson__module_id', 'topic__lesson__module__course_id']
+
+
+QUESTION_MODELS = {
+    'multiple_choice': MultipleChoiceQuestion,
+    'order': OrderQuestion,
+    'connect': ConnectQuestion,
+    'number': NumberQuestion,
+}
+
+
+def question_content_types():
+    """Return a dict of question type -> ContentType for all question models."""
+    content_types = ContentType.objects.get_for_models(*QUESTION_MODELS.values())
+    return {
+        question_type: content_types[model]
+        for question_type, model in QUESTION_MODELS.items()
+    }
+
+
+def snapshot_key(question_type, question_id):
+    """Return the key of a question in the ``keys`` of a QuizVersion snapshot."""
+    return f'{question_type}:{question_id}'
+
+
+class AnswerKeys:
+    """Answer keys and hierarchy placements for all questions referenced by a batch of answers.
+
+    Keys are looked up by (quiz version id, question type, question id),
+    with a version id of None for the live questions. ``versions`` are
+    QuizVersion instances the caller already loaded; other versions
+    referenced by the answers are loaded with one query.
+    """
+
+    def __init__(self, answers=(), versions=()):
+        content_types = question_content_types()
+        self.type_by_ct_id = {ct.id: question_type for question_type, ct in content_types.items()}
+
+        question_ids = {question_type: set() for question_type in content_types}
+        version_ids = set()
+        for answer in answers:
+            question_type = self.type_by_ct_id.get(answer.question_content_type_id)
+            if not (question_type and answer.question_id):
+                continue
+            if answer.quiz_version_id is None:
+                question_ids[question_type].add(answer.question_id)
+            else:
+                version_ids.add(answer.quiz_version_id)
+
+        # (version_id, question_type, question_id) -> Placement, for every question that exists
+        self.placements = {}
+        # (version_id, question_type, question_id) -> answer key
+        self.keys = {}
+
+        self.load_questions(question_ids)
+        for version in versions:
+            if version.id in version_ids:
+                self._load_version(version.id, version.snapshot)
+                version_ids.discard(version.id)
+        if version_ids:
+            for version_id, snapshot in QuizVersion.objects.filter(id__in=version_ids).values_list('id', 'snapshot'):
+                self._load_version(version_id, snapshot)
+
+    def load_questions(self, question_ids):
+        """Load the live answer keys of a dict of question type -> question ids."""
+        if question_ids.get('multiple_choice'):
+            self._load_multiple_choice(question_ids['multiple_choice'])
+        if question_ids.get('order'):
+            self._load_order(question_ids['order'])
+        if question_ids.get('connect'):
+            self._load_connect(question_ids['connect'])
+        if question_ids.get('number'):
+            self._load_number(question_ids['number'])
+
+    def _load_multiple_choice(self, ids):
+        # Key: set of ids of the correct options
+        rows = MultipleChoiceQuestion.objects.filter(id__in=ids).values_list(
+            'id', 'options__id', 'options__is_correct', *PLACEMENT_FIELDS
+        )
+        for question_id, option_id, is_correct, *placement in rows:
+            key = (None, 'multiple_choice', question_id)
+            self.placements[key] = Placement(*placement)
+            correct_options = self.keys.setdefault(key, set())
+            if option_id is not None and is_correct:
+                correct_options.add(option_id)
+
+    def _load_order(self, ids):
+        # Key: list of option ids in the correct order
+        rows = OrderQuestion.objects.filter(id__in=ids).order_by(
+            'id', 'order_options__correct_order', 'order_options__id'
+        ).values_list('id', 'order_options__id', *PLACEMENT_FIELDS)
+        for question_id, option_id, *placement in rows:
+            key = (None, 'order', question_id)
+            self.placements[key] = Placement(*placement)
+            correct_order = self.keys.setdefault(key, [])
+            if option_id is not None:
+                correct_order.append(option_id)
+
+    def _load_connect(self, ids):
+        # Key: set of correct connection pairs (bidirectional, stored sorted)
+        rows = ConnectQuestion.objects.filter(id__in=ids).values_list(
+            'id', 'correct_connections__from_option_id', 'correct_connections__to_option_id',
+            *PLACEMENT_FIELDS
+        )
+        for question_id, from_option_id, to_option_id, *placement in rows:
+            key = (None, 'connect', question_id)
+            self.placements[key] = Placement(*placement)
+            correct_pairs = self.keys.setdefault(key, set())
+            if from_option_id is not None:
+                correct_pairs.add(tuple(sorted([from_option_id, to_option_id])))
+
+    def _load_number(self, ids):
+        # Key: (correct_answer, tolerance)
+        rows = NumberQuestion.objects.filter(id__in=ids).values_list(
+            'id', 'correct_answer', 'tolerance', *PLACEMENT_FIELDS
+        )
+        for question_id, correct_answer, tolerance, *placement in rows:
+            key = (None, 'number', question_id)
+            self.placements[key] = Placement(*placement)
+            self.keys[key] = (correct_answer, tolerance)
+
+    def _load_version(self, version_id, snapshot):
+        """Load the answer keys frozen in a QuizVersion snapshot."""
+        for name, entry in snapshot['keys'].items():
+            question_type, question_id = name.rsplit(':', 1)
+            key = (version_id, question_type, int(question_id))
+            self.placements[key] = Placement(*entry['placement'])
+            answer_key = entry['key']
+            if question_type == 'multiple_choice':
+                answer_key = set(answer_key)
+            elif question_type == 'connect':
+                answer_key = {tuple(pair) for pair in answer_key}
+            elif question_type == 'number':
+                answer_key = tuple(answer_key)
+            self.keys[key] = answer_key
+
+    def snapshot(self):
+        """Return the loaded live answer keys in the JSON form stored in a QuizVersion snapshot."""
+        snapshot = {}
+        for key, answer_key in self.keys.items():
+            version_id, question_type, question_id = key
+            if version_id is not None:
+                continue
+            if question_type in ('multiple_choice', 'connect'):
+                answer_key = sorted(answer_key)
+            snapshot[snapshot_key(question_type, question_id)] = {
+                'key': list(answer_key), 'placement': list(self.placements[key])
+            }
+        return snapshot
+
+    def _key(self, answer):
+        question_type = self.type_by_ct_id.get(answer.question_content_type_id)
+        return (answer.quiz_version_id, question_type, answer.question_id)
+
+    def placement(self, answer):
+        """Return the Placement of the answer's question, or None if it doesn't exist."""
+        return self.placements.get(self._key(answer))
+
+    def topic_id(self, answer):
+        """Return the topic id of the answer's question, or None if it doesn't exist."""
+        placement = self.placement(answer)
+        return placement.topic_id if placement else None
+
+    def grade(self, answer):
+        """Return whether the answer is correct."""
+        return self.evaluate(answer).is_correct
+
+    def score(self, answer):
+        """Return the partial credit of the answer, between 0.0 and 1.0."""
+        return self.evaluate(answer).score
+
+    def evaluate(self, answer):
+        """Return the Grade of the answer, see ``evaluate_answer``."""
+        key = self._key(answer)
+        if key not in self.keys:
+            return Grade(False, 0.0)
+        _, question_type, _ = key
+        return evaluate_answer(question_type, self.keys[key], answer)
+
+
+def evaluate_answer(question_type, answer_key, answer):
+    """Return the Grade of ``answer`` to a question of ``question_type`` with ``answer_key``.
+
+    Multiple choice and number questions score 1.0 or 0.0. Order questions
+    score the fraction of positions that hold the right option, and connect
+    questions the overlap between the given and the correct connections.
+    A score of 1.0 always means the answer is correct. Only the answer's
+    ``answer_id`` and ``answer_data`` are read.
+    """
+    incorrect = Grade(False, 0.0)
+
+    if question_type == 'multiple_choice':
+        if answer.answer_id in answer_key:
+            return Grade(True, 1.0)
+        return incorrect
+
+    if question_type == 'order':
+        if not answer.answer_data or not isinstance(answer.answer_data, list):
+            return incorrect
+        if answer.answer_data == answer_key:
+            return Grade(True, 1.0)
+        in_place = sum(1 for given, expected in zip(answer.answer_data, answer_key) if given == expected)
+        return Grade(False, in_place / max(len(answer_key), len(answer.answer_data)))
+
+    if question_type == 'connect':
+        if not answer.answer_data or not isinstance(answer.answer_data, list):
+            return incorrect
+        student_pairs = set()
+        for pair in answer.answer_data:
+            if isinstance(pair, list) and len(pair) == 2:
+                student_pairs.add(tuple(sorted(pair)))
+        if student_pairs == answer_key:
+            return Grade(True, 1.0)
+        return Grade(False, len(student_pairs & answer_key) / len(student_pairs | answer_key))
+
+    if question_type == 'number':
+        correct_answer, tolerance = answer_key
+        try:
+            if answer.answer_data is None:
+                return incorrect
+            if abs(float(answer.answer_data) - correct_answer) <= tolerance:
+                return Grade(True, 1.0)
+            return incorrect
+        except (ValueError, TypeError):
+            return incorrect
+
+    return incorrect
+
+
+def grade_answers(answers):
+    """Grade a batch of answers, returning a dict of answer id -> correctness.
+
+    Issues at most one query per question type, regardless of the number of
+    answers.
+    """
+    answers = list(answers)
+    keys = AnswerKeys(answers)
+    return {answer.id: keys.grade(answer) for answer in answers}
+
+
+def regrade_answers(answers, batch_size=1000):
+    """Recompute and persist ``is_correct`` and ``score`` for a queryset of answers.
+
+    Answers are processed in batches of ``batch_size``; only rows whose grade
+    changed are written, with one ``bulk_update`` per batch. Returns the list
+    of answers whose ``is_correct`` flipped, so callers can adjust derived
+    tables.
+    """
+    flipped = []
+    batch = []
+
+    def flush(batch):
+        keys = AnswerKeys(batch)
+        changed = []
+        for answer in batch:
+            grade = keys.evaluate(answer)
+            if grade.is_correct != answer.is_correct:
+                flipped.append(answer)
+            if grade != (answer.is_correct, answer.score):
+                answer.is_correct, answer.score = grade
+                changed.append(answer)
+        StudentQuestionAnswer.objects.bulk_update(changed, ['is_correct', 'score'], batch_size=batch_size)
+
+    for answer in answers.order_by('id').iterator(chunk_size=batch_size):
+        batch.append(answer)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return flipped
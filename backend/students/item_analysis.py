@@ -0,0 +1,157 @@
+"""Vectorized item analysis of student answers.
+
+Loads all answers for a quiz or course with one streaming query into a dense
+students x questions matrix and computes classical test theory statistics
+for every question at once with NumPy:
+
+- ``p_value``: the fraction of correct responses (difficulty)
+- ``point_biserial``: the correlation between answering the question
+  correctly and the student's number of correct answers on the other
+  questions (discrimination)
+- ``option_rates``: how often each option of a multiple choice question
+  was selected
+
+Results are stored on ``quizzes.QuestionStatistics``.
+"""
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from quizzes.models import QuestionRef, QuestionStatistics
+from .models import StudentQuestionAnswer
+
+
+STATISTICS_FIELDS = ['responses', 'p_value', 'mean_score', 'point_biserial', 'option_rates', 'computed_at']
+
+
+def _answer_columns(answers, item_index):
+    """Stream answers into parallel NumPy arrays, skipping questions outside ``item_index``."""
+    student_ids, items, correct, scores, options = [], [], [], [], []
+    rows = answers.order_by('id').values_list(
+        'student_id', 'question_content_type_id', 'question_id', 'is_correct', 'score', 'answer_id'
+    )
+    for student_id, content_type_id, question_id, is_correct, score, option_id in rows.iterator(chunk_size=5000):
+        item = item_index.get((content_type_id, question_id))
+        if item is None:
+            continue
+        student_ids.append(student_id)
+        items.append(item)
+        correct.append(is_correct)
+        scores.append(score)
+        options.append(option_id or 0)
+    return (
+        np.array(student_ids, dtype=np.int64),
+        np.array(items, dtype=np.int64),
+        np.array(correct, dtype=np.float64),
+        np.array(scores, dtype=np.float64),
+        np.array(options, dtype=np.int64),
+    )
+
+
+def _point_biserial(answered, correct):
+    """Corrected item-total correlation of every column of the answer matrix.
+
+    ``answered`` and ``correct`` are students x items matrices; only students
+    that answered an item take part in its correlation. Returns NaN where the
+    correlation is undefined (fewer than two responses or no variance).
+    """
+    rest = correct.sum(axis=1, keepdims=True) - correct
+    n = answered.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = (correct * answered).sum(axis=0) / n
+        mean_y = (rest * answered).sum(axis=0) / n
+        cov = (correct * rest * answered).sum(axis=0) / n - mean_x * mean_y
+        var_x = (correct ** 2 * answered).sum(axis=0) / n - mean_x ** 2
+        var_y = (rest ** 2 * answered).sum(axis=0) / n - mean_y ** 2
+        r = cov / np.sqrt(var_x * var_y)
+    r[(n < 2) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def _option_rates(items, options, responses):
+    """Selection rate of every (item, option) pair, as a list of dicts indexed by item."""
+    rates = [{} for _ in responses]
+    chosen = options != 0
+    if not chosen.any():
+        return rates
+    pairs, counts = np.unique(
+        np.stack([items[chosen], options[chosen]]), axis=1, return_counts=True
+    )
+    for (item, option_id), count in zip(pairs.T.tolist(), counts.tolist()):
+        rates[item][str(option_id)] = count / responses[item]
+    return rates
+
+
+def _none_if_nan(value):
+    return None if np.isnan(value) else float(value)
+
+
+def compute_item_statistics(quiz=None, course=None):
+    """Compute and store the statistics of all questions of a quiz or course.
+
+    Exactly one of ``quiz`` and ``course`` must be given. Returns the list of
+    saved QuestionStatistics.
+    """
+    if (quiz is None) == (course is None):
+        raise ValueError('Pass either a quiz or a course')
+    if quiz is not None:
+        organization_id = quiz.organization_id
+        refs = list(QuestionRef.objects.filter(quiz=quiz))
+        answers = StudentQuestionAnswer.objects.filter(quiz=quiz)
+    else:
+        organization_id = course.organization_id
+        refs = list(QuestionRef.objects.filter(topic__lesson__module__course=course))
+        answers = StudentQuestionAnswer.objects.filter(course=course)
+    if not refs:
+        return []
+
+    item_index = {(ref.question_content_type_id, ref.question_id): index for index, ref in enumerate(refs)}
+    student_ids, items, correct, scores, options = _answer_columns(answers, item_index)
+
+    # Keep only the latest answer of a student to a question (a course can
+    # contain answers to the same question from several quizzes)
+    students, rows = np.unique(student_ids, return_inverse=True)
+    cells = rows * len(refs) + items
+    _, last = np.unique(cells[::-1], return_index=True)
+    latest = len(cells) - 1 - last
+    rows, items, correct, scores, options = rows[latest], items[latest], correct[latest], scores[latest], options[latest]
+
+    # Dense students x items matrices
+    shape = (len(students), len(refs))
+    answered = np.zeros(shape)
+    correct_matrix = np.zeros(shape)
+    score_matrix = np.zeros(shape)
+    answered[rows, items] = 1.0
+    correct_matrix[rows, items] = correct
+    score_matrix[rows, items] = scores
+
+    responses = answered.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p_values = correct_matrix.sum(axis=0) / responses
+        mean_scores = score_matrix.sum(axis=0) / responses
+    point_biserials = _point_biserial(answered, correct_matrix)
+    option_rates = _option_rates(items, options, responses)
+
+    now = timezone.now()
+    statistics = [
+        QuestionStatistics(
+            organization_id=organization_id,
+            question_ref=ref,
+            responses=int(responses[index]),
+            p_value=_none_if_nan(p_values[index]),
+            mean_score=_none_if_nan(mean_scores[index]),
+            point_biserial=_none_if_nan(point_biserials[index]),
+            option_rates=option_rates[index],
+            computed_at=now,
+        )
+        for index, ref in enumerate(refs)
+    ]
+    with transaction.atomic():
+        QuestionStatistics.objects.bulk_create(
+            statistics,
+            update_conflicts=True,
+            unique_fields=['question_ref'],
+            update_fields=STATISTICS_FIELDS,
+            batch_size=1000,
+        )
+    return statistics
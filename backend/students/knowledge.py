@@ -0,0 +1,290 @@
+"""Bayesian Knowledge Tracing (BKT) of topic mastery.
+
+Every (student, topic) row of StudentTopicMastery carries ``p_known``, the
+estimated probability that the student knows the topic. Each new answer is
+an observation that updates it in constant time:
+
+1. Condition on the answer, using the topic's slip and guess probabilities.
+2. Apply the probability of learning the topic from this opportunity.
+
+The update is a single UPDATE with ``F()`` expressions, so concurrent
+answers don't overwrite each other. The per-topic parameters are fitted
+with expectation maximization over all historical answers by
+``fit_knowledge_tracing``, vectorized over students with NumPy.
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courses.models import Topic
+from .models import StudentQuestionAnswer, StudentTopicMastery, TopicKnowledgeParams
+
+
+KnowledgeParams = namedtuple('KnowledgeParams', ['p_init', 'p_transit', 'p_slip', 'p_guess'])
+
+# Used for topics that have no fitted TopicKnowledgeParams yet
+DEFAULT_PARAMS = KnowledgeParams(p_init=0.3, p_transit=0.1, p_slip=0.1, p_guess=0.2)
+
+# Bounds keeping fitted parameters identifiable: a student who knows the
+# topic must be more likely to answer correctly than one who doesn't
+PARAM_BOUNDS = KnowledgeParams(
+    p_init=(0.01, 0.99), p_transit=(0.001, 0.5), p_slip=(0.01, 0.3), p_guess=(0.01, 0.4)
+)
+
+
+def topic_params(topic_id):
+    """Return the KnowledgeParams of a topic, or the defaults if it has none."""
+    params = TopicKnowledgeParams.objects.filter(topic_id=topic_id).values_list(
+        'p_init', 'p_transit', 'p_slip', 'p_guess'
+    ).first()
+    return KnowledgeParams(*params) if params else DEFAULT_PARAMS
+
+
+def trace_answer(state, params=None):
+    """Update ``p_known`` of the answer's (student, topic) mastery row with one observation.
+
+    ``state`` is the answer's ``students.mastery.AnswerState``; the mastery
+    row must already exist.
+    """
+    if state is None:
+        return
+    if params is None:
+        params = topic_params(state.topic_id)
+    prior = Coalesce(F('p_known'), Value(params.p_init), output_field=FloatField())
+    if state.correct:
+        evidence_known = prior * (1 - params.p_slip)
+        evidence_unknown = (1 - prior) * params.p_guess
+    else:
+        evidence_known = prior * params.p_slip
+        evidence_unknown = (1 - prior) * (1 - params.p_guess)
+    posterior = evidence_known / (evidence_known + evidence_unknown)
+    StudentTopicMastery.objects.filter(
+        student_id=state.student_id, topic_id=state.topic_id
+    ).update(p_known=posterior + (1 - posterior) * params.p_transit)
+
+
+def _observe(p_known, correct, params):
+    """Return the estimate after one observation, as ``trace_answer`` computes it in SQL."""
+    if correct:
+        evidence_known = p_known * (1 - params.p_slip)
+        evidence_unknown = (1 - p_known) * params.p_guess
+    else:
+        evidence_known = p_known * params.p_slip
+        evidence_unknown = (1 - p_known) * (1 - params.p_guess)
+    posterior = evidence_known / (evidence_known + evidence_unknown)
+    return posterior + (1 - posterior) * params.p_transit
+
+
+def trace_answers(states):
+    """Update ``p_known`` for a batch of answer observations, in the given order.
+
+    The batch counterpart of ``trace_answer``: loads the parameters and the
+    mastery rows once, locking the rows, applies the observations in memory
+    and writes them back with one ``bulk_update``. The mastery rows must
+    already exist.
+    """
+    states = [state for state in states if state is not None]
+    if not states:
+        return
+    topic_ids = {state.topic_id for state in states}
+    params = {
+        topic_id: KnowledgeParams(*values)
+        for topic_id, *values in TopicKnowledgeParams.objects.filter(topic_id__in=topic_ids).values_list(
+            'topic_id', 'p_init', 'p_transit', 'p_slip', 'p_guess'
+        )
+    }
+    with transaction.atomic():
+        masteries = {
+            (mastery.student_id, mastery.topic_id): mastery
+            for mastery in StudentTopicMastery.objects.select_for_update().filter(
+                student_id__in={state.student_id for state in states}, topic_id__in=topic_ids
+            ).order_by()
+        }
+        for state in states:
+            mastery = masteries.get((state.student_id, state.topic_id))
+            if mastery is None:
+                continue
+            knowledge = params.get(state.topic_id, DEFAULT_PARAMS)
+            prior = knowledge.p_init if mastery.p_known is None else mastery.p_known
+            mastery.p_known = _observe(prior, state.correct, knowledge)
+        StudentTopicMastery.objects.bulk_update(masteries.values(), ['p_known'], batch_size=1000)
+
+
+def _answer_sequences(answers):
+    """Stream answers into per-topic lists of per-student correctness sequences.
+
+    Returns a dict of topic id -> (student ids, list of 0/1 sequences) with
+    every sequence in answer order.
+    """
+    sequences = {}
+    rows = answers.filter(topic__isnull=False).order_by(
+        'topic_id', 'student_id', 'updated_at', 'id'
+    ).values_list('topic_id', 'student_id', 'is_correct')
+    current = None
+    for topic_id, student_id, is_correct in rows.iterator(chunk_size=5000):
+        student_ids, topic_sequences = sequences.setdefault(topic_id, ([], []))
+        if current != (topic_id, student_id):
+            current = (topic_id, student_id)
+            student_ids.append(student_id)
+            topic_sequences.append([])
+        topic_sequences[-1].append(int(is_correct))
+    return sequences
+
+
+def _pad(sequences):
+    """Return a students x steps observation matrix and a mask of the real steps."""
+    steps = max(len(sequence) for sequence in sequences)
+    observations = np.zeros((len(sequences), steps))
+    mask = np.zeros((len(sequences), steps), dtype=bool)
+    for row, sequence in enumerate(sequences):
+        observations[row, :len(sequence)] = sequence
+        mask[row, :len(sequence)] = True
+    return observations, mask
+
+
+def _likelihoods(observations, params):
+    """P(observation | unknown) and P(observation | known) for every step."""
+    unknown = np.where(observations == 1, params.p_guess, 1 - params.p_guess)
+    known = np.where(observations == 1, 1 - params.p_slip, params.p_slip)
+    return unknown, known
+
+
+def knowledge_trace(observations, mask, params):
+    """Run the BKT filter over all sequences at once.
+
+    Returns, per student, the probability of knowing the topic after their
+    last answer.
+    """
+    unknown, known = _likelihoods(observations, params)
+    p_known = np.full(len(observations), params.p_init)
+    for step in range(observations.shape[1]):
+        active = mask[:, step]
+        evidence_known = p_known * known[:, step]
+        posterior = evidence_known / (evidence_known + (1 - p_known) * unknown[:, step])
+        updated = posterior + (1 - posterior) * params.p_transit
+        p_known = np.where(active, updated, p_known)
+    return p_known
+
+
+def _expectation_maximization(observations, mask, params, iterations, tolerance):
+    """Fit KnowledgeParams to the observations with the Baum-Welch algorithm.
+
+    The model is a two-state hidden Markov model (unknown, known) without
+    forgetting. Forward and backward passes loop over steps and are
+    vectorized over students; messages are normalized per step.
+    """
+    students, steps = observations.shape
+    weights = mask.astype(float)
+    for _ in range(iterations):
+        unknown, known = _likelihoods(observations, params)
+        transition = np.array([[1 - params.p_transit, params.p_transit], [0.0, 1.0]])
+        emission = np.stack([unknown, known], axis=2)
+
+        # Forward pass: alpha[:, t] = P(state at t | observations up to t)
+        alpha = np.zeros((students, steps, 2))
+        scale = np.ones((students, steps))
+        belief = np.stack([np.full(students, 1 - params.p_init), np.full(students, params.p_init)], axis=1)
+        for step in range(steps):
+            if step:
+                belief = alpha[:, step - 1] @ transition
+            joint = belief * emission[:, step]
+            scale[:, step] = joint.sum(axis=1)
+            alpha[:, step] = joint / scale[:, step, None]
+
+        # Backward pass, with padded steps passing messages through unchanged
+        beta = np.ones((students, steps, 2))
+        for step in range(steps - 2, -1, -1):
+            message = (transition @ (emission[:, step + 1] * beta[:, step + 1]).T).T / scale[:, step + 1, None]
+            beta[:, step] = np.where(mask[:, step + 1, None], message, 1.0)
+
+        gamma = alpha * beta
+        gamma /= gamma.sum(axis=2, keepdims=True)
+
+        # Expected unknown -> known transitions between consecutive real steps
+        following = mask[:, 1:]
+        learned = (
+            alpha[:, :-1, 0] * params.p_transit * emission[:, 1:, 1] * beta[:, 1:, 1] / scale[:, 1:]
+        ) * following
+        stayed_unknown = gamma[:, :-1, 0] * following
+
+        p_unknown = gamma[:, :, 0] * weights
+        p_known = gamma[:, :, 1] * weights
+        fitted = KnowledgeParams(
+            p_init=gamma[:, 0, 1].mean(),
+            p_transit=learned.sum() / max(stayed_unknown.sum(), 1e-12),
+            p_slip=(p_known * (1 - observations)).sum() / max(p_known.sum(), 1e-12),
+            p_guess=(p_unknown * observations).sum() / max(p_unknown.sum(), 1e-12),
+        )
+        fitted = KnowledgeParams(*(
+            float(np.clip(value, *bounds)) for value, bounds in zip(fitted, PARAM_BOUNDS)
+        ))
+        converged = max(abs(new - old) for new, old in zip(fitted, params)) < tolerance
+        params = fitted
+        if converged:
+            break
+    return params
+
+
+def fit_knowledge_tracing(organization=None, iterations=50, tolerance=1e-4):
+    """Refit the parameters of every topic and recompute ``p_known`` from all answers.
+
+    Loads the answers with one streaming query. Returns the number of
+    topics fitted.
+    """
+    answers = StudentQuestionAnswer.objects.all()
+    if organization is not None:
+        answers = answers.filter(organization=organization)
+    sequences = _answer_sequences(answers)
+    if not sequences:
+        return 0
+
+    existing = {
+        params.topic_id: params
+        for params in TopicKnowledgeParams.objects.filter(topic_id__in=sequences.keys())
+    }
+    organizations = dict(Topic.objects.filter(id__in=sequences.keys()).values_list('id', 'organization_id'))
+    masteries = {
+        (mastery.student_id, mastery.topic_id): mastery
+        for mastery in StudentTopicMastery.objects.filter(topic_id__in=sequences.keys())
+    }
+
+    now = timezone.now()
+    params_to_save = []
+    masteries_to_update = []
+    for topic_id, (student_ids, topic_sequences) in sequences.items():
+        observations, mask = _pad(topic_sequences)
+        start = existing.get(topic_id)
+        start = KnowledgeParams(
+            start.p_init, start.p_transit, start.p_slip, start.p_guess
+        ) if start else DEFAULT_PARAMS
+        fitted = _expectation_maximization(observations, mask, start, iterations, tolerance)
+
+        row = existing.get(topic_id) or TopicKnowledgeParams(
+            topic_id=topic_id, organization_id=organizations[topic_id]
+        )
+        row.p_init, row.p_transit, row.p_slip, row.p_guess = fitted
+        row.answers_used = int(mask.sum())
+        row.fitted_at = now
+        params_to_save.append(row)
+
+        for student_id, p_known in zip(student_ids, knowledge_trace(observations, mask, fitted).tolist()):
+            mastery = masteries.get((student_id, topic_id))
+            if mastery is not None:
+                mastery.p_known = p_known
+                masteries_to_update.append(mastery)
+
+    with transaction.atomic():
+        TopicKnowledgeParams.objects.bulk_create(
+            [params for params in params_to_save if params.pk is None], batch_size=1000
+        )
+        TopicKnowledgeParams.objects.bulk_update(
+            [params for params in params_to_save if params.pk is not None],
+            ['p_init', 'p_transit', 'p_slip', 'p_guess', 'answers_used', 'fitted_at'],
+            batch_size=1000
+        )
+        StudentTopicMastery.objects.bulk_update(masteries_to_update, ['p_known'], batch_size=1000)
+    return len(params_to_save)
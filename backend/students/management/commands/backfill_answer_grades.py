@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from students.grading import regrade_answers
+from students.mastery import rebuild_topic_mastery
+from students.models import StudentQuestionAnswer
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored is_correct and score of all student answers in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            help='Slug of the organization to backfill (defaults to all organizations)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of answers graded and written per batch'
+        )
+
+    def handle(self, *args, **options):
+        answers = StudentQuestionAnswer.objects.all()
+        organization = None
+        if options['organization']:
+            try:
+                organization = Organization.objects.get(slug=options['organization'])
+            except Organization.DoesNotExist:
+                raise CommandError(f'Organization "{options["organization"]}" does not exist')
+            answers = answers.filter(organization=organization)
+        
+        self.stdout.write(f'Grading {answers.count()} answers...')
+        flipped = regrade_answers(answers, batch_size=options['batch_size'])
+        self.stdout.write(f'{len(flipped)} answers changed correctness')
+        
+        # Mastery counts are derived from is_correct, so rebuild them once at the end
+        self.stdout.write('Rebuilding topic mastery...')
+        rebuild_topic_mastery(organization=organization)
+        
+        self.stdout.write(
+            self.style.SUCCESS('Successfully backfilled answer grades')
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+from quizzes.models import Quiz
+from students.item_analysis import compute_item_statistics
+
+
+class Command(BaseCommand):
+    help = 'Compute item-analysis statistics (difficulty, discrimination, option rates) of questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quiz',
+            type=int,
+            help='Id of the quiz to analyse'
+        )
+        parser.add_argument(
+            '--course',
+            type=int,
+            help='Id of the course to analyse (all questions in its topics)'
+        )
+
+    def handle(self, *args, **options):
+        if options['quiz'] and options['course']:
+            raise CommandError('Pass either --quiz or --course, not both')
+        
+        if options['course']:
+            try:
+                course = Course.objects.get(pk=options['course'])
+            except Course.DoesNotExist:
+                raise CommandError(f'Course {options["course"]} does not exist')
+            count = len(compute_item_statistics(course=course))
+        else:
+            quizzes = Quiz.objects.all()
+            if options['quiz']:
+                quizzes = quizzes.filter(pk=options['quiz'])
+                if not quizzes.exists():
+                    raise CommandError(f'Quiz {options["quiz"]} does not exist')
+            count = 0
+            for quiz in quizzes:
+                count += len(compute_item_statistics(quiz=quiz))
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully computed statistics for {count} questions')
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from students.knowledge import fit_knowledge_tracing
+
+
+class Command(BaseCommand):
+    help = 'Fit the knowledge tracing parameters of every topic and recompute mastery estimates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            help='Slug of the organization to fit (defaults to all organizations)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Maximum number of EM iterations per topic (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        organization = None
+        if options['organization']:
+            try:
+                organization = Organization.objects.get(slug=options['organization'])
+            except Organization.DoesNotExist:
+                raise CommandError(f'Organization "{options["organization"]}" does not exist')
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        
+        self.stdout.write('Fitting knowledge tracing parameters...')
+        count = fit_knowledge_tracing(organization=organization, iterations=options['iterations'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully fitted {count} topics')
+        )
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from students.answer_buffer import get_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write the answers in the write-behind answer buffer to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running and flush every --interval milliseconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.ANSWER_BUFFER_FLUSH_INTERVAL_MS or 500,
+            help='Flush interval in milliseconds when watching (default: ANSWER_BUFFER_FLUSH_INTERVAL_MS or 500)'
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] < 1:
+            raise CommandError('--interval must be at least 1')
+        
+        answer_buffer = get_buffer()
+        if options['watch']:
+            self.stdout.write(f'Flushing {settings.ANSWER_BUFFER_PATH} every {options["interval"]} ms...')
+            answer_buffer.run_flusher(options['interval'])
+        
+        count = answer_buffer.flush()
+        dead_letters = len(answer_buffer.dead_letters())
+        if dead_letters:
+            self.stdout.write(self.style.WARNING(
+                f'{dead_letters} answers could not be written, see the dead_answer table of {settings.ANSWER_BUFFER_PATH}'
+            ))
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully flushed {count} buffered answers')
+        )
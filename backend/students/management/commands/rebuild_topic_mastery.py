@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from students.mastery import rebuild_topic_mastery
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-student, per-topic mastery table from all student answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            help='Slug of the organization to rebuild (defaults to all organizations)'
+        )
+
+    def handle(self, *args, **options):
+        organization = None
+        if options['organization']:
+            try:
+                organization = Organization.objects.get(slug=options['organization'])
+            except Organization.DoesNotExist:
+                raise CommandError(f'Organization "{options["organization"]}" does not exist')
+        
+        self.stdout.write('Rebuilding topic mastery...')
+        count = rebuild_topic_mastery(organization=organization)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {count} topic mastery rows')
+        )
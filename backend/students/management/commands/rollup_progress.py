@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from students.snapshots import rollup_progress
+
+
+class Command(BaseCommand):
+    help = 'Roll student answers saved since the last run up into daily progress snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            help='Slug of the organization to roll up (defaults to all organizations)'
+        )
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.all()
+        if options['organization']:
+            organizations = organizations.filter(slug=options['organization'])
+            if not organizations.exists():
+                raise CommandError(f'Organization "{options["organization"]}" does not exist')
+        
+        total = 0
+        for organization in organizations:
+            count = rollup_progress(organization)
+            if count:
+                self.stdout.write(f'{organization.name}: rolled up {count} answers')
+            total += count
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rolled up {total} answers into progress snapshots')
+        )
@@ -0,0 +1,191 @@
+"""Incremental maintenance of the StudentTopicMastery table.
+
+Every answer contributes one to ``answered`` and, when correct, one to
+``correct`` of the (student, topic) row of its question's topic. Writes
+apply the difference between the previous and the new contribution of an
+answer using ``F()`` expressions, so concurrent answers for the same
+student and topic do not overwrite each other.
+"""
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+
+from .models import StudentQuestionAnswer, StudentTopicMastery
+
+
+# Contribution of a single answer to the mastery table
+AnswerState = namedtuple('AnswerState', ['student_id', 'organization_id', 'topic_id', 'correct'])
+
+
+def answer_state(answer):
+    """Return the AnswerState for an answer, or None if it has no topic.
+
+    Reads the answer's denormalized ``topic`` and persisted ``is_correct``.
+    """
+    if answer.topic_id is None:
+        return None
+    return AnswerState(answer.student_id, answer.organization_id, answer.topic_id, answer.is_correct)
+
+
+def stored_answer_state(pk):
+    """Return the AnswerState of an answer as currently stored in the database."""
+    if pk is None:
+        return None
+    stored = StudentQuestionAnswer.objects.filter(pk=pk, topic__isnull=False).values_list(
+        'student_id', 'organization_id', 'topic_id', 'is_correct'
+    ).first()
+    return AnswerState(*stored) if stored else None
+
+
+def apply_answer_change(previous, current, answered_at=None):
+    """Apply the change from one AnswerState to another to the mastery table.
+
+    ``previous`` is None for a newly created answer and ``current`` is None
+    for a deleted answer.
+    """
+    if previous == current:
+        if current is not None and answered_at is not None:
+            StudentTopicMastery.objects.filter(
+                student_id=current.student_id, topic_id=current.topic_id
+            ).update(last_answer_at=answered_at)
+        return
+
+    with transaction.atomic():
+        if previous is not None:
+            _add(previous, answered=-1, correct=-int(previous.correct))
+        if current is not None:
+            _add(current, answered=1, correct=int(current.correct), answered_at=answered_at)
+
+
+def _add(state, answered, correct, answered_at=None):
+    """Add the given deltas to the (student, topic) mastery row, creating it if needed."""
+    row, _ = StudentTopicMastery.objects.get_or_create(
+        student_id=state.student_id,
+        topic_id=state.topic_id,
+        defaults={'organization_id': state.organization_id}
+    )
+    updates = {
+        'answered': F('answered') + answered,
+        'correct': F('correct') + correct,
+    }
+    if answered_at is not None:
+        updates['last_answer_at'] = answered_at
+    StudentTopicMastery.objects.filter(pk=row.pk).update(**updates)
+
+
+def apply_answer_changes(changes, answered_at=None):
+    """Apply a batch of ``(previous, current)`` AnswerState changes to the mastery table.
+
+    The batch counterpart of ``apply_answer_change``: missing rows are
+    created with one ``bulk_create`` and one UPDATE is issued per affected
+    (student, topic) row, however many answers touch it.
+    """
+    deltas = {}
+    for previous, current in changes:
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None:
+                continue
+            key = (state.student_id, state.topic_id)
+            answered, correct, organization_id = deltas.get(key, (0, 0, state.organization_id))
+            if previous != current:
+                answered += sign
+                correct += sign * int(state.correct)
+            deltas[key] = (answered, correct, organization_id)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        StudentTopicMastery.objects.bulk_create([
+            StudentTopicMastery(student_id=student_id, topic_id=topic_id, organization_id=organization_id)
+            for (student_id, topic_id), (_, _, organization_id) in deltas.items()
+        ], ignore_conflicts=True)
+        for (student_id, topic_id), (answered, correct, _) in deltas.items():
+            updates = {
+                'answered': F('answered') + answered,
+                'correct': F('correct') + correct,
+            }
+            if answered_at is not None:
+                updates['last_answer_at'] = answered_at
+            StudentTopicMastery.objects.filter(
+                student_id=student_id, topic_id=topic_id
+            ).update(**updates)
+
+
+def apply_correctness_changes(answers):
+    """Adjust ``correct`` counts for answers whose ``is_correct`` flipped after a regrade.
+
+    ``answers`` is the list returned by ``students.grading.regrade_answers``;
+    one UPDATE is issued per affected (student, topic) row.
+    """
+    deltas = Counter()
+    for answer in answers:
+        if answer.topic_id is not None:
+            deltas[(answer.student_id, answer.topic_id)] += 1 if answer.is_correct else -1
+    with transaction.atomic():
+        for (student_id, topic_id), delta in deltas.items():
+            if delta:
+                StudentTopicMastery.objects.filter(
+                    student_id=student_id, topic_id=topic_id
+                ).update(correct=F('correct') + delta)
+
+
+def _aggregate(answers):
+    """Build unsaved mastery rows from a queryset of answers with one grouped query."""
+    totals = answers.filter(topic__isnull=False).values(
+        'organization_id', 'student_id', 'topic_id'
+    ).annotate(
+        answered=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+        last_answer_at=Max('updated_at')
+    ).order_by()
+    return [StudentTopicMastery(**row) for row in totals]
+
+
+def _replace(masteries, rows):
+    """Replace the ``masteries`` queryset with ``rows``, keeping knowledge tracing estimates."""
+    p_known = {
+        (student_id, topic_id): estimate
+        for student_id, topic_id, estimate in masteries.filter(
+            p_known__isnull=False
+        ).values_list('student_id', 'topic_id', 'p_known')
+    }
+    for row in rows:
+        row.p_known = p_known.get((row.student_id, row.topic_id))
+    with transaction.atomic():
+        masteries.delete()
+        StudentTopicMastery.objects.bulk_create(rows, batch_size=1000)
+
+
+def refresh_topic_mastery(student_ids, topic_ids):
+    """Recompute the mastery rows of the given students in the given topics.
+
+    Used when answers move between topics, which the incremental deltas
+    don't cover.
+    """
+    student_ids, topic_ids = list(student_ids), list(topic_ids)
+    if not student_ids or not topic_ids:
+        return
+    rows = _aggregate(StudentQuestionAnswer.objects.filter(
+        student_id__in=student_ids, topic_id__in=topic_ids
+    ))
+    _replace(StudentTopicMastery.objects.filter(
+        student_id__in=student_ids, topic_id__in=topic_ids
+    ), rows)
+
+
+def rebuild_topic_mastery(organization=None):
+    """Recompute the mastery table from scratch from the raw answers.
+
+    Aggregates the persisted ``is_correct`` and ``topic`` of the answers in a
+    single grouped query. Returns the number of mastery rows written.
+    """
+    answers = StudentQuestionAnswer.objects.all()
+    masteries = StudentTopicMastery.objects.all()
+    if organization is not None:
+        answers = answers.filter(organization=organization)
+        masteries = masteries.filter(organization=organization)
+
+    rows = _aggregate(answers)
+    _replace(masteries, rows)
+    return len(rows)
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0005_remove_material_lesson_remove_material_module_and_more"),
+        ("organizations", "0001_initial"),
+        ("students", "0005_alter_studentquestionanswer_question_content_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentTopicMastery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("answered", models.PositiveIntegerField(default=0)),
+                ("correct", models.PositiveIntegerField(default=0)),
+                ("last_answer_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="organizations.organization",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="topic_masteries",
+                        to="students.student",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="student_masteries",
+                        to="courses.topic",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Student topic masteries",
+                "ordering": ["student", "topic"],
+                "unique_together": {("student", "topic")},
+            },
+        ),
+    ]
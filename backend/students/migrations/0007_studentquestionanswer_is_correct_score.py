@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("students", "0006_studenttopicmastery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentquestionanswer",
+            name="is_correct",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="studentquestionanswer",
+            name="score",
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+QUESTION_MODELS = ['multiplechoicequestion', 'orderquestion', 'connectquestion', 'numberquestion']
+
+
+def populate_answer_placement(apps, schema_editor):
+    """Copy the topic, lesson, module and course of each answer's question onto the answer."""
+    StudentQuestionAnswer = apps.get_model('students', 'StudentQuestionAnswer')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    
+    for model_name in QUESTION_MODELS:
+        try:
+            question_ct = ContentType.objects.get(app_label='quizzes', model=model_name)
+        except ContentType.DoesNotExist:
+            continue
+        questions = apps.get_model('quizzes', model_name).objects.filter(pk=OuterRef('question_id'))
+        StudentQuestionAnswer.objects.filter(question_content_type=question_ct).update(
+            topic_id=Subquery(questions.values('topic_id')[:1]),
+            lesson_id=Subquery(questions.values('topic__lesson_id')[:1]),
+            module_id=Subquery(questions.values('topic__lesson__module_id')[:1]),
+            course_id=Subquery(questions.values('topic__lesson__module__course_id')[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("courses", "0005_remove_material_lesson_remove_material_module_and_more"),
+        ("organizations", "0001_initial"),
+        ("quizzes", "0010_connectoption_connectable"),
+        ("students", "0007_studentquestionanswer_is_correct_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentquestionanswer",
+            name="course",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="student_answers",
+                to="courses.course",
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentquestionanswer",
+            name="lesson",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="student_answers",
+                to="courses.lesson",
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentquestionanswer",
+            name="module",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="student_answers",
+                to="courses.module",
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentquestionanswer",
+            name="topic",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="student_answers",
+                to="courses.topic",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentquestionanswer",
+            index=models.Index(
+                fields=["topic", "student"], name="answer_topic_student_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentquestionanswer",
+            index=models.Index(
+                fields=["lesson", "student"], name="answer_lesson_student_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentquestionanswer",
+            index=models.Index(
+                fields=["student", "module"], name="answer_student_module_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentquestionanswer",
+            index=models.Index(
+                fields=["course", "student"], name="answer_course_student_idx"
+            ),
+        ),
+        migrations.RunPython(populate_answer_placement, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0005_remove_material_lesson_remove_material_module_and_more"),
+        ("organizations", "0001_initial"),
+        ("students", "0008_studentquestionanswer_placement"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProgressRollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("last_answer_id", models.BigIntegerField(default=0)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="organizations.organization",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("organization",),
+                        name="unique_rollup_watermark_per_organization",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProgressSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("date", models.DateField()),
+                ("answered", models.PositiveIntegerField(default=0)),
+                ("correct", models.PositiveIntegerField(default=0)),
+                (
+                    "newly_mastered",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of students whose first correct answer in the topic was given on this day",
+                    ),
+                ),
+                (
+                    "group",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress_snapshots",
+                        to="students.studentgroup",
+                    ),
+                ),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_set",
+                        to="organizations.organization",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress_snapshots",
+                        to="courses.topic",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["group", "date", "topic"],
+                "indexes": [
+                    models.Index(
+                        fields=["group", "date"], name="snapshot_group_date_idx"
+                    )
+                ],
+                "unique_together": {("group", "topic", "date")},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_remove_material_lesson_remove_material_module_and_more'),
+        ('organizations', '0001_initial'),
+        ('students', '0009_progress_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttopicmastery',
+            name='p_known',
+            field=models.FloatField(blank=True, help_text='Knowledge tracing estimate of the probability that the student knows the topic', null=True),
+        ),
+        migrations.CreateModel(
+            name='TopicKnowledgeParams',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('p_init', models.FloatField(help_text='Probability that a student knows the topic before answering')),
+                ('p_transit', models.FloatField(help_text='Probability of learning the topic after answering a question')),
+                ('p_slip', models.FloatField(help_text='Probability of a wrong answer while knowing the topic')),
+                ('p_guess', models.FloatField(help_text='Probability of a correct answer without knowing the topic')),
+                ('answers_used', models.PositiveIntegerField(default=0)),
+                ('fitted_at', models.DateTimeField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_set', to='organizations.organization')),
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='knowledge_params', to='courses.topic')),
+            ],
+            options={
+                'verbose_name_plural': 'Topic knowledge params',
+            },
+        ),
+    ]
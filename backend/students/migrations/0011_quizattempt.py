@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        ('quizzes', '0012_questionstatistics'),
+        ('students', '0010_topic_knowledge_params'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('in_progress', 'In progress'), ('submitted', 'Submitted')], default='in_progress', max_length=20)),
+                ('draft_answers', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, help_text='Sum of the partial credit of all answers, set on submit', null=True)),
+                ('max_score', models.PositiveIntegerField(blank=True, help_text='Number of questions in the quiz when the attempt was submitted', null=True)),
+                ('correct_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_set', to='organizations.organization')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='quizzes.quiz')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to='students.student')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['quiz', 'status'], name='attempt_quiz_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'in_progress')), fields=('student', 'quiz'), name='unique_in_progress_attempt')],
+            },
+        ),
+    ]
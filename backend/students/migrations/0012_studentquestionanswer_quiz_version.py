@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0013_quizversion'),
+        ('students', '0011_quizattempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentquestionanswer',
+            name='quiz_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='student_answers', to='quizzes.quizversion'),
+        ),
+    ]
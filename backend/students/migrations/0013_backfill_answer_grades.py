@@ -0,0 +1,153 @@
+from django.db import migrations
+from django.db.models import Count, Max, Q
+
+
+BATCH_SIZE = 1000
+
+
+def grade_answer(question_type, answer_key, answer):
+    """Return (is_correct, score) of an answer, as graded when this migration was written.
+
+    A frozen copy of ``students.grading.evaluate_answer``, so later changes
+    to grading don't change what this migration writes.
+    """
+    incorrect = (False, 0.0)
+
+    if question_type == 'multiple_choice':
+        return (True, 1.0) if answer.answer_id in answer_key else incorrect
+
+    if question_type == 'order':
+        if not answer.answer_data or not isinstance(answer.answer_data, list):
+            return incorrect
+        if answer.answer_data == answer_key:
+            return (True, 1.0)
+        in_place = sum(1 for given, expected in zip(answer.answer_data, answer_key) if given == expected)
+        return (False, in_place / max(len(answer_key), len(answer.answer_data)))
+
+    if question_type == 'connect':
+        if not answer.answer_data or not isinstance(answer.answer_data, list):
+            return incorrect
+        student_pairs = set()
+        for pair in answer.answer_data:
+            if isinstance(pair, list) and len(pair) == 2:
+                student_pairs.add(tuple(sorted(pair)))
+        if student_pairs == answer_key:
+            return (True, 1.0)
+        return (False, len(student_pairs & answer_key) / len(student_pairs | answer_key))
+
+    if question_type == 'number':
+        correct_answer, tolerance = answer_key
+        try:
+            if answer.answer_data is None:
+                return incorrect
+            return (True, 1.0) if abs(float(answer.answer_data) - correct_answer) <= tolerance else incorrect
+        except (ValueError, TypeError):
+            return incorrect
+
+    return incorrect
+
+
+def load_answer_keys(apps, ContentType):
+    """Return a dict of (content type id, question id) -> (question type, answer key) for every live question."""
+    keys = {}
+
+    def content_type_id(model_name):
+        try:
+            return ContentType.objects.get(app_label='quizzes', model=model_name).id
+        except ContentType.DoesNotExist:
+            return None
+
+    ct_id = content_type_id('multiplechoicequestion')
+    if ct_id is not None:
+        for question_id, option_id, is_correct in apps.get_model('quizzes', 'MultipleChoiceQuestion').objects.values_list(
+            'id', 'options__id', 'options__is_correct'
+        ):
+            correct_options = keys.setdefault((ct_id, question_id), ('multiple_choice', set()))[1]
+            if option_id is not None and is_correct:
+                correct_options.add(option_id)
+
+    ct_id = content_type_id('orderquestion')
+    if ct_id is not None:
+        for question_id, option_id in apps.get_model('quizzes', 'OrderQuestion').objects.order_by(
+            'id', 'order_options__correct_order', 'order_options__id'
+        ).values_list('id', 'order_options__id'):
+            correct_order = keys.setdefault((ct_id, question_id), ('order', []))[1]
+            if option_id is not None:
+                correct_order.append(option_id)
+
+    ct_id = content_type_id('connectquestion')
+    if ct_id is not None:
+        for question_id, from_option_id, to_option_id in apps.get_model('quizzes', 'ConnectQuestion').objects.values_list(
+            'id', 'correct_connections__from_option_id', 'correct_connections__to_option_id'
+        ):
+            correct_pairs = keys.setdefault((ct_id, question_id), ('connect', set()))[1]
+            if from_option_id is not None:
+                correct_pairs.add(tuple(sorted([from_option_id, to_option_id])))
+
+    ct_id = content_type_id('numberquestion')
+    if ct_id is not None:
+        for question_id, correct_answer, tolerance in apps.get_model('quizzes', 'NumberQuestion').objects.values_list(
+            'id', 'correct_answer', 'tolerance'
+        ):
+            keys[(ct_id, question_id)] = ('number', (correct_answer, tolerance))
+
+    return keys
+
+
+def backfill_answer_grades(apps, schema_editor):
+    """Grade the answers given before ``is_correct`` and ``score`` existed, then rebuild the mastery table.
+
+    Answers to a published quiz version were graded when they were saved,
+    so only unversioned answers are graded, against the live answer keys.
+    """
+    StudentQuestionAnswer = apps.get_model('students', 'StudentQuestionAnswer')
+    StudentTopicMastery = apps.get_model('students', 'StudentTopicMastery')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+
+    keys = load_answer_keys(apps, ContentType)
+    changed = []
+    for answer in StudentQuestionAnswer.objects.filter(quiz_version__isnull=True).order_by('id').iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        key = keys.get((answer.question_content_type_id, answer.question_id))
+        grade = grade_answer(*key, answer) if key else (False, 0.0)
+        if grade != (answer.is_correct, answer.score):
+            answer.is_correct, answer.score = grade
+            changed.append(answer)
+        if len(changed) >= BATCH_SIZE:
+            StudentQuestionAnswer.objects.bulk_update(changed, ['is_correct', 'score'])
+            changed = []
+    StudentQuestionAnswer.objects.bulk_update(changed, ['is_correct', 'score'])
+
+    # Rebuild every mastery row from the graded answers, keeping knowledge tracing estimates
+    p_known = {
+        (student_id, topic_id): estimate
+        for student_id, topic_id, estimate in StudentTopicMastery.objects.filter(
+            p_known__isnull=False
+        ).values_list('student_id', 'topic_id', 'p_known')
+    }
+    rows = [
+        StudentTopicMastery(p_known=p_known.get((row['student_id'], row['topic_id'])), **row)
+        for row in StudentQuestionAnswer.objects.filter(topic__isnull=False).values(
+            'organization_id', 'student_id', 'topic_id'
+        ).annotate(
+            answered=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            last_answer_at=Max('updated_at')
+        ).order_by()
+    ]
+    StudentTopicMastery.objects.all().delete()
+    StudentTopicMastery.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("quizzes", "0014_quiz_shuffle"),
+        ("students", "0012_studentquestionanswer_quiz_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_answer_grades, migrations.RunPython.noop),
+    ]
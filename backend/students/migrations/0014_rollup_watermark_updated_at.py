@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0005_remove_material_lesson_remove_material_module_and_more'),
+        ('organizations', '0001_initial'),
+        ('quizzes', '0014_quiz_shuffle'),
+        ('students', '0013_backfill_answer_grades'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='progressrollupwatermark',
+            name='last_answer_id',
+        ),
+        migrations.AddField(
+            model_name='progressrollupwatermark',
+            name='rolled_up_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='studentquestionanswer',
+            index=models.Index(fields=['organization', 'updated_at'], name='answer_org_updated_idx'),
+        ),
+    ]
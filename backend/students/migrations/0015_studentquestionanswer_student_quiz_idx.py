@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0005_remove_material_lesson_remove_material_module_and_more'),
+        ('organizations', '0001_initial'),
+        ('quizzes', '0014_quiz_shuffle'),
+        ('students', '0014_rollup_watermark_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentquestionanswer',
+            index=models.Index(fields=['student', 'quiz', 'updated_at'], name='answer_student_quiz_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.core.exceptions import ValidationError
@@ -59,6 +60,20 @@ class Student(OrganizationModel):
         return f"{self.first_name} {self.last_name}" + (f" ({groups})" if groups else "")
 
 
+class StudentQuestionAnswerQuerySet(models.QuerySet):
+    """QuerySet for StudentQuestionAnswer with helpers for the generic question relation."""
+    
+    def for_question_ids(self, question_model, question_ids):
+        """Filter to answers to questions of one type, given their ids.
+        
+        ``question_ids`` may be a list or a queryset; pass a queryset (e.g.
+        ``values('id')``) to keep the SQL a single subquery however many
+        questions it matches.
+        """
+        question_ct = ContentType.objects.get_for_model(question_model)
+        return self.filter(question_content_type=question_ct, question_id__in=question_ids)
+
+
 class StudentQuestionAnswer(OrganizationModel):
     """StudentQuestionAnswer model tracking student answers to quiz questions.
     
@@ -89,6 +104,16 @@ class StudentQuestionAnswer(OrganizationModel):
         on_delete=models.CASCADE,
         related_name='student_answers'
     )
+    # Published version of the quiz the answer was given to and is graded against;
+    # None for answers to a quiz that wasn't published
+    quiz_version = models.ForeignKey(
+        'quizzes.QuizVersion',
+        on_delete=models.SET_NULL,
+        related_name='student_answers',
+        null=True,
+        blank=True,
+        editable=False
+    )
     # For MultipleChoiceQuestion: reference to the selected Option
     answer = models.ForeignKey(
         'quizzes.Option',
@@ -101,10 +126,61 @@ class StudentQuestionAnswer(OrganizationModel):
     # OrderQuestion: [option_id1, option_id2, ...] in the order provided by student
     # ConnectQuestion: [[from_option_id, to_option_id], ...] list of connection pairs
     answer_data = models.JSONField(blank=True, null=True)
+    # Grade computed on save and kept in sync when the question's answer key changes
+    is_correct = models.BooleanField(default=False, editable=False)
+    score = models.FloatField(default=0.0, editable=False)
+    # Position of the question in the course hierarchy, copied from the question on save
+    # and kept in sync when the question or its topic, lesson or module moves
+    topic = models.ForeignKey(
+        'courses.Topic',
+        on_delete=models.SET_NULL,
+        related_name='student_answers',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
+    lesson = models.ForeignKey(
+        'courses.Lesson',
+        on_delete=models.SET_NULL,
+        related_name='student_answers',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
+    module = models.ForeignKey(
+        'courses.Module',
+        on_delete=models.SET_NULL,
+        related_name='student_answers',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
+    course = models.ForeignKey(
+        'courses.Course',
+        on_delete=models.SET_NULL,
+        related_name='student_answers',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
+    
+    objects = StudentQuestionAnswerQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
         unique_together = ['organization', 'student', 'question_content_type', 'question_id', 'quiz']
+        indexes = [
+            models.Index(fields=['topic', 'student'], name='answer_topic_student_idx'),
+            models.Index(fields=['lesson', 'student'], name='answer_lesson_student_idx'),
+            models.Index(fields=['student', 'module'], name='answer_student_module_idx'),
+            models.Index(fields=['course', 'student'], name='answer_course_student_idx'),
+            models.Index(fields=['organization', 'updated_at'], name='answer_org_updated_idx'),
+            models.Index(fields=['student', 'quiz', 'updated_at'], name='answer_student_quiz_idx'),
+        ]
     
     def clean(self):
         """Validate that answer or answer_data is provided based on question type."""
@@ -133,8 +209,23 @@ class StudentQuestionAnswer(OrganizationModel):
                 raise ValidationError({'answer_data': f'answer_data is required for {question_type} questions.'})
     
     def save(self, *args, **kwargs):
-        """Validate before saving."""
+        """Validate, grade and record the question's placement before saving.
+        
+        A new answer to a published quiz records the published version.
+        """
+        from .grading import AnswerKeys, Placement
         self.clean()
+        if self._state.adding and self.quiz_version_id is None:
+            self.quiz_version_id = self.quiz.published_version_id
+        keys = AnswerKeys([self])
+        self.is_correct, self.score = keys.evaluate(self)
+        placement = keys.placement(self) or Placement(None, None, None, None)
+        self.topic_id, self.lesson_id, self.module_id, self.course_id = placement
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'is_correct', 'score', 'topic', 'lesson', 'module', 'course'
+            }
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -148,90 +239,198 @@ class StudentQuestionAnswer(OrganizationModel):
     
     @property
     def correct(self):
-        """Check if the answer is correct based on question type."""
-        # Safely access the question via GenericForeignKey
-        # Handle cases where ContentType is invalid or question doesn't exist
-        try:
-            # Check if we have valid content_type and question_id
-            if not self.question_content_type_id or not self.question_id:
-                return False
-            
-            # Try to get the ContentType and verify it's valid
-            ct = self.question_content_type
-            if not ct or ct.model_class() is None:
-                return False
-            
-            # Now try to access the question (this may fail if question was deleted)
-            question = self.question
-            if not question:
-                return False
-        except (AttributeError, Exception):
-            # If ContentType is invalid or question doesn't exist, return False
-            return False
+        """Check if the answer is correct based on question type.
         
-        question_type = question.question_type
-        
-        if question_type == 'multiple_choice':
-            return self.answer.is_correct if self.answer else False
-        
-        elif question_type == 'order':
-            if not self.answer_data or not isinstance(self.answer_data, list):
-                return False
-            
-            # Get correct order from OrderOptions
-            from quizzes.models import OrderOption
-            order_options = OrderOption.objects.filter(
-                question=question,
-                organization=self.organization
-            ).order_by('correct_order')
-            
-            correct_order = [opt.id for opt in order_options]
-            
-            # Compare student's order with correct order
-            return self.answer_data == correct_order
-        
-        elif question_type == 'connect':
-            if not self.answer_data or not isinstance(self.answer_data, list):
-                return False
-            
-            # Get correct connections
-            from quizzes.models import ConnectOptionConnection
-            correct_connections = ConnectOptionConnection.objects.filter(
-                question=question,
-                organization=self.organization
-            )
-            
-            # Build set of correct connection pairs (bidirectional)
-            correct_pairs = set()
-            for conn in correct_connections:
-                pair = tuple(sorted([conn.from_option_id, conn.to_option_id]))
-                correct_pairs.add(pair)
-            
-            # Build set of student's connection pairs
-            student_pairs = set()
-            for pair in self.answer_data:
-                if isinstance(pair, list) and len(pair) == 2:
-                    student_pairs.add(tuple(sorted(pair)))
-            
-            # Check if student's connections match exactly
-            return student_pairs == correct_pairs
-        
-        elif question_type == 'number':
-            # For number questions, we need to check if answer_data matches correct_answer within tolerance
-            if not hasattr(question, 'correct_answer'):
-                return False
-            
-            try:
-                student_answer = float(self.answer_data) if self.answer_data is not None else None
-                if student_answer is None:
-                    return False
-                
-                correct_answer = question.correct_answer
-                tolerance = getattr(question, 'tolerance', 0.0)
-                
-                return abs(student_answer - correct_answer) <= tolerance
-            except (ValueError, TypeError):
-                return False
-        
-        return False
+        This grades the answer against the current answer key. The persisted
+        ``is_correct`` field holds the same value without any queries; use
+        ``students.grading.grade_answers`` to grade unsaved batches.
+        """
+        from .grading import AnswerKeys
+        return AnswerKeys([self]).grade(self)
 
+
+class QuizAttempt(OrganizationModel):
+    """A student's attempt at a quiz.
+    
+    While the attempt is in progress its answers are autosaved into the
+    ``draft_answers`` JSON object, keyed ``"<question_type>:<question_id>"``,
+    so an autosave updates one small row instead of writing answer rows.
+    On submit the drafts are validated, graded and materialized into
+    StudentQuestionAnswer rows once, and the attempt keeps the final score
+    for reporting.
+    """
+    
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_SUBMITTED = 'submitted'
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'In progress'),
+        (STATUS_SUBMITTED, 'Submitted'),
+    ]
+    
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='quiz_attempts'
+    )
+    quiz = models.ForeignKey(
+        'quizzes.Quiz',
+        on_delete=models.CASCADE,
+        related_name='attempts'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_IN_PROGRESS
+    )
+    draft_answers = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Sum of the partial credit of all answers, set on submit"
+    )
+    max_score = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of questions in the quiz when the attempt was submitted"
+    )
+    correct_count = models.PositiveIntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'quiz'],
+                condition=Q(status='in_progress'),
+                name='unique_in_progress_attempt'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['quiz', 'status'], name='attempt_quiz_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student} - {self.quiz.name} ({self.get_status_display()})"
+
+
+class StudentTopicMastery(OrganizationModel):
+    """Materialized per-student, per-topic answer totals.
+    
+    Maintained incrementally by the signal handlers in ``students.signals``
+    whenever a StudentQuestionAnswer is created, updated or deleted, so
+    progress views can read mastery without replaying raw answers.
+    Use the ``rebuild_topic_mastery`` management command to backfill.
+    """
+    
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='topic_masteries'
+    )
+    topic = models.ForeignKey(
+        'courses.Topic',
+        on_delete=models.CASCADE,
+        related_name='student_masteries'
+    )
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    last_answer_at = models.DateTimeField(null=True, blank=True)
+    p_known = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Knowledge tracing estimate of the probability that the student knows the topic"
+    )
+    
+    class Meta:
+        ordering = ['student', 'topic']
+        unique_together = ['student', 'topic']
+        verbose_name_plural = 'Student topic masteries'
+    
+    def __str__(self):
+        return f"{self.student} - {self.topic.name}: {self.correct}/{self.answered}"
+    
+    @property
+    def mastered(self):
+        """A topic counts as mastered once any question on it is answered correctly."""
+        return self.correct > 0
+
+
+class TopicKnowledgeParams(OrganizationModel):
+    """Bayesian Knowledge Tracing parameters of a topic.
+    
+    Fitted from historical answers by the ``fit_knowledge_tracing``
+    management command; topics without a row use the defaults in
+    ``students.knowledge.DEFAULT_PARAMS``.
+    """
+    
+    topic = models.OneToOneField(
+        'courses.Topic',
+        on_delete=models.CASCADE,
+        related_name='knowledge_params'
+    )
+    p_init = models.FloatField(help_text="Probability that a student knows the topic before answering")
+    p_transit = models.FloatField(help_text="Probability of learning the topic after answering a question")
+    p_slip = models.FloatField(help_text="Probability of a wrong answer while knowing the topic")
+    p_guess = models.FloatField(help_text="Probability of a correct answer without knowing the topic")
+    answers_used = models.PositiveIntegerField(default=0)
+    fitted_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'Topic knowledge params'
+    
+    def __str__(self):
+        return f"{self.topic.name}: init={self.p_init:.2f} transit={self.p_transit:.2f}"
+
+
+class ProgressSnapshot(OrganizationModel):
+    """Daily per-group, per-topic rollup of student answers.
+    
+    Each row holds the answers saved on one day by the students of a group in
+    one topic, plus the number of students that mastered the topic that day.
+    Rows are written by the ``rollup_progress`` management command, which
+    adds the answers saved since its watermark; a resubmitted answer counts
+    on the day it was saved again, so earlier rows never change.
+    """
+    
+    group = models.ForeignKey(
+        StudentGroup,
+        on_delete=models.CASCADE,
+        related_name='progress_snapshots'
+    )
+    topic = models.ForeignKey(
+        'courses.Topic',
+        on_delete=models.CASCADE,
+        related_name='progress_snapshots'
+    )
+    date = models.DateField()
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    newly_mastered = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of students whose first correct answer in the topic was given on this day"
+    )
+    
+    class Meta:
+        ordering = ['group', 'date', 'topic']
+        unique_together = ['group', 'topic', 'date']
+        indexes = [
+            models.Index(fields=['group', 'date'], name='snapshot_group_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.group} - {self.topic.name} ({self.date}): {self.correct}/{self.answered}"
+
+
+class ProgressRollupWatermark(OrganizationModel):
+    """Time up to which answers saved in an organization are included in its progress snapshots."""
+    
+    rolled_up_until = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization'], name='unique_rollup_watermark_per_organization'),
+        ]
+    
+    def __str__(self):
+        return f"{self.organization}: {self.rolled_up_until}"
@@ -0,0 +1,111 @@
+"""Set-based progress computation for student groups.
+
+The functions here express progress as aggregate queries over the
+StudentTopicMastery table, so the number of queries does not depend on the
+number of students in a group or the number of answers they gave.
+"""
+from django.db.models import Count, Q
+
+from courses.models import Topic
+from quizzes.models import QuestionRef
+from .models import StudentTopicMastery
+
+
+def group_topics(group):
+    """Return a queryset of all topics in the student group's modules."""
+    return Topic.objects.filter(
+        lesson__module__in=group.modules.all(),
+        organization_id=group.organization_id
+    )
+
+
+def students_with_mastered_topics(group, topics=None):
+    """Return the group's students annotated with ``mastered_topics``.
+
+    ``mastered_topics`` counts the topics (restricted to ``topics``, by default
+    all topics of the group) in which the student answered at least one
+    question correctly. The whole group is computed in a single grouped query.
+    """
+    if topics is None:
+        topics = group_topics(group)
+    return group.students.select_related('user').prefetch_related(
+        'student_groups__course'
+    ).annotate(
+        mastered_topics=Count(
+            'topic_masteries',
+            filter=Q(
+                topic_masteries__topic__in=topics.values('id'),
+                topic_masteries__correct__gt=0
+            ),
+            distinct=True
+        )
+    )
+
+
+def progress_dict(mastered_topics, total_topics):
+    """Build the progress payload used by the student and group serializers."""
+    return {
+        'mastered_topics': mastered_topics,
+        'total_topics': total_topics,
+        'percentage': (mastered_topics / total_topics * 100) if total_topics > 0 else 0
+    }
+
+
+def topic_question_totals(topic_ids):
+    """Return a dict of topic id -> number of questions of all types on the topic, with one grouped query."""
+    return dict(
+        QuestionRef.objects.filter(topic_id__in=topic_ids).values('topic_id').annotate(
+            total=Count('id')
+        ).order_by().values_list('topic_id', 'total')
+    )
+
+
+def progress_matrix(group):
+    """Return answered and correct counts for every student and topic of a group.
+
+    The result is a dense students x topics matrix: ``students`` and ``topics``
+    are the row and column labels, and ``answered[i][j]`` / ``correct[i][j]``
+    are the counts of student ``i`` in topic ``j``. ``p_known[i][j]`` is the
+    knowledge tracing estimate, or None before the first answer. ``topics``
+    also carries the number of questions per topic. Runs a fixed number of
+    queries regardless of the size of the group.
+    """
+    students = list(group.students.order_by('last_name', 'first_name', 'id').values(
+        'id', 'first_name', 'last_name'
+    ))
+    topics = list(group_topics(group).order_by(
+        'lesson__module__name', 'lesson__name', 'name', 'id'
+    ).values('id', 'name', 'lesson__name', 'lesson__module__name'))
+
+    topic_ids = [topic['id'] for topic in topics]
+    question_totals = topic_question_totals(topic_ids)
+
+    row = {student['id']: index for index, student in enumerate(students)}
+    column = {topic_id: index for index, topic_id in enumerate(topic_ids)}
+    answered = [[0] * len(topics) for _ in students]
+    correct = [[0] * len(topics) for _ in students]
+    p_known = [[None] * len(topics) for _ in students]
+    masteries = StudentTopicMastery.objects.filter(
+        student_id__in=row.keys(), topic_id__in=topic_ids
+    ).order_by().values_list('student_id', 'topic_id', 'answered', 'correct', 'p_known')
+    for student_id, topic_id, answered_count, correct_count, estimate in masteries:
+        answered[row[student_id]][column[topic_id]] = answered_count
+        correct[row[student_id]][column[topic_id]] = correct_count
+        p_known[row[student_id]][column[topic_id]] = estimate
+
+    return {
+        'students': students,
+        'topics': [
+            {
+                'id': topic['id'],
+                'name': topic['name'],
+                'lesson_name': topic['lesson__name'],
+                'module_name': topic['lesson__module__name'],
+                'total_questions': question_totals.get(topic['id'], 0),
+            }
+            for topic in topics
+        ],
+        'answered': answered,
+        'correct': correct,
+        'p_known': p_known,
+    }
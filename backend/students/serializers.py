@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import StudentGroup, Student, StudentQuestionAnswer
+from quizzes.models import Quiz
+from .models import StudentGroup, Student, StudentQuestionAnswer, StudentTopicMastery, QuizAttempt
 
 User = get_user_model()
 
@@ -21,6 +22,8 @@ class StudentGroupSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # Relations read by method fields, loaded by organizations.query_plan.QueryPlanMixin
+        prefetch_related = ['students', 'modules']
     
     def get_students_count(self, obj):
         return obj.students.count()
@@ -42,142 +45,21 @@ class StudentGroupDetailSerializer(StudentGroupSerializer):
         fields = StudentGroupSerializer.Meta.fields + ['students']
     
     def get_students(self, obj):
-        from courses.models import Topic
-        from django.contrib.contenttypes.models import ContentType
-        from quizzes.models import MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion
-        
-        students = obj.students.all()
+        from .progress import group_topics, students_with_mastered_topics, progress_dict
         
         # Get all topics from the student group's modules
-        modules = obj.modules.all()
-        topics = Topic.objects.filter(
-            lesson__module__in=modules,
-            organization=obj.organization
-        ).distinct()
+        topics = group_topics(obj)
         total_topics = topics.count()
         
-        # Get all correct answers for students in this group
-        # Note: We can only select_related on regular ForeignKeys, not GenericForeignKeys
-        topic_ids = list(topics.values_list('id', flat=True))
-        
-        # Get ContentTypes for question types
-        mcq_ct = ContentType.objects.get_for_model(MultipleChoiceQuestion)
-        order_ct = ContentType.objects.get_for_model(OrderQuestion)
-        connect_ct = ContentType.objects.get_for_model(ConnectQuestion)
-        number_ct = ContentType.objects.get_for_model(NumberQuestion)
-        
-        # Get question IDs from all question types in these topics
-        mcq_ids = MultipleChoiceQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=obj.organization
-        ).values_list('id', flat=True)
-        order_ids = OrderQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=obj.organization
-        ).values_list('id', flat=True)
-        connect_ids = ConnectQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=obj.organization
-        ).values_list('id', flat=True)
-        number_ids = NumberQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=obj.organization
-        ).values_list('id', flat=True)
-        
-        # Build list of (content_type_id, question_id) tuples
-        question_refs = (
-            [(mcq_ct.id, qid) for qid in mcq_ids] +
-            [(order_ct.id, qid) for qid in order_ids] +
-            [(connect_ct.id, qid) for qid in connect_ids] +
-            [(number_ct.id, qid) for qid in number_ids]
-        )
-        
-        # Filter StudentQuestionAnswer by content_type and question_id pairs
-        from django.db.models import Q
-        q_objects = Q()
-        for ct_id, q_id in question_refs:
-            q_objects |= Q(question_content_type_id=ct_id, question_id=q_id)
-        
-        # Get all answers (we'll filter for correct ones in Python since we need to check the 'correct' property)
-        all_answers = StudentQuestionAnswer.objects.filter(
-            student__in=students
-        ).filter(q_objects).select_related('answer', 'question_content_type')
-        
-        # Build a map of (content_type_id, question_id) -> topic_id
-        question_to_topic = {}
-        if mcq_ids:
-            mcq_questions = MultipleChoiceQuestion.objects.filter(id__in=mcq_ids).values('id', 'topic_id')
-            for q in mcq_questions:
-                question_to_topic[(mcq_ct.id, q['id'])] = q['topic_id']
-        if order_ids:
-            order_questions = OrderQuestion.objects.filter(id__in=order_ids).values('id', 'topic_id')
-            for q in order_questions:
-                question_to_topic[(order_ct.id, q['id'])] = q['topic_id']
-        if connect_ids:
-            connect_questions = ConnectQuestion.objects.filter(id__in=connect_ids).values('id', 'topic_id')
-            for q in connect_questions:
-                question_to_topic[(connect_ct.id, q['id'])] = q['topic_id']
-        if number_ids:
-            number_questions = NumberQuestion.objects.filter(id__in=number_ids).values('id', 'topic_id')
-            for q in number_questions:
-                question_to_topic[(number_ct.id, q['id'])] = q['topic_id']
-        
-        # Create a map of student -> set of topics with correct answers
-        # Build set of valid ContentType IDs
-        valid_ct_ids = {mcq_ct.id, order_ct.id, connect_ct.id, number_ct.id}
-        
-        student_mastered_topics = {}
-        for answer in all_answers:
-            # Check if answer is correct
-            # Only process if we have valid content_type and question_id
-            if not answer.question_content_type_id or not answer.question_id:
-                continue
-            
-            # Only process if ContentType is one of our known question types
-            if answer.question_content_type_id not in valid_ct_ids:
-                continue
-            
-            is_correct = False
-            
-            # Check if this is a MultipleChoiceQuestion (we can check directly)
-            if answer.question_content_type_id == mcq_ct.id:
-                if answer.answer and answer.answer.is_correct:
-                    is_correct = True
-            else:
-                # For other question types (Order, Connect, Number), we need to access the question
-                # Try to access the question safely
-                try:
-                    # Accessing answer.question will trigger GenericForeignKey resolution
-                    # If ContentType is invalid, this will raise an exception
-                    if answer.question:
-                        is_correct = answer.correct
-                except (AttributeError, Exception):
-                    # If ContentType is invalid or question doesn't exist, skip
-                    continue
-            
-            if is_correct:
-                key = (answer.question_content_type_id, answer.question_id)
-                topic_id = question_to_topic.get(key)
-                if topic_id:
-                    student_id = answer.student.id
-                    if student_id not in student_mastered_topics:
-                        student_mastered_topics[student_id] = set()
-                    student_mastered_topics[student_id].add(topic_id)
+        # Mastered topics for all students are computed in one grouped query
+        students = students_with_mastered_topics(obj, topics)
         
         # Serialize students with progress
         student_data = []
         for student in students:
             serializer = StudentSerializer(student)
             student_dict = serializer.data
-            
-            # Calculate progress
-            mastered_topics = len(student_mastered_topics.get(student.id, set()))
-            student_dict['progress'] = {
-                'mastered_topics': mastered_topics,
-                'total_topics': total_topics,
-                'percentage': (mastered_topics / total_topics * 100) if total_topics > 0 else 0
-            }
-            
+            student_dict['progress'] = progress_dict(student.mastered_topics, total_topics)
             student_data.append(student_dict)
         
         return student_data
@@ -198,6 +80,7 @@ class StudentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+        prefetch_related = ['student_groups__course']
     
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
@@ -275,136 +158,41 @@ class StudentDetailSerializer(StudentSerializer):
     def get_student_groups_with_progress(self, obj):
         """Calculate progress for each student group the student belongs to."""
         from courses.models import Topic
-        from django.contrib.contenttypes.models import ContentType
-        from quizzes.models import MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion
+        from .progress import progress_dict
+        
+        groups = list(obj.student_groups.select_related('course').prefetch_related('modules'))
+        
+        # Map every module of the student's groups to its topics in one query
+        module_ids = {module.id for group in groups for module in group.modules.all()}
+        module_topics = {}
+        for topic_id, module_id in Topic.objects.filter(
+            lesson__module__in=module_ids,
+            organization=obj.organization
+        ).values_list('id', 'lesson__module_id'):
+            module_topics.setdefault(module_id, set()).add(topic_id)
+        
+        # Topics the student has mastered, read from the materialized mastery table
+        mastered_topic_ids = set(
+            StudentTopicMastery.objects.filter(
+                student=obj,
+                correct__gt=0
+            ).values_list('topic_id', flat=True)
+        )
         
         groups_data = []
-        for group in obj.student_groups.all():
-            # Get all topics from the student group's modules
-            modules = group.modules.all()
-            topics = Topic.objects.filter(
-                lesson__module__in=modules,
-                organization=obj.organization
-            ).distinct()
-            total_topics = topics.count()
-            
-            # Get correct answers for this student
-            # Note: We can't filter directly on GenericForeignKey, so we need to get question IDs first
-            topic_ids = list(topics.values_list('id', flat=True))
-            
-            # Get ContentTypes for question types
-            mcq_ct = ContentType.objects.get_for_model(MultipleChoiceQuestion)
-            order_ct = ContentType.objects.get_for_model(OrderQuestion)
-            connect_ct = ContentType.objects.get_for_model(ConnectQuestion)
-            number_ct = ContentType.objects.get_for_model(NumberQuestion)
-            
-            # Get question IDs from all question types in these topics
-            mcq_ids = MultipleChoiceQuestion.objects.filter(
-                topic__in=topic_ids,
-                organization=obj.organization
-            ).values_list('id', flat=True)
-            order_ids = OrderQuestion.objects.filter(
-                topic__in=topic_ids,
-                organization=obj.organization
-            ).values_list('id', flat=True)
-            connect_ids = ConnectQuestion.objects.filter(
-                topic__in=topic_ids,
-                organization=obj.organization
-            ).values_list('id', flat=True)
-            number_ids = NumberQuestion.objects.filter(
-                topic__in=topic_ids,
-                organization=obj.organization
-            ).values_list('id', flat=True)
-            
-            # Build list of (content_type_id, question_id) tuples
-            question_refs = (
-                [(mcq_ct.id, qid) for qid in mcq_ids] +
-                [(order_ct.id, qid) for qid in order_ids] +
-                [(connect_ct.id, qid) for qid in connect_ids] +
-                [(number_ct.id, qid) for qid in number_ids]
-            )
-            
-            # Filter StudentQuestionAnswer by content_type and question_id pairs
-            from django.db.models import Q
-            q_objects = Q()
-            for ct_id, q_id in question_refs:
-                q_objects |= Q(question_content_type_id=ct_id, question_id=q_id)
-            
-            # Get all answers (we'll filter for correct ones in Python since we need to check the 'correct' property)
-            all_answers = StudentQuestionAnswer.objects.filter(
-                student=obj
-            ).filter(q_objects).select_related('answer', 'question_content_type')
-            
-            # Build a map of (content_type_id, question_id) -> topic_id
-            question_to_topic = {}
-            if mcq_ids:
-                mcq_questions = MultipleChoiceQuestion.objects.filter(id__in=mcq_ids).values('id', 'topic_id')
-                for q in mcq_questions:
-                    question_to_topic[(mcq_ct.id, q['id'])] = q['topic_id']
-            if order_ids:
-                order_questions = OrderQuestion.objects.filter(id__in=order_ids).values('id', 'topic_id')
-                for q in order_questions:
-                    question_to_topic[(order_ct.id, q['id'])] = q['topic_id']
-            if connect_ids:
-                connect_questions = ConnectQuestion.objects.filter(id__in=connect_ids).values('id', 'topic_id')
-                for q in connect_questions:
-                    question_to_topic[(connect_ct.id, q['id'])] = q['topic_id']
-            if number_ids:
-                number_questions = NumberQuestion.objects.filter(id__in=number_ids).values('id', 'topic_id')
-                for q in number_questions:
-                    question_to_topic[(number_ct.id, q['id'])] = q['topic_id']
-            
-            # Count distinct topics with correct answers
-            # Build set of valid ContentType IDs
-            valid_ct_ids = {mcq_ct.id, order_ct.id, connect_ct.id, number_ct.id}
-            
-            mastered_topic_ids = set()
-            for answer in all_answers:
-                # Check if answer is correct
-                # Only process if we have valid content_type and question_id
-                if not answer.question_content_type_id or not answer.question_id:
-                    continue
-                
-                # Only process if ContentType is one of our known question types
-                if answer.question_content_type_id not in valid_ct_ids:
-                    continue
-                
-                is_correct = False
-                
-                # Check if this is a MultipleChoiceQuestion (we can check directly)
-                if answer.question_content_type_id == mcq_ct.id:
-                    if answer.answer and answer.answer.is_correct:
-                        is_correct = True
-                else:
-                    # For other question types (Order, Connect, Number), we need to access the question
-                    # Try to access the question safely
-                    try:
-                        # Accessing answer.question will trigger GenericForeignKey resolution
-                        # If ContentType is invalid, this will raise an exception
-                        if answer.question:
-                            is_correct = answer.correct
-                    except (AttributeError, Exception):
-                        # If ContentType is invalid or question doesn't exist, skip
-                        continue
-                
-                if is_correct:
-                    key = (answer.question_content_type_id, answer.question_id)
-                    topic_id = question_to_topic.get(key)
-                    if topic_id:
-                        mastered_topic_ids.add(topic_id)
-            
-            mastered_topics = len(mastered_topic_ids)
+        for group in groups:
+            topic_ids = set()
+            for module in group.modules.all():
+                topic_ids |= module_topics.get(module.id, set())
+            total_topics = len(topic_ids)
+            mastered_topics = len(topic_ids & mastered_topic_ids)
             
             groups_data.append({
                 'id': group.id,
                 'name': group.name,
                 'course_name': group.course.name,
                 'year': group.year,
-                'progress': {
-                    'mastered_topics': mastered_topics,
-                    'total_topics': total_topics,
-                    'percentage': (mastered_topics / total_topics * 100) if total_topics > 0 else 0
-                }
+                'progress': progress_dict(mastered_topics, total_topics)
             })
         
         return groups_data
@@ -423,28 +211,32 @@ class TopicProgressSerializer(serializers.Serializer):
     questions_correct = serializers.IntegerField()
     total_questions = serializers.IntegerField()
     percentage = serializers.FloatField()
+    p_known = serializers.FloatField(allow_null=True)
 
 
 class StudentQuestionAnswerSerializer(serializers.ModelSerializer):
     """Serializer for StudentQuestionAnswer model."""
     
     student_name = serializers.SerializerMethodField()
+    question = serializers.IntegerField(source='question_id', read_only=True)
     question_text = serializers.SerializerMethodField()
     question_type = serializers.SerializerMethodField()
     quiz_name = serializers.CharField(source='quiz.name', read_only=True)
     answer_text = serializers.SerializerMethodField()
     answer_data_display = serializers.SerializerMethodField()
-    correct = serializers.SerializerMethodField()
+    correct = serializers.BooleanField(source='is_correct', read_only=True)
     
     class Meta:
         model = StudentQuestionAnswer
         fields = [
             'id', 'student', 'question', 'quiz', 'answer', 'answer_data',
             'student_name', 'question_text', 'question_type', 'quiz_name',
-            'answer_text', 'answer_data_display', 'correct',
+            'answer_text', 'answer_data_display', 'correct', 'score',
             'organization', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        select_related = ['student', 'answer']
+        prefetch_related = ['question']
     
     def get_student_name(self, obj):
         return f"{obj.student.first_name} {obj.student.last_name}"
@@ -472,7 +264,201 @@ class StudentQuestionAnswerSerializer(serializers.ModelSerializer):
         if obj.answer_data:
             return obj.answer_data
         return None
+
+
+class SubmittedAnswerSerializer(serializers.Serializer):
+    """One answer in a quiz submission."""
     
-    def get_correct(self, obj):
-        """Return the correct property from the model."""
-        return obj.correct
+    question_type = serializers.ChoiceField(choices=['multiple_choice', 'order', 'connect', 'number'])
+    question_id = serializers.IntegerField(min_value=1)
+    answer = serializers.IntegerField(required=False, allow_null=True)
+    answer_data = serializers.JSONField(required=False, allow_null=True)
+
+
+class QuizSubmissionSerializer(serializers.Serializer):
+    """All answers of one student's attempt at a quiz.
+    
+    Expects the quiz in the serializer context. Every answer is validated
+    against the quiz's questions and options, preloaded once by
+    ``students.submission.AnswerSheet``.
+    """
+    
+    student = serializers.PrimaryKeyRelatedField(queryset=Student.objects.all())
+    answers = SubmittedAnswerSerializer(many=True, allow_empty=False)
+    
+    def validate_student(self, student):
+        if student.organization_id != self.context['quiz'].organization_id:
+            raise serializers.ValidationError('Student does not belong to the organization of this quiz.')
+        return student
+    
+    def validate_answers(self, answers):
+        from .submission import AnswerSheet
+        
+        sheet = AnswerSheet(self.context['quiz'])
+        seen = set()
+        errors = []
+        for item in answers:
+            key = (item['question_type'], item['question_id'])
+            if key in seen:
+                error = f'Question {key[0]} #{key[1]} is answered more than once.'
+            else:
+                error = sheet.validate(
+                    item['question_type'], item['question_id'],
+                    answer=item.get('answer'), answer_data=item.get('answer_data')
+                )
+            seen.add(key)
+            errors.append({'non_field_errors': [error]} if error else {})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        self.sheet = sheet
+        return answers
+    
+    def create(self, validated_data):
+        from .submission import upsert_answers
+        
+        student = validated_data['student']
+        answers = [
+            self.sheet.build(
+                student, item['question_type'], item['question_id'],
+                answer=item.get('answer'), answer_data=item.get('answer_data')
+            )
+            for item in validated_data['answers']
+        ]
+        return upsert_answers(answers, versions=self.sheet.versions)
+    
+    def to_representation(self, answers):
+        type_by_ct_id = {ct.id: question_type for question_type, ct in self.sheet.content_types.items()}
+        results = [
+            {
+                'question_type': type_by_ct_id[answer.question_content_type_id],
+                'question_id': answer.question_id,
+                'correct': answer.is_correct,
+                'score': answer.score,
+            }
+            for answer in answers
+        ]
+        return {
+            'student': self.validated_data['student'].id,
+            'quiz': self.context['quiz'].id,
+            'answered': len(results),
+            'correct': sum(1 for result in results if result['correct']),
+            'results': results,
+        }
+
+
+class StudentQuestionAnswerUpsertSerializer(SubmittedAnswerSerializer):
+    """A single answer stored by its unique key, replacing any earlier answer to the question."""
+    
+    student = serializers.PrimaryKeyRelatedField(queryset=Student.objects.all())
+    quiz = serializers.PrimaryKeyRelatedField(queryset=Quiz.objects.all())
+    
+    def validate(self, attrs):
+        from .submission import AnswerSheet
+        
+        if attrs['student'].organization_id != attrs['quiz'].organization_id:
+            raise serializers.ValidationError({
+                'student': 'Student does not belong to the organization of this quiz.'
+            })
+        self.sheet = AnswerSheet(attrs['quiz'])
+        error = self.sheet.validate(
+            attrs['question_type'], attrs['question_id'],
+            answer=attrs.get('answer'), answer_data=attrs.get('answer_data')
+        )
+        if error:
+            raise serializers.ValidationError(error)
+        return attrs
+    
+    def create(self, validated_data):
+        """Store the answer, or append it to the write-behind buffer when that is enabled."""
+        from .answer_buffer import buffer_enabled, buffer_answer
+        from .submission import upsert_answers
+        
+        answer = self.sheet.build(
+            validated_data['student'], validated_data['question_type'], validated_data['question_id'],
+            answer=validated_data.get('answer'), answer_data=validated_data.get('answer_data')
+        )
+        if buffer_enabled():
+            buffer_answer(validated_data['question_type'], answer)
+            return answer
+        return upsert_answers([answer], versions=self.sheet.versions)[0]
+    
+    def to_representation(self, answer):
+        # Buffered answers have no id or grade until the next flush stores them
+        buffered = answer.pk is None
+        return {
+            'id': answer.id,
+            'student': answer.student_id,
+            'quiz': answer.quiz_id,
+            'question_type': self.validated_data['question_type'],
+            'question_id': answer.question_id,
+            'answer': answer.answer_id,
+            'answer_data': answer.answer_data,
+            'correct': None if buffered else answer.is_correct,
+            'score': None if buffered else answer.score,
+            'buffered': buffered,
+        }
+
+
+class QuizAttemptSerializer(serializers.ModelSerializer):
+    """Serializer for QuizAttempt model.
+    
+    Creating an attempt returns the student's in-progress attempt at the
+    quiz if there already is one.
+    """
+    
+    quiz_name = serializers.CharField(source='quiz.name', read_only=True)
+    
+    class Meta:
+        model = QuizAttempt
+        fields = [
+            'id', 'organization', 'student', 'quiz', 'quiz_name', 'status', 'draft_answers',
+            'started_at', 'submitted_at', 'score', 'max_score', 'correct_count',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'organization', 'status', 'draft_answers', 'started_at', 'submitted_at',
+            'score', 'max_score', 'correct_count', 'created_at', 'updated_at'
+        ]
+        # Starting a second attempt resumes the one in progress instead of failing
+        validators = []
+    
+    def validate(self, attrs):
+        if attrs['student'].organization_id != attrs['quiz'].organization_id:
+            raise serializers.ValidationError({
+                'student': 'Student does not belong to the organization of this quiz.'
+            })
+        return attrs
+    
+    def create(self, validated_data):
+        from .attempts import start_attempt
+        
+        return start_attempt(validated_data['student'], validated_data['quiz'])
+
+
+class DraftAnswersSerializer(serializers.Serializer):
+    """Autosaved answers merged into the draft of a quiz attempt.
+    
+    Expects the quiz in the serializer context. Answers are validated
+    against its questions and options like a submission, so a draft can
+    always be submitted; answers without ``answer`` and ``answer_data``
+    clear the question and are not checked.
+    """
+    
+    answers = SubmittedAnswerSerializer(many=True, allow_empty=False)
+    
+    def validate_answers(self, answers):
+        from .submission import AnswerSheet
+        
+        sheet = AnswerSheet(self.context['quiz'])
+        errors = []
+        for item in answers:
+            error = None
+            if item.get('answer') is not None or item.get('answer_data') is not None:
+                error = sheet.validate(
+                    item['question_type'], item['question_id'],
+                    answer=item.get('answer'), answer_data=item.get('answer_data')
+                )
+            errors.append({'non_field_errors': [error]} if error else {})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return answers
@@ -0,0 +1,222 @@
+from django.db.models import Q, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from courses.models import Topic, Lesson, Module
+from quizzes.models import (
+    Quiz, MultipleChoiceQuestion, OrderQuestion, ConnectQuestion, NumberQuestion,
+    Option, OrderOption, ConnectOption, ConnectOptionConnection
+)
+from .models import Student, StudentQuestionAnswer
+from .adaptive import forget_practice_cursors
+from .grading import regrade_answers
+from .knowledge import trace_answer
+from .mastery import (
+    AnswerState, answer_state, stored_answer_state, apply_answer_change, apply_answer_changes,
+    apply_correctness_changes, refresh_topic_mastery
+)
+
+
+# Deleting one of these deletes its answers in bulk; ``remove_answers_with_parent`` handles
+# them in one batch and the answers' own delete signals skip them
+ANSWER_PARENTS = (Quiz, Option, Student)
+
+
+def deletion_origin_model(origin):
+    """Return the model of the instance or queryset a deletion started from."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+@receiver(pre_save, sender=StudentQuestionAnswer)
+def capture_previous_answer_state(sender, instance, raw=False, **kwargs):
+    """Remember what the answer contributed to mastery before this save."""
+    if raw:
+        return
+    instance._previous_mastery_state = stored_answer_state(instance.pk)
+
+
+@receiver(post_save, sender=StudentQuestionAnswer)
+def update_mastery_on_save(sender, instance, created, raw=False, **kwargs):
+    """Apply the answer's new contribution to the mastery table."""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_mastery_state', None)
+    current = answer_state(instance)
+    apply_answer_change(previous, current, answered_at=instance.updated_at)
+    # Saving an unchanged answer again is not a new observation
+    if created or previous != current:
+        trace_answer(current)
+
+
+@receiver(pre_delete, sender=StudentQuestionAnswer)
+def update_mastery_on_delete(sender, instance, origin=None, **kwargs):
+    """Remove the answer's contribution, read from its denormalized topic and stored grade."""
+    if issubclass(deletion_origin_model(origin), ANSWER_PARENTS):
+        return
+    apply_answer_change(answer_state(instance), None)
+
+
+@receiver(post_delete, sender=StudentQuestionAnswer)
+def forget_practice_cursor_on_delete(sender, instance, origin=None, **kwargs):
+    """A deleted answer makes its question unanswered again, which a practice cursor can't undo."""
+    if issubclass(deletion_origin_model(origin), ANSWER_PARENTS):
+        return
+    forget_practice_cursors([(instance.student_id, instance.quiz_id)])
+
+
+@receiver(pre_delete, sender=Quiz)
+@receiver(pre_delete, sender=Option)
+def remove_answers_with_parent(sender, instance, origin=None, **kwargs):
+    """Remove the contributions of the answers deleted with a quiz or option, in one batch.
+    
+    Runs for the quiz or option the deletion started from, before anything
+    is deleted. A quiz takes the answers given to it and, through its
+    options, those that chose one of its options. A student's answers need
+    nothing: the student's mastery rows and practice cursors go with them.
+    """
+    if not issubclass(deletion_origin_model(origin), sender):
+        return
+    if sender is Quiz:
+        answers = StudentQuestionAnswer.objects.filter(Q(quiz=instance) | Q(answer__question__quiz=instance))
+    else:
+        answers = StudentQuestionAnswer.objects.filter(answer=instance)
+    rows = list(answers.order_by().values_list(
+        'student_id', 'organization_id', 'topic_id', 'is_correct', 'quiz_id'
+    ))
+    apply_answer_changes([
+        (AnswerState(student_id, organization_id, topic_id, is_correct), None)
+        for student_id, organization_id, topic_id, is_correct, _ in rows
+        if topic_id is not None
+    ])
+    forget_practice_cursors({(student_id, quiz_id) for student_id, _, _, _, quiz_id in rows})
+
+
+def question_answers(question_model, question_id):
+    """Return a queryset of all answers to a question."""
+    return StudentQuestionAnswer.objects.for_question_ids(question_model, [question_id])
+
+
+def regrade_question(question_model, question_id):
+    """Regrade all answers to a question after its answer key changed."""
+    apply_correctness_changes(regrade_answers(question_answers(question_model, question_id)))
+
+
+@receiver(post_save, sender=MultipleChoiceQuestion)
+@receiver(post_save, sender=OrderQuestion)
+@receiver(post_save, sender=ConnectQuestion)
+@receiver(post_save, sender=NumberQuestion)
+def move_answers_with_question(sender, instance, created, raw=False, **kwargs):
+    """Keep the answers' denormalized placement in sync when a question moves topic."""
+    if raw or created:
+        return
+    moved = question_answers(sender, instance.id).exclude(topic_id=instance.topic_id)
+    affected = list(moved.values_list('student_id', 'topic_id').order_by().distinct())
+    if not affected:
+        return
+    lesson_id, module_id, course_id = Topic.objects.filter(pk=instance.topic_id).values_list(
+        'lesson_id', 'lesson__module_id', 'lesson__module__course_id'
+    ).get()
+    moved.update(topic_id=instance.topic_id, lesson_id=lesson_id, module_id=module_id, course_id=course_id)
+    refresh_topic_mastery(
+        {student_id for student_id, _ in affected},
+        {topic_id for _, topic_id in affected if topic_id} | {instance.topic_id}
+    )
+
+
+@receiver(post_save, sender=Topic)
+def move_answers_with_topic(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    moved = StudentQuestionAnswer.objects.filter(topic=instance).exclude(lesson_id=instance.lesson_id)
+    if moved.exists():
+        module_id, course_id = Lesson.objects.filter(pk=instance.lesson_id).values_list(
+            'module_id', 'module__course_id'
+        ).get()
+        moved.update(lesson_id=instance.lesson_id, module_id=module_id, course_id=course_id)
+
+
+@receiver(post_save, sender=Lesson)
+def move_answers_with_lesson(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    moved = StudentQuestionAnswer.objects.filter(lesson=instance).exclude(module_id=instance.module_id)
+    if moved.exists():
+        course_id = Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True).get()
+        moved.update(module_id=instance.module_id, course_id=course_id)
+
+
+@receiver(post_save, sender=Module)
+def move_answers_with_module(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    StudentQuestionAnswer.objects.filter(module=instance).exclude(
+        course_id=instance.course_id
+    ).update(course_id=instance.course_id)
+
+
+# Models holding answer keys, with the question model they belong to and the fields of the key
+ANSWER_KEY_MODELS = {
+    Option: (MultipleChoiceQuestion, ('is_correct',)),
+    OrderOption: (OrderQuestion, ('correct_order',)),
+    ConnectOptionConnection: (ConnectQuestion, ('from_option_id', 'to_option_id')),
+    NumberQuestion: (NumberQuestion, ('correct_answer', 'tolerance')),
+}
+
+# Deleting one of these leaves the question in place but changes its answer key
+KEY_DELETION_ORIGINS = (Option, OrderOption, ConnectOption, ConnectOptionConnection)
+
+
+def answer_key_values(sender, instance):
+    return tuple(getattr(instance, field) for field in ANSWER_KEY_MODELS[sender][1])
+
+
+def answer_key_question_id(sender, instance):
+    """Return the id of the question whose answer key ``instance`` holds (part of)."""
+    return instance.id if sender is ANSWER_KEY_MODELS[sender][0] else instance.question_id
+
+
+@receiver(pre_save, sender=Option)
+@receiver(pre_save, sender=OrderOption)
+@receiver(pre_save, sender=ConnectOptionConnection)
+@receiver(pre_save, sender=NumberQuestion)
+def capture_previous_answer_key(sender, instance, raw=False, **kwargs):
+    """Remember the stored answer key fields, to regrade only when they change."""
+    if raw:
+        return
+    instance._previous_answer_key = None if instance.pk is None else sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*ANSWER_KEY_MODELS[sender][1]).first()
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_save, sender=OrderOption)
+@receiver(post_save, sender=ConnectOptionConnection)
+@receiver(post_save, sender=NumberQuestion)
+def regrade_on_answer_key_save(sender, instance, created, raw=False, **kwargs):
+    if raw or getattr(instance, '_previous_answer_key', None) == answer_key_values(sender, instance):
+        return
+    if created and sender is NumberQuestion:
+        # A new question has no answers yet
+        return
+    regrade_question(ANSWER_KEY_MODELS[sender][0], answer_key_question_id(sender, instance))
+
+
+@receiver(post_delete, sender=Option)
+@receiver(post_delete, sender=OrderOption)
+@receiver(post_delete, sender=ConnectOptionConnection)
+def regrade_on_answer_key_delete(sender, instance, origin=None, **kwargs):
+    """Regrade the question's remaining answers after part of its answer key was deleted.
+    
+    When the deletion started above the answer key (the question, its
+    quiz, ...) the question goes too and there is nothing to regrade.
+    Answers that chose a deleted option are deleted with it, and
+    ``remove_answers_with_parent`` already took them out of mastery, so
+    they are skipped.
+    """
+    if not issubclass(deletion_origin_model(origin), KEY_DELETION_ORIGINS):
+        return
+    answers = question_answers(ANSWER_KEY_MODELS[sender][0], instance.question_id)
+    if sender is Option:
+        answers = answers.exclude(answer_id=instance.id)
+    apply_correctness_changes(regrade_answers(answers))
+
@@ -0,0 +1,142 @@
+"""Daily progress rollups into the ProgressSnapshot table.
+
+``rollup_progress`` aggregates the answers saved (created, or replaced by a
+resubmission) since an organization's watermark into per-day, per-group,
+per-topic deltas and adds them to the existing snapshots, so each run only
+reads the answers saved since the previous one.
+
+One timestamp, ``updated_at``, both selects the answers of a run and
+buckets them into days: a snapshot day counts the answers saved that day.
+A resubmission counts again on the day it is saved and never rewrites
+earlier days, so the history is append-only. The watermark trails the
+clock by ``PROGRESS_ROLLUP_LAG_SECONDS``, so an answer whose transaction
+commits after a rollup started is still picked up by the next one. Trend
+queries then read the compact snapshot rows instead of replaying all
+answers.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ProgressRollupWatermark, ProgressSnapshot, StudentQuestionAnswer
+
+
+FIELDS = ['answered', 'correct', 'newly_mastered']
+
+
+def _daily_totals(answers, **counts):
+    """Group answers by (group, topic, day saved) and annotate them with ``counts``."""
+    return answers.values(
+        'topic_id',
+        group_id=F('student__student_groups'),
+        date=TruncDate('updated_at'),
+    ).annotate(**counts).order_by()
+
+
+def rollup_progress(organization, now=None):
+    """Add the organization's answers saved since the watermark to the snapshots.
+
+    The first run for an organization rebuilds its snapshots from all
+    answers. Returns the number of answers rolled up.
+    """
+    until = (now or timezone.now()) - timedelta(seconds=settings.PROGRESS_ROLLUP_LAG_SECONDS)
+    with transaction.atomic():
+        watermark, _ = ProgressRollupWatermark.objects.select_for_update().get_or_create(
+            organization=organization
+        )
+        if watermark.rolled_up_until is not None and watermark.rolled_up_until >= until:
+            return 0
+        answers = StudentQuestionAnswer.objects.filter(organization=organization, updated_at__lte=until)
+        if watermark.rolled_up_until is None:
+            ProgressSnapshot.objects.filter(organization=organization).delete()
+        else:
+            answers = answers.filter(updated_at__gt=watermark.rolled_up_until)
+        count = answers.count()
+        if count:
+            _merge_snapshots(organization, _deltas(
+                answers.filter(topic__isnull=False, student__student_groups__isnull=False)
+            ))
+
+        watermark.rolled_up_until = until
+        watermark.save(update_fields=['rolled_up_until', 'updated_at'])
+    return count
+
+
+def _deltas(answers):
+    """Return a dict of (group_id, topic_id, date) -> Counter of the snapshot fields for ``answers``."""
+    totals = {}
+    for row in _daily_totals(answers, answered=Count('id'), correct=Count('id', filter=Q(is_correct=True))):
+        totals[(row['group_id'], row['topic_id'], row['date'])] = Counter(
+            answered=row['answered'], correct=row['correct']
+        )
+
+    # A student masters a topic with their first saved correct answer in it. A
+    # student whose only correct answer in a topic is saved again masters it again.
+    earlier_correct = StudentQuestionAnswer.objects.filter(
+        student_id=OuterRef('student_id'), topic_id=OuterRef('topic_id'), is_correct=True
+    ).filter(
+        Q(updated_at__lt=OuterRef('updated_at')) | Q(updated_at=OuterRef('updated_at'), id__lt=OuterRef('id'))
+    )
+    first_correct = answers.filter(is_correct=True).exclude(Exists(earlier_correct))
+    for row in _daily_totals(first_correct, newly_mastered=Count('id')):
+        key = (row['group_id'], row['topic_id'], row['date'])
+        totals.setdefault(key, Counter())['newly_mastered'] = row['newly_mastered']
+    return totals
+
+
+def _merge_snapshots(organization, totals):
+    """Add the aggregated deltas to their snapshot rows, creating missing ones."""
+    if not totals:
+        return
+    existing = ProgressSnapshot.objects.filter(
+        group_id__in={group_id for group_id, _, _ in totals},
+        topic_id__in={topic_id for _, topic_id, _ in totals},
+        date__in={date for _, _, date in totals}
+    )
+    to_update = []
+    for snapshot in existing:
+        delta = totals.pop((snapshot.group_id, snapshot.topic_id, snapshot.date), None)
+        if delta is not None:
+            for field in FIELDS:
+                setattr(snapshot, field, getattr(snapshot, field) + delta[field])
+            to_update.append(snapshot)
+    ProgressSnapshot.objects.bulk_update(to_update, FIELDS, batch_size=1000)
+    ProgressSnapshot.objects.bulk_create([
+        ProgressSnapshot(
+            organization=organization, group_id=group_id, topic_id=topic_id, date=date,
+            **{field: delta[field] for field in FIELDS}
+        )
+        for (group_id, topic_id, date), delta in totals.items()
+    ], batch_size=1000)
+
+
+def progress_history(group, topic=None, since=None, until=None):
+    """Return the group's daily answered/correct/newly mastered totals.
+
+    Totals are summed over all topics, or restricted to ``topic``, and read
+    from the snapshot table only. The result holds parallel lists, one entry
+    per day that has any answers.
+    """
+    snapshots = ProgressSnapshot.objects.filter(group=group)
+    if topic is not None:
+        snapshots = snapshots.filter(topic=topic)
+    if since is not None:
+        snapshots = snapshots.filter(date__gte=since)
+    if until is not None:
+        snapshots = snapshots.filter(date__lte=until)
+    days = snapshots.values('date').annotate(
+        answered=Sum('answered'), correct=Sum('correct'), newly_mastered=Sum('newly_mastered')
+    ).order_by('date')
+
+    history = {'dates': [], 'answered': [], 'correct': [], 'newly_mastered': []}
+    for day in days:
+        history['dates'].append(day['date'])
+        history['answered'].append(day['answered'])
+        history['correct'].append(day['correct'])
+        history['newly_mastered'].append(day['newly_mastered'])
+    return history
@@ -0,0 +1,182 @@
+"""Submission of all answers of a quiz attempt at once.
+
+Saving answers one by one resolves the generic question of every answer,
+grades it with its own queries and writes it with its own INSERT, and the
+signal handlers then update the mastery table per answer. ``AnswerSheet``
+instead preloads the quiz's questions and options once, so a whole attempt
+is validated in memory. ``upsert_answers`` grades the attempt in batch,
+writes it with a single upsert and updates the mastery table per
+(student, topic) rather than per answer. For a published quiz both read
+the questions, options and answer keys from the published QuizVersion
+alone.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from quizzes.models import QuestionRef, QuizVersion, Option, OrderOption, ConnectOption
+from .grading import AnswerKeys, Placement, question_content_types
+from .knowledge import trace_answers
+from .mastery import AnswerState, answer_state, apply_answer_changes
+from .models import StudentQuestionAnswer
+
+
+# Columns of the unique_together key of StudentQuestionAnswer
+ANSWER_UNIQUE_FIELDS = ['organization', 'student', 'question_content_type', 'question_id', 'quiz']
+
+# Columns overwritten when an answer to the same question is submitted again
+ANSWER_UPDATE_FIELDS = [
+    'answer', 'answer_data', 'quiz_version', 'is_correct', 'score', 'topic', 'lesson', 'module', 'course',
+    'updated_at'
+]
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class AnswerSheet:
+    """The questions of a quiz with the ids of their options, loaded with a fixed number of queries.
+
+    For a published quiz they come from the snapshot of the published
+    version, which is loaded with one query and also handed to the grading
+    of the answers built from this sheet.
+    """
+
+    def __init__(self, quiz):
+        self.quiz = quiz
+        self.content_types = question_content_types()
+        # (question_type, question_id) -> ids of the options that belong to the question
+        self.options = {}
+        self.version = None
+        if quiz.published_version_id:
+            self.version = QuizVersion.objects.get(pk=quiz.published_version_id)
+            self.questions = set()
+            for question in self.version.snapshot['questions']:
+                key = (question['question_type'], question['id'])
+                self.questions.add(key)
+                if 'options' in question:
+                    self.options[key] = {option['id'] for option in question['options']}
+            return
+
+        self.questions = set(QuestionRef.objects.filter(quiz=quiz).order_by().values_list(
+            'question_type', 'question_id'
+        ))
+        option_rows = [
+            ('multiple_choice', Option.objects.filter(question__quiz=quiz)),
+            ('order', OrderOption.objects.filter(question__quiz=quiz)),
+            ('connect', ConnectOption.objects.filter(question__quiz=quiz)),
+        ]
+        for question_type, options in option_rows:
+            for question_id, option_id in options.order_by().values_list('question_id', 'id'):
+                self.options.setdefault((question_type, question_id), set()).add(option_id)
+
+    def validate(self, question_type, question_id, answer=None, answer_data=None):
+        """Return an error message for a submitted answer, or None if it is valid."""
+        key = (question_type, question_id)
+        if key not in self.questions:
+            return f'Question {question_type} #{question_id} is not part of this quiz.'
+        options = self.options.get(key, set())
+
+        if question_type == 'multiple_choice':
+            if answer is None:
+                return 'Answer (Option) is required for multiple choice questions.'
+            if answer_data is not None:
+                return 'answer_data should not be set for multiple choice questions.'
+            if not _is_id(answer) or answer not in options:
+                return f'Option {answer} does not belong to this question.'
+            return None
+
+        if answer is not None:
+            return f'answer should not be set for {question_type} questions.'
+        if answer_data is None or answer_data == [] or answer_data == '':
+            return f'answer_data is required for {question_type} questions.'
+        if question_type == 'order':
+            if not isinstance(answer_data, list) or not all(
+                _is_id(option_id) for option_id in answer_data
+            ) or not set(answer_data) <= options:
+                return 'answer_data must be a list of the ids of this question\'s options.'
+        elif question_type == 'connect':
+            if not isinstance(answer_data, list) or not all(
+                isinstance(pair, list) and len(pair) == 2 and all(_is_id(option_id) for option_id in pair)
+                and set(pair) <= options
+                for pair in answer_data
+            ):
+                return 'answer_data must be a list of [from_option_id, to_option_id] pairs of this question\'s options.'
+        elif question_type == 'number':
+            if isinstance(answer_data, bool) or not isinstance(answer_data, (int, float)):
+                return 'answer_data must be a number for number questions.'
+        return None
+
+    def build(self, student, question_type, question_id, answer=None, answer_data=None):
+        """Return an unsaved StudentQuestionAnswer for a validated answer."""
+        return StudentQuestionAnswer(
+            organization_id=self.quiz.organization_id,
+            student=student,
+            quiz=self.quiz,
+            quiz_version=self.version,
+            question_content_type=self.content_types[question_type],
+            question_id=question_id,
+            answer_id=answer,
+            answer_data=answer_data,
+        )
+
+    @property
+    def versions(self):
+        """The QuizVersions already loaded by this sheet, for ``upsert_answers``."""
+        return [self.version] if self.version else []
+
+
+def upsert_answers(answers, versions=()):
+    """Grade and store a batch of unsaved answers, replacing earlier answers to the same questions.
+
+    An answer replaces the stored answer with the same unique key
+    (organization, student, question and quiz), so storing the same answer
+    twice leaves the table unchanged apart from ``updated_at``. All answers
+    are written with a single ``bulk_create`` upsert (``ON CONFLICT DO
+    UPDATE``) inside one transaction; ``save()`` and the answer signal
+    handlers are bypassed, so the mastery table and the knowledge tracing
+    estimates are updated here in batch from the previous contributions of
+    the replaced answers. ``versions`` are QuizVersions the caller already
+    loaded, passed on to AnswerKeys. Returns the answers with ``is_correct``,
+    ``score`` and placement filled in.
+    """
+    keys = AnswerKeys(answers, versions=versions)
+    for answer in answers:
+        answer.is_correct, answer.score = keys.evaluate(answer)
+        placement = keys.placement(answer) or Placement(None, None, None, None)
+        answer.topic_id, answer.lesson_id, answer.module_id, answer.course_id = placement
+
+    now = timezone.now()
+    with transaction.atomic():
+        stored = StudentQuestionAnswer.objects.select_for_update().filter(
+            student_id__in={answer.student_id for answer in answers},
+            quiz_id__in={answer.quiz_id for answer in answers},
+            question_id__in={answer.question_id for answer in answers},
+            topic__isnull=False
+        ).order_by().values_list(
+            'quiz_id', 'question_content_type_id', 'question_id',
+            'student_id', 'organization_id', 'topic_id', 'is_correct'
+        )
+        # (quiz, content type, question, student) -> AnswerState of the stored answer
+        previous = {}
+        for quiz_id, content_type_id, question_id, *state in stored:
+            state = AnswerState(*state)
+            previous[(quiz_id, content_type_id, question_id, state.student_id)] = state
+
+        StudentQuestionAnswer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=ANSWER_UNIQUE_FIELDS,
+            update_fields=ANSWER_UPDATE_FIELDS,
+        )
+
+        changes = [
+            (
+                previous.get((answer.quiz_id, answer.question_content_type_id, answer.question_id, answer.student_id)),
+                answer_state(answer)
+            )
+            for answer in answers
+        ]
+        apply_answer_changes(changes, answered_at=now)
+        trace_answers([current for prior, current in changes if prior != current])
+    return answers
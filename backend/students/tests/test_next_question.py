@@ -0,0 +1,125 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.models import Quiz, MultipleChoiceQuestion, Option
+from students.models import Student, StudentQuestionAnswer
+
+
+class NextQuestionTests(TestCase):
+    """Formative practice serves the unanswered question on the student's weakest topic."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        cls.topics = [
+            Topic.objects.create(organization=cls.organization, lesson=lesson, name=f'Topic {index}')
+            for index in range(2)
+        ]
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        cls.questions = []
+        for index in range(4):
+            question = MultipleChoiceQuestion.objects.create(
+                organization=cls.organization, quiz=cls.quiz, topic=cls.topics[index // 2],
+                text=f'Question {index}', order=index
+            )
+            right = Option.objects.create(
+                organization=cls.organization, question=question, text='Right', is_correct=True
+            )
+            wrong = Option.objects.create(organization=cls.organization, question=question, text='Wrong')
+            cls.questions.append((question, right, wrong))
+        cls.student = Student.objects.create(organization=cls.organization, first_name='A', last_name='B')
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def next_question(self):
+        response = self.client.get(
+            f'/api/quizzes/quizzes/{self.quiz.id}/next-question/', {'student': self.student.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def answer(self, index, correct):
+        question, right, wrong = self.questions[index]
+        StudentQuestionAnswer.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz,
+            question=question, answer=right if correct else wrong
+        )
+
+    def test_weakest_topic_first_and_answered_questions_excluded(self):
+        first = self.next_question()
+        self.assertEqual(first['question']['id'], self.questions[0][0].id)
+        self.assertEqual(first['remaining'], 4)
+        self.assertNotIn('is_correct', first['question']['options'][0])
+
+        self.answer(0, correct=True)
+        self.assertEqual(self.next_question()['question']['id'], self.questions[2][0].id)
+
+        self.answer(2, correct=False)
+        selection = self.next_question()
+        self.assertEqual(selection['question']['id'], self.questions[3][0].id)
+        self.assertLess(selection['estimate'], 0.3)
+
+        self.answer(3, correct=False)
+        with self.assertNumQueries(4):
+            selection = self.next_question()
+        self.assertEqual(selection['question']['id'], self.questions[1][0].id)
+        self.assertEqual(selection['remaining'], 1)
+
+        self.answer(1, correct=True)
+        self.assertIsNone(self.next_question()['question'])
+
+    def test_picks_read_only_the_answers_saved_since_the_previous_pick(self):
+        self.next_question()
+        self.answer(0, correct=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.next_question()['question']['id'], self.questions[2][0].id)
+        answer_queries = [query['sql'] for query in queries if 'FROM "students_studentquestionanswer"' in query['sql']]
+        self.assertEqual(len(answer_queries), 1)
+        self.assertIn('"updated_at" >', answer_queries[0])
+
+    def test_deleted_answers_make_their_questions_available_again(self):
+        self.answer(0, correct=False)
+        self.answer(1, correct=False)
+        self.assertEqual(self.next_question()['remaining'], 2)
+
+        StudentQuestionAnswer.objects.filter(question_id=self.questions[0][0].id).delete()
+        selection = self.next_question()
+        self.assertEqual(selection['remaining'], 3)
+        self.assertEqual(selection['question']['id'], self.questions[0][0].id)
+
+    def test_new_questions_are_picked_up(self):
+        for index in range(4):
+            self.answer(index, correct=True)
+        self.assertIsNone(self.next_question()['question'])
+
+        question = MultipleChoiceQuestion.objects.create(
+            organization=self.organization, quiz=self.quiz, topic=self.topics[1], text='Question 4', order=4
+        )
+        selection = self.next_question()
+        self.assertEqual(selection['question']['id'], question.id)
+        self.assertEqual(selection['remaining'], 1)
+
+    def test_student_is_required(self):
+        response = self.client.get(f'/api/quizzes/quizzes/{self.quiz.id}/next-question/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_student_is_rejected(self):
+        other = Organization.objects.create(name='Other organization', slug='other-org')
+        outsider = Student.objects.create(organization=other, first_name='C', last_name='D')
+        for student_id in (outsider.id, outsider.id + 1000):
+            response = self.client.get(
+                f'/api/quizzes/quizzes/{self.quiz.id}/next-question/', {'student': student_id}
+            )
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,270 @@
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.models import Quiz, MultipleChoiceQuestion, NumberQuestion, Option
+from students.knowledge import fit_knowledge_tracing
+from students.mastery import rebuild_topic_mastery
+from students.models import (
+    StudentGroup, Student, StudentQuestionAnswer, StudentTopicMastery, TopicKnowledgeParams, ProgressSnapshot
+)
+from students.snapshots import rollup_progress
+
+
+class StudentGroupProgressQueryTests(TestCase):
+    """The group detail endpoint must compute progress in a constant number of queries."""
+
+    STUDENTS = 200
+    TOPICS = 10
+    QUESTIONS_PER_TOPIC = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+
+        questions = []
+        for topic_index in range(cls.TOPICS):
+            topic = Topic.objects.create(
+                organization=cls.organization, lesson=lesson, name=f'Topic {topic_index}'
+            )
+            for question_index in range(cls.QUESTIONS_PER_TOPIC):
+                question = MultipleChoiceQuestion.objects.create(
+                    organization=cls.organization, quiz=quiz, topic=topic,
+                    text=f'Question {topic_index}.{question_index}'
+                )
+                correct = Option.objects.create(
+                    organization=cls.organization, question=question, text='Right', is_correct=True
+                )
+                wrong = Option.objects.create(
+                    organization=cls.organization, question=question, text='Wrong'
+                )
+                questions.append((question, correct, wrong))
+
+        cls.group = StudentGroup.objects.create(
+            organization=cls.organization, course=course, name='Group', year=2025
+        )
+        cls.group.modules.add(module)
+        students = Student.objects.bulk_create([
+            Student(organization=cls.organization, first_name='Student', last_name=str(index))
+            for index in range(cls.STUDENTS)
+        ])
+        cls.group.students.add(*students)
+
+        # Student n answers the questions of the first (n % TOPICS) topics correctly
+        question_ct = ContentType.objects.get_for_model(MultipleChoiceQuestion)
+        answers = []
+        for index, student in enumerate(students):
+            correct_topics = index % cls.TOPICS
+            for question_index, (question, correct, wrong) in enumerate(questions):
+                topic_index = question_index // cls.QUESTIONS_PER_TOPIC
+                is_correct = topic_index < correct_topics
+                answers.append(StudentQuestionAnswer(
+                    organization=cls.organization,
+                    student=student,
+                    quiz=quiz,
+                    question_content_type=question_ct,
+                    question_id=question.id,
+                    topic_id=question.topic_id,
+                    lesson=lesson,
+                    module=module,
+                    course=course,
+                    answer=correct if is_correct else wrong,
+                    is_correct=is_correct,
+                    score=1.0 if is_correct else 0.0,
+                ))
+        StudentQuestionAnswer.objects.bulk_create(answers, batch_size=1000)
+        rebuild_topic_mastery()
+
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_group_detail_query_count_is_constant(self):
+        self.assertEqual(StudentQuestionAnswer.objects.count(), 10000)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(f'/api/students/student-groups/{self.group.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        students = response.json()['students']
+        self.assertEqual(len(students), self.STUDENTS)
+        for student in students:
+            expected = int(student['last_name']) % self.TOPICS
+            self.assertEqual(student['progress']['mastered_topics'], expected)
+            self.assertEqual(student['progress']['total_topics'], self.TOPICS)
+
+    def test_progress_matrix(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/students/student-groups/{self.group.id}/progress-matrix/')
+
+        self.assertEqual(response.status_code, 200)
+        matrix = response.json()
+        self.assertEqual(len(matrix['students']), self.STUDENTS)
+        self.assertEqual([topic['name'] for topic in matrix['topics']], [f'Topic {i}' for i in range(self.TOPICS)])
+        self.assertEqual({topic['total_questions'] for topic in matrix['topics']}, {self.QUESTIONS_PER_TOPIC})
+        for student, answered, correct in zip(matrix['students'], matrix['answered'], matrix['correct']):
+            correct_topics = int(student['last_name']) % self.TOPICS
+            self.assertEqual(answered, [self.QUESTIONS_PER_TOPIC] * self.TOPICS)
+            self.assertEqual(correct, [
+                self.QUESTIONS_PER_TOPIC if index < correct_topics else 0 for index in range(self.TOPICS)
+            ])
+
+    def test_knowledge_tracing_estimates(self):
+        self.assertEqual(fit_knowledge_tracing(), self.TOPICS)
+        self.assertEqual(TopicKnowledgeParams.objects.count(), self.TOPICS)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/students/student-groups/{self.group.id}/progress-matrix/')
+
+        matrix = response.json()
+        for student, p_known in zip(matrix['students'], matrix['p_known']):
+            correct_topics = int(student['last_name']) % self.TOPICS
+            for index, estimate in enumerate(p_known):
+                if index < correct_topics:
+                    self.assertGreater(estimate, 0.9)
+                else:
+                    self.assertLess(estimate, 0.1)
+
+        # A new answer updates the estimate incrementally
+        student = self.group.students.get(last_name='0')
+        question = MultipleChoiceQuestion.objects.filter(topic__name='Topic 0').first()
+        answer = StudentQuestionAnswer.objects.get(student=student, question_id=question.id)
+        mastery = StudentTopicMastery.objects.get(student=student, topic_id=question.topic_id)
+        answer.delete()
+        StudentQuestionAnswer.objects.create(
+            organization=self.organization, student=student, quiz=question.quiz,
+            question=question, answer=question.options.get(is_correct=True)
+        )
+        mastery.refresh_from_db()
+        self.assertGreater(mastery.p_known, matrix['p_known'][0][0])
+
+
+class StudentGroupProgressTotalsTests(TestCase):
+    """Per-topic question totals count every question type, number questions included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        cls.topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        common = {'organization': cls.organization, 'quiz': quiz, 'topic': cls.topic}
+        question = MultipleChoiceQuestion.objects.create(text='Pick', **common)
+        right = Option.objects.create(organization=cls.organization, question=question, text='Right', is_correct=True)
+        number = NumberQuestion.objects.create(text='Number', correct_answer=1, **common)
+        NumberQuestion.objects.create(text='Unanswered', correct_answer=2, **common)
+
+        cls.group = StudentGroup.objects.create(organization=cls.organization, name='Group', course=course, year=2024)
+        cls.group.modules.add(module)
+        cls.student = Student.objects.create(organization=cls.organization, first_name='A', last_name='B')
+        cls.student.student_groups.add(cls.group)
+        StudentQuestionAnswer.objects.create(
+            organization=cls.organization, student=cls.student, quiz=quiz, question=question, answer=right
+        )
+        StudentQuestionAnswer.objects.create(
+            organization=cls.organization, student=cls.student, quiz=quiz, question=number, answer_data=1
+        )
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def test_group_progress_matches_progress_matrix(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(f'/api/students/students/{self.student.id}/group-progress/{self.group.id}/')
+        topic = response.json()[0]
+        self.assertEqual((topic['questions_answered'], topic['total_questions']), (2, 3))
+
+        matrix = client.get(f'/api/students/student-groups/{self.group.id}/progress-matrix/').json()
+        self.assertEqual(matrix['topics'][0]['total_questions'], topic['total_questions'])
+
+
+@override_settings(PROGRESS_ROLLUP_LAG_SECONDS=60)
+class ProgressRollupTests(TestCase):
+    """Snapshots follow every saved answer, including resubmissions and late commits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        cls.topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        cls.group = StudentGroup.objects.create(
+            organization=cls.organization, name='Group', course=course, year=2024
+        )
+        cls.student = Student.objects.create(organization=cls.organization, first_name='A', last_name='B')
+        cls.student.student_groups.add(cls.group)
+        cls.questions = []
+        for index in range(2):
+            question = MultipleChoiceQuestion.objects.create(
+                organization=cls.organization, quiz=cls.quiz, topic=cls.topic, text=f'Question {index}'
+            )
+            right = Option.objects.create(
+                organization=cls.organization, question=question, text='Right', is_correct=True
+            )
+            wrong = Option.objects.create(organization=cls.organization, question=question, text='Wrong')
+            cls.questions.append((question, right, wrong))
+
+    def answer(self, index, correct):
+        question, right, wrong = self.questions[index]
+        return StudentQuestionAnswer.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz,
+            question=question, answer=right if correct else wrong
+        )
+
+    def rollup(self, minutes=2):
+        return rollup_progress(self.organization, now=timezone.now() + timedelta(minutes=minutes))
+
+    def snapshot(self):
+        return ProgressSnapshot.objects.values_list('answered', 'correct', 'newly_mastered').get(
+            group=self.group, topic=self.topic
+        )
+
+    def history(self):
+        return {
+            date: counts for date, *counts in ProgressSnapshot.objects.filter(
+                group=self.group, topic=self.topic
+            ).values_list('date', 'answered', 'correct', 'newly_mastered')
+        }
+
+    def test_resubmissions_count_on_the_day_they_are_saved(self):
+        first = self.answer(0, correct=False)
+        self.answer(1, correct=True)
+        self.assertEqual(self.rollup(), 2)
+        today = timezone.localdate()
+        self.assertEqual(self.history(), {today: [2, 1, 1]})
+
+        # Resubmitted the next day, as the same row
+        first.answer = self.questions[0][1]
+        first.save()
+        tomorrow = timezone.now() + timedelta(days=1)
+        StudentQuestionAnswer.objects.filter(pk=first.pk).update(updated_at=tomorrow)
+        self.assertEqual(self.rollup(minutes=24 * 60 + 2), 1)
+        self.assertEqual(self.history(), {today: [2, 1, 1], timezone.localdate(tomorrow): [1, 1, 0]})
+        self.assertEqual(self.rollup(minutes=24 * 60 + 4), 0)
+        self.assertEqual(len(self.history()), 2)
+
+    def test_recent_answers_wait_for_the_lag(self):
+        self.answer(0, correct=True)
+        self.assertEqual(rollup_progress(self.organization), 0)
+        self.assertFalse(ProgressSnapshot.objects.exists())
+
+        # Saved before the previous rollup's cut-off time but committed after it
+        late = self.answer(1, correct=False)
+        StudentQuestionAnswer.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=30))
+        self.assertEqual(self.rollup(), 2)
+        self.assertEqual(self.snapshot(), (2, 1, 1))
@@ -0,0 +1,152 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization
+from quizzes.models import Quiz, MultipleChoiceQuestion, NumberQuestion, Option
+from students.models import Student, StudentQuestionAnswer, StudentTopicMastery
+
+
+class AnswerKeyChangeTests(TestCase):
+    """Changing or deleting answer keys keeps the mastery counts exact."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        cls.topic = Topic.objects.create(organization=cls.organization, lesson=lesson, name='Topic')
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+        cls.student = Student.objects.create(organization=cls.organization, first_name='A', last_name='B')
+
+    def setUp(self):
+        self.questions = []
+        for index in range(2):
+            question = MultipleChoiceQuestion.objects.create(
+                organization=self.organization, quiz=self.quiz, topic=self.topic, text=f'Question {index}'
+            )
+            right = Option.objects.create(
+                organization=self.organization, question=question, text='Right', is_correct=True
+            )
+            wrong = Option.objects.create(organization=self.organization, question=question, text='Wrong')
+            StudentQuestionAnswer.objects.create(
+                organization=self.organization, student=self.student, quiz=self.quiz,
+                question=question, answer=right
+            )
+            self.questions.append((question, right, wrong))
+
+    def mastery(self):
+        return StudentTopicMastery.objects.values_list('answered', 'correct').get(
+            student=self.student, topic=self.topic
+        )
+
+    def test_deleting_an_answered_question(self):
+        self.assertEqual(self.mastery(), (2, 2))
+        self.questions[0][0].delete()
+        self.assertEqual(self.mastery(), (1, 1))
+        self.questions[1][0].delete()
+        self.assertEqual(self.mastery(), (0, 0))
+
+    def test_deleting_the_chosen_option(self):
+        question, right, wrong = self.questions[0]
+        right.delete()
+        self.assertEqual(self.mastery(), (1, 1))
+        self.assertFalse(StudentQuestionAnswer.objects.filter(question_id=question.id, answer_id=right.id).exists())
+
+    def test_deleting_the_quiz_updates_mastery_in_one_batch(self):
+        other = Student.objects.create(organization=self.organization, first_name='C', last_name='D')
+        for question, right, wrong in self.questions:
+            StudentQuestionAnswer.objects.create(
+                organization=self.organization, student=other, quiz=self.quiz, question=question, answer=wrong
+            )
+        with CaptureQueriesContext(connection) as queries:
+            self.quiz.delete()
+        self.assertEqual(self.mastery(), (0, 0))
+        self.assertEqual(StudentTopicMastery.objects.values_list('answered', 'correct').get(student=other), (0, 0))
+        # One update per (student, topic), however many answers go
+        mastery_updates = [query for query in queries if query['sql'].startswith('UPDATE "students_studenttopicmastery"')]
+        self.assertEqual(len(mastery_updates), 2)
+
+    def test_deleting_a_student_deletes_their_mastery_without_updating_it(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.student.delete()
+        self.assertFalse(StudentTopicMastery.objects.exists())
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "students_studenttopicmastery"')])
+
+    def test_option_changes_regrade_only_when_the_key_changes(self):
+        question, right, wrong = self.questions[0]
+        right.text = 'Still right'
+        right.save()
+        self.assertEqual(self.mastery(), (2, 2))
+
+        wrong.is_correct = True
+        wrong.save()
+        right.is_correct = False
+        right.save()
+        self.assertEqual(self.mastery(), (2, 1))
+        self.assertFalse(StudentQuestionAnswer.objects.get(answer=right).is_correct)
+
+        # Deleting an option nobody chose regrades the remaining answers
+        right.is_correct = True
+        right.save()
+        wrong.delete()
+        self.assertEqual(self.mastery(), (2, 2))
+
+    def test_number_questions_regrade_only_when_the_key_changes(self):
+        question = NumberQuestion.objects.create(
+            organization=self.organization, quiz=self.quiz, topic=self.topic, text='Number', correct_answer=4
+        )
+        StudentQuestionAnswer.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz, question=question, answer_data=4
+        )
+        self.assertEqual(self.mastery(), (3, 3))
+
+        question.text = 'Two plus two'
+        question.order = 5
+        with CaptureQueriesContext(connection) as queries:
+            question.save()
+        # Regrading reads the answers' stored grades
+        self.assertFalse([query for query in queries if '"is_correct"' in query['sql']])
+
+        question.tolerance = 0.5
+        question.correct_answer = 5
+        question.save()
+        self.assertEqual(self.mastery(), (3, 2))
+
+    def test_backfill_migration_grades_existing_answers(self):
+        question = NumberQuestion.objects.create(
+            organization=self.organization, quiz=self.quiz, topic=self.topic, text='Number', correct_answer=4
+        )
+        StudentQuestionAnswer.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz, question=question, answer_data=4
+        )
+        # As left by the migrations that added the columns and the table
+        StudentQuestionAnswer.objects.update(is_correct=False, score=0.0)
+        StudentTopicMastery.objects.all().delete()
+
+        migration = import_module('students.migrations.0013_backfill_answer_grades')
+        migration.backfill_answer_grades(apps, None)
+        self.assertEqual(self.mastery(), (3, 3))
+        self.assertEqual(StudentQuestionAnswer.objects.filter(is_correct=True, score=1.0).count(), 3)
+
+    def test_question_filter_sql_does_not_grow_with_the_questions(self):
+        answers = StudentQuestionAnswer.objects.for_question_ids(
+            MultipleChoiceQuestion, MultipleChoiceQuestion.objects.filter(topic=self.topic).values('id')
+        )
+        sql = str(answers.query)
+        self.assertEqual(answers.count(), 2)
+
+        question = MultipleChoiceQuestion.objects.create(
+            organization=self.organization, quiz=self.quiz, topic=self.topic, text='Question 2'
+        )
+        option = Option.objects.create(organization=self.organization, question=question, text='Right')
+        StudentQuestionAnswer.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz, question=question, answer=option
+        )
+        self.assertEqual(str(answers.all().query), sql)
+        self.assertEqual(answers.count(), 3)
@@ -0,0 +1,336 @@
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from courses.models import Course, Module, Lesson, Topic
+from organizations.models import Organization, User
+from quizzes.models import (
+    Quiz, MultipleChoiceQuestion, Option, OrderQuestion, OrderOption, NumberQuestion
+)
+from students.answer_buffer import get_buffer
+from students.mastery import rebuild_topic_mastery
+from students.models import Student, StudentQuestionAnswer, StudentTopicMastery, QuizAttempt
+
+
+class QuizSubmissionTests(TestCase):
+    """A whole attempt is validated, graded and stored in one request."""
+
+    QUESTIONS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Test organization', slug='test-org')
+        course = Course.objects.create(organization=cls.organization, name='Course')
+        module = Module.objects.create(organization=cls.organization, course=course, name='Module')
+        lesson = Lesson.objects.create(organization=cls.organization, module=module, name='Lesson')
+        cls.topics = [
+            Topic.objects.create(organization=cls.organization, lesson=lesson, name=f'Topic {index}')
+            for index in range(2)
+        ]
+        cls.quiz = Quiz.objects.create(organization=cls.organization, name='Quiz', module=module)
+
+        cls.options = []
+        for index in range(cls.QUESTIONS):
+            question = MultipleChoiceQuestion.objects.create(
+                organization=cls.organization, quiz=cls.quiz, topic=cls.topics[index % 2],
+                text=f'Question {index}', order=index
+            )
+            right = Option.objects.create(
+                organization=cls.organization, question=question, text='Right', is_correct=True
+            )
+            wrong = Option.objects.create(organization=cls.organization, question=question, text='Wrong')
+            cls.options.append((question, right, wrong))
+        cls.order_question = OrderQuestion.objects.create(
+            organization=cls.organization, quiz=cls.quiz, topic=cls.topics[0], text='Order', order=100
+        )
+        cls.order_options = [
+            OrderOption.objects.create(
+                organization=cls.organization, question=cls.order_question, text=str(position),
+                correct_order=position
+            )
+            for position in range(1, 4)
+        ]
+        cls.number_question = NumberQuestion.objects.create(
+            organization=cls.organization, quiz=cls.quiz, topic=cls.topics[1], text='Number',
+            order=101, correct_answer=42, tolerance=0
+        )
+
+        cls.student = Student.objects.create(organization=cls.organization, first_name='A', last_name='B')
+        cls.user = User.objects.create(username='teacher', organization=cls.organization)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, answers):
+        return self.client.post(
+            f'/api/quizzes/quizzes/{self.quiz.id}/submit/',
+            {'student': self.student.id, 'answers': answers},
+            format='json'
+        )
+
+    def attempt(self, correct_count):
+        """Answers to all questions, with the first ``correct_count`` multiple choice answers right."""
+        answers = [
+            {
+                'question_type': 'multiple_choice',
+                'question_id': question.id,
+                'answer': (right if index < correct_count else wrong).id,
+            }
+            for index, (question, right, wrong) in enumerate(self.options)
+        ]
+        answers.append({
+            'question_type': 'order',
+            'question_id': self.order_question.id,
+            'answer_data': [option.id for option in self.order_options],
+        })
+        answers.append({'question_type': 'number', 'question_id': self.number_question.id, 'answer_data': 41})
+        return answers
+
+    def mastery(self):
+        return sorted(StudentTopicMastery.objects.values_list('topic_id', 'answered', 'correct'))
+
+    def test_submit_attempt(self):
+        with self.assertNumQueries(23):
+            response = self.submit(self.attempt(correct_count=5))
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['answered'], self.QUESTIONS + 2)
+        self.assertEqual(data['correct'], 6)
+        self.assertEqual(
+            [result['correct'] for result in data['results']],
+            [index < 5 for index in range(self.QUESTIONS)] + [True, False]
+        )
+        self.assertEqual(StudentQuestionAnswer.objects.filter(student=self.student).count(), self.QUESTIONS + 2)
+        self.assertEqual(self.mastery(), [(self.topics[0].id, 11, 4), (self.topics[1].id, 11, 2)])
+        self.assertTrue(all(StudentTopicMastery.objects.values_list('p_known', flat=True)))
+
+        # Mastery written in batch matches a rebuild from the raw answers
+        mastery = self.mastery()
+        rebuild_topic_mastery()
+        self.assertEqual(self.mastery(), mastery)
+
+    def test_resubmission_replaces_answers(self):
+        self.submit(self.attempt(correct_count=0))
+        response = self.submit(self.attempt(correct_count=self.QUESTIONS))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StudentQuestionAnswer.objects.filter(student=self.student).count(), self.QUESTIONS + 2)
+        self.assertEqual(StudentQuestionAnswer.objects.filter(is_correct=True).count(), self.QUESTIONS + 1)
+        self.assertEqual(self.mastery(), [(self.topics[0].id, 11, 11), (self.topics[1].id, 11, 10)])
+
+    def test_invalid_answers_are_rejected(self):
+        _, right, _ = self.options[1]
+        answers = self.attempt(correct_count=0)
+        answers[0]['answer'] = right.id
+        answers[-1]['answer_data'] = 'many'
+
+        response = self.submit(answers)
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['answers']
+        self.assertIn('does not belong', errors[0]['non_field_errors'][0])
+        self.assertIn('must be a number', errors[-1]['non_field_errors'][0])
+        self.assertFalse(StudentQuestionAnswer.objects.exists())
+
+    def upsert(self, option):
+        question = option.question
+        return self.client.put('/api/students/student-question-answers/upsert/', {
+            'student': self.student.id,
+            'quiz': self.quiz.id,
+            'question_type': 'multiple_choice',
+            'question_id': question.id,
+            'answer': option.id,
+        }, format='json')
+
+    def test_upsert_replaces_answer_and_retries_are_no_ops(self):
+        question, right, wrong = self.options[0]
+
+        response = self.upsert(wrong)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['correct'])
+        answer_id = response.json()['id']
+
+        for _ in range(2):
+            response = self.upsert(right)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['correct'])
+
+        answer = StudentQuestionAnswer.objects.get()
+        self.assertEqual(answer.id, answer_id)
+        self.assertEqual(answer.answer_id, right.id)
+        self.assertEqual(self.mastery(), [(question.topic_id, 1, 1)])
+
+    def test_buffered_upserts_are_coalesced_and_visible_to_the_student(self):
+        question, right, wrong = self.options[0]
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            ANSWER_BUFFER_ENABLED=True,
+            ANSWER_BUFFER_PATH=Path(directory) / 'buffer.sqlite3',
+            ANSWER_BUFFER_FLUSH_INTERVAL_MS=0,
+        ):
+            for option in (wrong, right):
+                response = self.upsert(option)
+                self.assertEqual(response.status_code, 202)
+                self.assertTrue(response.json()['buffered'])
+            self.assertFalse(StudentQuestionAnswer.objects.exists())
+            self.assertEqual(len(get_buffer().pending([self.student.id])), 2)
+
+            response = self.client.get(f'/api/students/student-question-answers/?student={self.student.id}')
+
+            self.assertEqual(response.json()['count'], 1)
+            self.assertTrue(response.json()['results'][0]['correct'])
+            self.assertEqual(get_buffer().pending(), [])
+            self.assertEqual(self.mastery(), [(question.topic_id, 1, 1)])
+
+    def test_buffered_answer_that_fails_moves_to_the_dead_letters(self):
+        question, right, wrong = self.options[0]
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            ANSWER_BUFFER_ENABLED=True,
+            ANSWER_BUFFER_PATH=Path(directory) / 'buffer.sqlite3',
+            ANSWER_BUFFER_FLUSH_INTERVAL_MS=0,
+        ):
+            self.assertEqual(self.upsert(right).status_code, 202)
+            # Buffered by a worker that knows a question type this one doesn't
+            get_buffer().append('essay', StudentQuestionAnswer(
+                organization=self.organization, student=self.student, quiz=self.quiz,
+                question_id=question.id, answer_data='Text'
+            ))
+
+            with self.assertLogs('students.answer_buffer', 'ERROR'):
+                self.assertEqual(get_buffer().flush(), 1)
+
+            self.assertEqual(get_buffer().pending(), [])
+            dead_letters = get_buffer().dead_letters()
+            self.assertEqual([row['question_type'] for row in dead_letters], ['essay'])
+            self.assertIn('essay', dead_letters[0]['error'])
+            self.assertEqual(StudentQuestionAnswer.objects.get().answer_id, right.id)
+
+    def test_buffer_is_synced_on_student_reads_only(self):
+        question, right, wrong = self.options[0]
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            ANSWER_BUFFER_ENABLED=True,
+            ANSWER_BUFFER_PATH=Path(directory) / 'buffer.sqlite3',
+            ANSWER_BUFFER_FLUSH_INTERVAL_MS=0,
+        ):
+            self.assertEqual(self.upsert(right).status_code, 202)
+            url = f'/api/students/students/{self.student.id}/'
+
+            response = self.client.patch(url, {'first_name': 'C'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(get_buffer().pending()), 1)
+
+            self.client.get(url)
+            self.assertEqual(get_buffer().pending(), [])
+            self.assertTrue(StudentQuestionAnswer.objects.get().is_correct)
+
+    def test_rows_of_a_student_being_flushed_are_left_to_that_flush(self):
+        question, right, wrong = self.options[0]
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            ANSWER_BUFFER_ENABLED=True,
+            ANSWER_BUFFER_PATH=Path(directory) / 'buffer.sqlite3',
+            ANSWER_BUFFER_FLUSH_INTERVAL_MS=0,
+        ):
+            self.assertEqual(self.upsert(wrong).status_code, 202)
+            answer_buffer = get_buffer()
+            # Another flush claimed the first answer and is still writing it
+            self.assertEqual(len(answer_buffer._claim('other-flush', None)), 1)
+
+            # Appends don't wait for that flush, and later answers wait their turn
+            self.assertEqual(self.upsert(right).status_code, 202)
+            self.assertEqual(answer_buffer.flush(), 0)
+            self.assertEqual(len(answer_buffer.pending()), 2)
+
+            answer_buffer._finish('other-flush', [])
+            self.assertEqual(answer_buffer.flush(), 1)
+            self.assertEqual(answer_buffer.pending(), [])
+            self.assertTrue(StudentQuestionAnswer.objects.get().is_correct)
+
+    def test_attempt_drafts_are_materialized_on_submit(self):
+        response = self.client.post('/api/students/quiz-attempts/', {
+            'student': self.student.id, 'quiz': self.quiz.id
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        attempt_id = response.json()['id']
+        url = f'/api/students/quiz-attempts/{attempt_id}/'
+
+        # Starting again resumes the attempt in progress
+        response = self.client.post('/api/students/quiz-attempts/', {
+            'student': self.student.id, 'quiz': self.quiz.id
+        }, format='json')
+        self.assertEqual(response.json()['id'], attempt_id)
+
+        answers = self.attempt(correct_count=3)
+        for answer in answers:
+            # The attempt, the quiz's questions and options to validate against, and the locked UPDATE
+            with self.assertNumQueries(9):
+                response = self.client.patch(f'{url}draft/', {'answers': [answer]}, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['draft_answers']), self.QUESTIONS + 2)
+        self.assertFalse(StudentQuestionAnswer.objects.exists())
+
+        response = self.client.post(f'{url}submit/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'submitted')
+        self.assertEqual(data['correct_count'], 4)
+        self.assertEqual(data['max_score'], self.QUESTIONS + 2)
+        self.assertEqual(data['draft_answers'], {})
+        self.assertEqual(StudentQuestionAnswer.objects.count(), self.QUESTIONS + 2)
+        self.assertEqual(self.mastery(), [(self.topics[0].id, 11, 3), (self.topics[1].id, 11, 1)])
+
+        response = self.client.patch(f'{url}draft/', {'answers': [answers[0]]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(QuizAttempt.objects.get().status, QuizAttempt.STATUS_SUBMITTED)
+
+    def test_attempt_with_invalid_draft_is_not_submitted(self):
+        attempt = QuizAttempt.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz,
+            draft_answers={f'number:{self.number_question.id}': {'answer': None, 'answer_data': 'many'}}
+        )
+
+        response = self.client.post(f'/api/students/quiz-attempts/{attempt.id}/submit/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'number:{self.number_question.id}', response.json()['draft_answers'])
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, QuizAttempt.STATUS_IN_PROGRESS)
+        self.assertFalse(StudentQuestionAnswer.objects.exists())
+
+    def test_malformed_answer_data_is_rejected(self):
+        order = {'question_type': 'order', 'question_id': self.order_question.id}
+        option_ids = [option.id for option in self.order_options]
+        malformed = [
+            {**order, 'answer_data': [[option_id] for option_id in option_ids]},
+            {**order, 'answer_data': [{'id': option_ids[0]}]},
+            {**order, 'answer_data': [True]},
+            {**order, 'answer_data': [option_ids[:2]], 'question_type': 'connect'},
+        ]
+        for answer in malformed:
+            with self.subTest(answer=answer):
+                self.assertEqual(self.submit([answer]).status_code, 400)
+                response = self.client.put('/api/students/student-question-answers/upsert/', {
+                    'student': self.student.id, 'quiz': self.quiz.id, **answer
+                }, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(StudentQuestionAnswer.objects.exists())
+
+        # A malformed draft is refused, so the attempt can still be submitted
+        attempt = QuizAttempt.objects.create(organization=self.organization, student=self.student, quiz=self.quiz)
+        url = f'/api/students/quiz-attempts/{attempt.id}/'
+        response = self.client.patch(f'{url}draft/', {'answers': malformed[:1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'{url}draft/', {'answers': [{**order, 'answer_data': option_ids}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post(f'{url}submit/').status_code, 200)
+
+    def test_malformed_stored_draft_is_not_submitted(self):
+        attempt = QuizAttempt.objects.create(
+            organization=self.organization, student=self.student, quiz=self.quiz,
+            draft_answers={f'order:{self.order_question.id}': {'answer': None, 'answer_data': [[1], [2]]}}
+        )
+        response = self.client.post(f'/api/students/quiz-attempts/{attempt.id}/submit/')
+        self.assertEqual(response.status_code, 400)
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StudentGroupViewSet, StudentViewSet, StudentQuestionAnswerViewSet
+from .views import StudentGroupViewSet, StudentViewSet, StudentQuestionAnswerViewSet, QuizAttemptViewSet
 
 router = DefaultRouter()
 router.register(r'student-groups', StudentGroupViewSet)
 router.register(r'students', StudentViewSet)
 router.register(r'student-question-answers', StudentQuestionAnswerViewSet)
+router.register(r'quiz-attempts', QuizAttemptViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,17 +1,19 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, mixins, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from organizations.query_plan import QueryPlanMixin, plan_queryset
 from django_filters import rest_framework as django_filters
-from .models import StudentGroup, Student, StudentQuestionAnswer
+from .answer_buffer import sync_student_answers
+from .models import StudentGroup, Student, StudentQuestionAnswer, StudentTopicMastery, QuizAttempt
 from .serializers import (
     StudentGroupSerializer, StudentGroupDetailSerializer,
     StudentSerializer, StudentDetailSerializer,
-    StudentQuestionAnswerSerializer
+    StudentQuestionAnswerSerializer, QuizAttemptSerializer, DraftAnswersSerializer
 )
 
 
-class StudentGroupViewSet(viewsets.ModelViewSet):
+class StudentGroupViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for StudentGroup model."""
     
     queryset = StudentGroup.objects.all()
@@ -31,12 +33,54 @@ class StudentGroupViewSet(viewsets.ModelViewSet):
     def students(self, request, pk=None):
         """Get all students for this group."""
         group = self.get_object()
-        students = Student.objects.filter(student_groups=group)
+        students = plan_queryset(Student.objects.filter(student_groups=group), StudentSerializer)
         serializer = StudentSerializer(students, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='progress-matrix')
+    def progress_matrix(self, request, pk=None):
+        """Get answered/correct counts for all students and topics of this group.
+        
+        Returns row labels (``students``), column labels (``topics``) and two
+        dense integer matrices ``answered`` and ``correct`` indexed
+        ``[student][topic]``.
+        """
+        from .progress import progress_matrix
+        
+        group = self.get_object()
+        return Response(progress_matrix(group))
+    
+    @action(detail=True, methods=['get'], url_path='progress-history')
+    def progress_history(self, request, pk=None):
+        """Get the group's daily progress totals from the snapshot rollups.
+        
+        Optional query parameters: ``topic`` (topic id), ``since`` and
+        ``until`` (YYYY-MM-DD). Returns parallel lists ``dates``,
+        ``answered``, ``correct`` and ``newly_mastered``.
+        """
+        from django.utils.dateparse import parse_date
+        from .snapshots import progress_history
+        
+        group = self.get_object()
+        history_filters = {}
+        for param in ['since', 'until']:
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    history_filters[param] = parse_date(value)
+                except ValueError:
+                    history_filters[param] = None
+                if history_filters[param] is None:
+                    return Response({'detail': f'{param} must be a date (YYYY-MM-DD)'}, status=400)
+        topic = request.query_params.get('topic')
+        if topic:
+            if not topic.isdigit():
+                return Response({'detail': 'topic must be a topic id'}, status=400)
+            history_filters['topic'] = int(topic)
+        return Response(progress_history(group, **history_filters))
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for Student model."""
     
     queryset = Student.objects.all()
@@ -52,11 +96,20 @@ class StudentViewSet(viewsets.ModelViewSet):
             return StudentDetailSerializer
         return StudentSerializer
     
+    # Actions reading a student's answers or progress, which include the answers still in the write-behind buffer
+    buffer_synced_actions = ('retrieve', 'question_answers', 'group_progress')
+    
+    def get_object(self):
+        student = super().get_object()
+        if self.action in self.buffer_synced_actions:
+            sync_student_answers(student.pk)
+        return student
+    
     @action(detail=True, methods=['get'])
     def question_answers(self, request, pk=None):
         """Get all question answers for this student."""
         student = self.get_object()
-        answers = StudentQuestionAnswer.objects.filter(student=student)
+        answers = plan_queryset(StudentQuestionAnswer.objects.filter(student=student), StudentQuestionAnswerSerializer)
         serializer = StudentQuestionAnswerSerializer(answers, many=True)
         return Response(serializer.data)
     
@@ -64,6 +117,7 @@ class StudentViewSet(viewsets.ModelViewSet):
     def group_progress(self, request, pk=None, group_id=None):
         """Get topic progress for a student in a specific student group."""
         from courses.models import Topic
+        from .progress import topic_question_totals
         from .serializers import TopicProgressSerializer
         
         student = self.get_object()
@@ -84,124 +138,29 @@ class StudentViewSet(viewsets.ModelViewSet):
             organization=student.organization
         ).distinct().select_related('lesson', 'lesson__module', 'lesson__module__course')
         
-        # Get all questions for these topics (all question types)
+        # Questions of all types per topic, counted through the QuestionRef registry
         topic_ids = list(topics.values_list('id', flat=True))
-        from quizzes.models import MultipleChoiceQuestion, OrderQuestion, ConnectQuestion
-        from django.db.models import Count
-        
-        # Count questions per topic across all question types
-        mcq_per_topic = MultipleChoiceQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=student.organization
-        ).values('topic').annotate(total_count=Count('id'))
-        
-        order_per_topic = OrderQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=student.organization
-        ).values('topic').annotate(total_count=Count('id'))
+        total_questions_map = topic_question_totals(topic_ids)
         
-        connect_per_topic = ConnectQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=student.organization
-        ).values('topic').annotate(total_count=Count('id'))
-        
-        # Combine counts
-        total_questions_map = {}
-        for item in mcq_per_topic:
-            total_questions_map[item['topic']] = total_questions_map.get(item['topic'], 0) + item['total_count']
-        for item in order_per_topic:
-            total_questions_map[item['topic']] = total_questions_map.get(item['topic'], 0) + item['total_count']
-        for item in connect_per_topic:
-            total_questions_map[item['topic']] = total_questions_map.get(item['topic'], 0) + item['total_count']
-        
-        # Get all student answers for questions in these topics
-        # Note: We can't filter directly on GenericForeignKey, so we need to get question IDs first
-        from django.contrib.contenttypes.models import ContentType
-        
-        # Get ContentTypes for all question types
-        mcq_ct = ContentType.objects.get_for_model(MultipleChoiceQuestion)
-        order_ct = ContentType.objects.get_for_model(OrderQuestion)
-        connect_ct = ContentType.objects.get_for_model(ConnectQuestion)
-        
-        # Get question IDs from all question types in these topics
-        mcq_ids = MultipleChoiceQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=student.organization
-        ).values_list('id', flat=True)
-        order_ids = OrderQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=student.organization
-        ).values_list('id', flat=True)
-        connect_ids = ConnectQuestion.objects.filter(
-            topic__in=topic_ids,
-            organization=student.organization
-        ).values_list('id', flat=True)
-        
-        # Build list of (content_type_id, question_id) tuples
-        question_refs = (
-            [(mcq_ct.id, qid) for qid in mcq_ids] +
-            [(order_ct.id, qid) for qid in order_ids] +
-            [(connect_ct.id, qid) for qid in connect_ids]
-        )
-        
-        # Filter StudentQuestionAnswer by content_type and question_id pairs
-        from django.db.models import Q
-        q_objects = Q()
-        for ct_id, q_id in question_refs:
-            q_objects |= Q(question_content_type_id=ct_id, question_id=q_id)
-        
-        student_answers = StudentQuestionAnswer.objects.filter(
-            student=student
-        ).filter(q_objects).select_related('answer')
-        
-        # Count answered questions per topic (total and correct)
+        # Answered and correct counts per topic from the materialized mastery table
+        masteries = StudentTopicMastery.objects.filter(
+            student=student,
+            topic_id__in=topic_ids
+        ).values_list('topic_id', 'answered', 'correct', 'p_known')
         answered_questions_map = {}
         correct_questions_map = {}
-        
-        # Build a map of (content_type_id, question_id) -> topic_id for quick lookup
-        question_to_topic = {}
-        
-        # Get all questions in bulk and map to topics
-        if mcq_ids:
-            mcq_questions = MultipleChoiceQuestion.objects.filter(id__in=mcq_ids).values('id', 'topic_id')
-            for q in mcq_questions:
-                question_to_topic[(mcq_ct.id, q['id'])] = q['topic_id']
-        
-        if order_ids:
-            order_questions = OrderQuestion.objects.filter(id__in=order_ids).values('id', 'topic_id')
-            for q in order_questions:
-                question_to_topic[(order_ct.id, q['id'])] = q['topic_id']
-        
-        if connect_ids:
-            connect_questions = ConnectQuestion.objects.filter(id__in=connect_ids).values('id', 'topic_id')
-            for q in connect_questions:
-                question_to_topic[(connect_ct.id, q['id'])] = q['topic_id']
-        
-        for answer in student_answers:
-            key = (answer.question_content_type_id, answer.question_id)
-            topic_id = question_to_topic.get(key)
-            if topic_id:
-                if topic_id not in answered_questions_map:
-                    answered_questions_map[topic_id] = set()
-                answered_questions_map[topic_id].add(answer.question_id)
-                
-                # Check if correct (only for MultipleChoiceQuestion with answer field)
-                if answer.answer and answer.answer.is_correct:
-                    if topic_id not in correct_questions_map:
-                        correct_questions_map[topic_id] = set()
-                    correct_questions_map[topic_id].add(answer.question_id)
-                # For OrderQuestion and ConnectQuestion, use the correct property
-                elif answer.answer is None and answer.correct:
-                    if topic_id not in correct_questions_map:
-                        correct_questions_map[topic_id] = set()
-                    correct_questions_map[topic_id].add(answer.question_id)
+        p_known_map = {}
+        for topic_id, answered, correct, p_known in masteries:
+            answered_questions_map[topic_id] = answered
+            correct_questions_map[topic_id] = correct
+            p_known_map[topic_id] = p_known
         
         # Build topic progress data
         topics_data = []
         for topic in topics:
             total_questions = total_questions_map.get(topic.id, 0)
-            questions_answered = len(answered_questions_map.get(topic.id, set()))
-            questions_correct = len(correct_questions_map.get(topic.id, set()))
+            questions_answered = answered_questions_map.get(topic.id, 0)
+            questions_correct = correct_questions_map.get(topic.id, 0)
             
             topics_data.append({
                 'id': topic.id,
@@ -213,7 +172,8 @@ class StudentViewSet(viewsets.ModelViewSet):
                 'questions_answered': questions_answered,
                 'questions_correct': questions_correct,
                 'total_questions': total_questions,
-                'percentage': (questions_correct / questions_answered * 100) if questions_answered > 0 else 0
+                'percentage': (questions_correct / questions_answered * 100) if questions_answered > 0 else 0,
+                'p_known': p_known_map.get(topic.id)
             })
         
         serializer = TopicProgressSerializer(topics_data, many=True)
@@ -229,10 +189,13 @@ class StudentQuestionAnswerFilterSet(django_filters.FilterSet):
     
     class Meta:
         model = StudentQuestionAnswer
-        fields = ['organization', 'student', 'quiz', 'answer', 'question_id', 'question_content_type']
+        fields = [
+            'organization', 'student', 'quiz', 'answer', 'question_id', 'question_content_type',
+            'topic', 'lesson', 'module', 'course', 'is_correct'
+        ]
 
 
-class StudentQuestionAnswerViewSet(viewsets.ModelViewSet):
+class StudentQuestionAnswerViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for StudentQuestionAnswer model."""
     
     queryset = StudentQuestionAnswer.objects.all()
@@ -242,4 +205,87 @@ class StudentQuestionAnswerViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at']
     ordering = ['-created_at']
     filterset_class = StudentQuestionAnswerFilterSet
+    
+    def list(self, request, *args, **kwargs):
+        student = request.query_params.get('student')
+        if student and student.isdigit():
+            # A student's answers include the ones still in the write-behind buffer
+            sync_student_answers(int(student))
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['put'])
+    def upsert(self, request):
+        """Create or replace the student's answer to a question in a quiz.
+        
+        Expects JSON body: { "student", "quiz", "question_type",
+        "question_id", "answer" (option id) or "answer_data" }. The answer is
+        written with a single INSERT ... ON CONFLICT DO UPDATE on the
+        answer's unique key, so changing an answer needs no lookup and a
+        retried request leaves the stored answer as it was. With the
+        write-behind buffer enabled the answer is only appended to the buffer
+        and the response is 202 Accepted, without an id or grade.
+        """
+        from .serializers import StudentQuestionAnswerUpsertSerializer
+        
+        serializer = StudentQuestionAnswerUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=202 if serializer.data['buffered'] else 200)
 
+
+class QuizAttemptViewSet(
+    QueryPlanMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet
+):
+    """ViewSet for QuizAttempt model.
+    
+    Answers are autosaved with ``draft/`` and only written as
+    StudentQuestionAnswer rows by ``submit/``.
+    """
+    
+    queryset = QuizAttempt.objects.select_related('student', 'quiz')
+    serializer_class = QuizAttemptSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['started_at', 'submitted_at', 'score']
+    ordering = ['-started_at']
+    filterset_fields = ['organization', 'student', 'quiz', 'status']
+    
+    @action(detail=True, methods=['patch'])
+    def draft(self, request, pk=None):
+        """Autosave answers into the attempt's draft.
+        
+        Expects JSON body: { "answers": [{ "question_type", "question_id",
+        "answer" (option id) or "answer_data" }, ...] }. An answer without
+        ``answer`` and ``answer_data`` clears the question. Answers are
+        validated against the quiz's questions like a submission. Costs one
+        UPDATE of the attempt row, however many answers are saved.
+        """
+        from .attempts import save_draft
+        
+        attempt = self.get_object()
+        serializer = DraftAnswersSerializer(data=request.data, context={'quiz': attempt.quiz})
+        serializer.is_valid(raise_exception=True)
+        if not save_draft(attempt, serializer.validated_data['answers']):
+            return Response({'detail': 'Attempt has already been submitted'}, status=400)
+        return Response({'id': attempt.id, 'draft_answers': attempt.draft_answers, 'updated_at': attempt.updated_at})
+    
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """Submit the attempt: grade its drafts, write them as answers and store the score."""
+        from django.core.exceptions import ValidationError
+        from .attempts import submit_attempt
+        from .submission import AnswerSheet
+        
+        attempt = self.get_object()
+        try:
+            submitted = submit_attempt(attempt, AnswerSheet(attempt.quiz))
+        except ValidationError as error:
+            return Response({'draft_answers': error.message_dict}, status=400)
+        if not submitted:
+            return Response({'detail': 'Attempt has already been submitted'}, status=400)
+        return Response(self.get_serializer(attempt).data)
@@ -287,6 +287,32 @@ export interface TopicProgress {
   questions_correct: number;
   total_questions: number;
   percentage: number;
+  // Knowledge tracing estimate that the student knows the topic, null before their first answer
+  p_known: number | null;
+}
+
+export interface ProgressMatrixStudent {
+  id: number;
+  first_name: string;
+  last_name: string;
+}
+
+export interface ProgressMatrixTopic {
+  id: number;
+  name: string;
+  lesson_name: string;
+  module_name: string;
+  total_questions: number;
+}
+
+// Dense students x topics matrix: answered[i][j] is student i in topic j;
+// p_known[i][j] is the knowledge tracing estimate, null before the first answer
+export interface StudentGroupProgressMatrix {
+  students: ProgressMatrixStudent[];
+  topics: ProgressMatrixTopic[];
+  answered: number[][];
+  correct: number[][];
+  p_known: (number | null)[][];
 }
 
 export interface StudentQuestionAnswer {
@@ -1384,3 +1410,13 @@ export async function fetchStudentGroupProgress(studentId: number, groupId: numb
   }
   return await response.json();
 }
+
+export async function fetchStudentGroupProgressMatrix(groupId: number): Promise<StudentGroupProgressMatrix> {
+  const response = await fetch(`${API_BASE_URL}/students/student-groups/${groupId}/progress-matrix/`, {
+    credentials: 'include',
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch student group progress matrix');
+  }
+  return await response.json();
+}